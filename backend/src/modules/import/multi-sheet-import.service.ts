@@ -75,12 +75,21 @@ export class MultiSheetImportService {
       'hinweise',
       'hgb-bilanzstruktur',
       'kontenplan-referenz',
+      'auswahllisten',
+      'prüfsummen',
     ];
 
+    // Continuation sheets ("Bilanzdaten (2)", ...) are imported with their base sheet
+    const sheetGroups = this.groupContinuationSheets(workbook.SheetNames);
+
     // Process each sheet
     for (const sheetName of workbook.SheetNames) {
       const sheetNameLower = sheetName.toLowerCase();
 
+      if (!sheetGroups.has(sheetName)) {
+        continue;
+      }
+
       // Skip ignored sheets
       if (ignoreSheets.some((ignore) => sheetNameLower.includes(ignore))) {
         console.log(`[MultiSheetImport] Skipping sheet: "${sheetName}"`);
@@ -94,8 +103,19 @@ export class MultiSheetImportService {
           continue;
         }
 
-        console.log(`[MultiSheetImport] Processing sheet: "${sheetName}"`);
-        const result = await this.processSheet(sheetName, worksheet, options);
+        const continuationNames = sheetGroups.get(sheetName) || [];
+        console.log(
+          `[MultiSheetImport] Processing sheet: "${sheetName}"` +
+            (continuationNames.length
+              ? ` (+ ${continuationNames.length} continuation sheets)`
+              : ''),
+        );
+        const result = await this.processSheet(
+          sheetName,
+          worksheet,
+          options,
+          continuationNames.map((name) => workbook.Sheets[name]),
+        );
         results.push(result);
         allErrors.push(...result.errors);
         allWarnings.push(...result.warnings);
@@ -127,6 +147,61 @@ export class MultiSheetImportService {
     };
   }
 
+  /**
+   * Map each base sheet to its continuation sheets.
+   * The template generator spills data sheets past Excel's row limit into
+   * "<Name> (2)", "<Name> (3)", ... (name truncated to 31 characters) with the
+   * same head rows. Continuation sheets do not appear as keys.
+   */
+  private groupContinuationSheets(sheetNames: string[]): Map<string, string[]> {
+    const pattern = /^(.*) \((\d+)\)$/;
+    const groups = new Map<string, string[]>();
+    const continuations: { name: string; prefix: string; number: number }[] =
+      [];
+
+    for (const name of sheetNames) {
+      const match = pattern.exec(name);
+      if (match && Number(match[2]) >= 2) {
+        continuations.push({
+          name,
+          prefix: match[1],
+          number: Number(match[2]),
+        });
+      } else {
+        groups.set(name, []);
+      }
+    }
+
+    continuations.sort((a, b) => a.number - b.number);
+    for (const continuation of continuations) {
+      const base = groups.has(continuation.prefix)
+        ? continuation.prefix
+        : [...groups.keys()].find((name) =>
+            name.startsWith(continuation.prefix),
+          );
+      if (base) {
+        groups.get(base)!.push(continuation.name);
+      } else {
+        // No base sheet - treat as an independent sheet
+        groups.set(continuation.name, []);
+      }
+    }
+    return groups;
+  }
+
+  /**
+   * Drop the repeated head (title row and header row) of a continuation sheet.
+   * The header row is the first row with at least two non-empty cells.
+   */
+  private stripSheetHead(rows: any[][]): any[][] {
+    const headerIdx = rows.findIndex(
+      (row) =>
+        (row || []).filter((v) => v !== null && v !== undefined && v !== '')
+          .length >= 2,
+    );
+    return headerIdx >= 0 ? rows.slice(headerIdx + 1) : rows;
+  }
+
   /**
    * Process a single sheet based on its name/type
    */
@@ -134,6 +209,7 @@ export class MultiSheetImportService {
     sheetName: string,
     worksheet: XLSX.WorkSheet,
     options: { fiscalYear: number; periodStart?: string; periodEnd?: string },
+    continuations: XLSX.WorkSheet[] = [],
   ): Promise<SheetImportResult> {
     const sheetNameLower = sheetName.toLowerCase();
     const rawDataArray: any[][] = XLSX.utils.sheet_to_json(worksheet, {
@@ -141,6 +217,18 @@ export class MultiSheetImportService {
       defval: null,
     });
 
+    // Continuation sheets form one logical table with the base sheet
+    for (const continuation of continuations) {
+      const rows: any[][] = XLSX.utils.sheet_to_json(continuation, {
+        header: 1,
+        defval: null,
+      });
+      // No spread: continuation sheets can hold ~1M rows
+      for (const row of this.stripSheetHead(rows)) {
+        rawDataArray.push(row);
+      }
+    }
+
     if (!rawDataArray || rawDataArray.length < 2) {
       return {
         sheetName,
@@ -2,70 +2,38 @@
 """
 Erstellt ein Excel-Muster für die Konsolidierung nach HGB
 Version 3.0 - Vollständig mit Phase 1, 2 & 3 Verbesserungen
+
+Aufruf:
+    python create_excel_template.py [--engine openpyxl|xml] [--output PFAD] [--sheets minimal]
 """
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.datavalidation import DataValidation
+import argparse
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 
-# Erstelle Workbook
-wb = Workbook()
-
-# Entferne Standard-Sheet
-if 'Sheet' in wb.sheetnames:
-    wb.remove(wb['Sheet'])
-
-# Stile definieren
-header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-header_font = Font(bold=True, color="FFFFFF", size=11)
-subheader_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-subheader_font = Font(bold=True, size=10)
-required_fill = PatternFill(start_color="E7F3FF", end_color="E7F3FF", fill_type="solid")  # Blau für Pflichtfelder
-optional_fill = PatternFill(start_color="FFF9E6", end_color="FFF9E6", fill_type="solid")  # Gelb für optionale Felder
-calculated_fill = PatternFill(start_color="E6F7E6", end_color="E6F7E6", fill_type="solid")  # Grün für berechnete Felder
-warning_fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")  # Rot für Warnungen
-border = Border(
-    left=Side(style='thin'),
-    right=Side(style='thin'),
-    top=Side(style='thin'),
-    bottom=Side(style='thin')
+from template_writer import (
+    COMPRESSION_LEVELS, COMPRESSION_PRESETS, ENGINES, MAX_ROWS, PART_KINDS, SheetSeries, column_letter,
+    open_workbook_writer, parse_compression, sheet_ref,
 )
 
-# ===== BLATT 0: Bilanzdaten (MUST BE FIRST for import detection) =====
-# Create Bilanzdaten FIRST so it's index 0 and gets auto-selected by import code
-ws_bilanz = wb.create_sheet("Bilanzdaten", 0)
+DEFAULT_OUTPUT = "templates/Konsolidierung_Muster_v3.0.xlsx"
 
-# Headers - Write explicitly cell-by-cell to ensure no gaps or nulls
+# ===== BLATT 0: Bilanzdaten (MUST BE FIRST for import detection) =====
 headers_bilanz = [
-    "Unternehmen", "Kontonummer", "Kontoname", "HGB-Position", 
-    "Kontotyp", "Soll", "Haben", "Saldo", 
+    "Unternehmen", "Kontonummer", "Kontoname", "HGB-Position",
+    "Kontotyp", "Soll", "Haben", "Saldo",
     "Zwischengesellschaft", "Gegenpartei", "Bemerkung"
 ]
 
-# CRITICAL: Write headers explicitly to each cell to avoid sparse arrays
-# This ensures XLSX reads them correctly as a dense array with no null/undefined values
-for col_idx, header_value in enumerate(headers_bilanz, start=1):
-    cell = ws_bilanz.cell(row=1, column=col_idx)
-    # Ensure header is a string, never None or empty
-    cell.value = str(header_value) if header_value else f"Column_{col_idx}"
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
-
-# Verify header row is complete
-print(f"[Template] Bilanzdaten headers written: {len(headers_bilanz)} columns")
-print(f"[Template] Header row 1 has {ws_bilanz.max_column} columns")
-print(f"[Template] Headers: {headers_bilanz}")
-
 # Erweiterte Beispiel-Daten
 # CRITICAL: Ensure all rows have exactly 11 columns (matching headers)
 # Replace empty strings with explicit values to avoid sparse arrays
 example_data = [
     ["Mutterunternehmen H", "1000", "Kasse", "B.IV", "asset", "5000.00", "0.00", "5000.00", "Nein", "", ""],
-    ["Mutterunternehmen H", "1200", "Forderungen a. LL", "B.II", "asset", "100000.00", "0.00", "100000.00", "Ja", "TU1", "Zwischengesellschaftsgeschäft"],
+    ["Mutterunternehmen H", "1200", "Forderungen a. LL", "B.II", "asset", "100000.00", "0.00", "100000.00", "Ja", "Tochterunternehmen TU1", "Zwischengesellschaftsgeschäft"],
     ["Mutterunternehmen H", "1400", "Beteiligung TU1", "A.III", "asset", "500000.00", "0.00", "500000.00", "Nein", "", "Beteiligung an Tochterunternehmen"],
     ["Mutterunternehmen H", "2000", "Grundstücke", "A.II", "asset", "2000000.00", "0.00", "2000000.00", "Nein", "", ""],
     ["Mutterunternehmen H", "3000", "Gezeichnetes Kapital", "A.I", "equity", "0.00", "1000000.00", "-1000000.00", "Nein", "", ""],
@@ -73,108 +41,13 @@ example_data = [
     ["Mutterunternehmen H", "3200", "Gewinnrücklagen", "A.III", "equity", "0.00", "300000.00", "-300000.00", "Nein", "", ""],
     ["Mutterunternehmen H", "4000", "Verbindlichkeiten", "C", "liability", "0.00", "500000.00", "-500000.00", "Nein", "", ""],
     ["Tochterunternehmen TU1", "1000", "Kasse", "B.IV", "asset", "2000.00", "0.00", "2000.00", "Nein", "", ""],
-    ["Tochterunternehmen TU1", "1600", "Verbindlichkeiten a. LL", "C", "liability", "0.00", "50000.00", "-50000.00", "Ja", "Mutter H", "Gegenpartei: Mutterunternehmen H"],
+    ["Tochterunternehmen TU1", "1600", "Verbindlichkeiten a. LL", "C", "liability", "0.00", "50000.00", "-50000.00", "Ja", "Mutterunternehmen H", "Gegenpartei: Mutterunternehmen H"],
     ["Tochterunternehmen TU1", "3000", "Gezeichnetes Kapital", "A.I", "equity", "0.00", "500000.00", "-500000.00", "Nein", "", ""],
     ["Tochterunternehmen TU2", "1000", "Kasse", "B.IV", "asset", "1500.00", "0.00", "1500.00", "Nein", "", ""],
     ["Tochterunternehmen TU2", "3000", "Gezeichnetes Kapital", "A.I", "equity", "0.00", "300000.00", "-300000.00", "Nein", "", ""],
 ]
 
-# CRITICAL: Write data rows explicitly to ensure consistent column count
-# This prevents sparse arrays that cause header detection issues
-for row_idx, row_data in enumerate(example_data, start=2):
-    # Ensure row has exactly 11 columns (matching headers)
-    while len(row_data) < len(headers_bilanz):
-        row_data.append("")  # Pad with empty strings if needed
-    
-    # Write each cell explicitly with proper formatting
-    for col_idx, cell_value in enumerate(row_data[:len(headers_bilanz)], start=1):
-        cell = ws_bilanz.cell(row=row_idx, column=col_idx)
-        
-        # Set cell value - never None
-        if cell_value is None:
-            cell.value = ""
-        elif isinstance(cell_value, (int, float)):
-            cell.value = cell_value
-        else:
-            cell.value = str(cell_value)
-        
-        cell.border = border
-        
-        # Apply formatting based on column
-        if col_idx == 8:  # Saldo - Formel (calculate from Soll and Haben)
-            cell.value = f"=F{row_idx}-G{row_idx}"
-            cell.number_format = '#,##0.00'
-            cell.fill = calculated_fill
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col_idx in [6, 7]:  # Soll, Haben
-            cell.number_format = '#,##0.00'
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col_idx == 1:  # Unternehmen
-            cell.fill = required_fill
-        elif col_idx == 9:  # Zwischengesellschaft
-            dv = DataValidation(type="list", formula1='"Ja,Nein"')
-            ws_bilanz.add_data_validation(dv)
-            dv.add(cell)
-        elif col_idx == 5:  # Kontotyp
-            dv = DataValidation(type="list", formula1='"asset,liability,equity"')
-            ws_bilanz.add_data_validation(dv)
-            dv.add(cell)
-
-# Bilanzsumme-Zeile
-total_row = len(example_data) + 3
-ws_bilanz.cell(row=total_row, column=1).value = "BILANZSUMME"
-ws_bilanz.cell(row=total_row, column=1).font = Font(bold=True)
-ws_bilanz.cell(row=total_row, column=8).value = f"=SUM(H2:H{len(example_data)+1})"
-ws_bilanz.cell(row=total_row, column=8).number_format = '#,##0.00'
-ws_bilanz.cell(row=total_row, column=8).fill = calculated_fill
-ws_bilanz.cell(row=total_row, column=8).font = Font(bold=True)
-
-# Spaltenbreiten anpassen
-ws_bilanz.column_dimensions['A'].width = 25
-ws_bilanz.column_dimensions['B'].width = 15
-ws_bilanz.column_dimensions['C'].width = 30
-ws_bilanz.column_dimensions['D'].width = 15
-ws_bilanz.column_dimensions['E'].width = 15
-ws_bilanz.column_dimensions['F'].width = 15
-ws_bilanz.column_dimensions['G'].width = 15
-ws_bilanz.column_dimensions['H'].width = 15
-ws_bilanz.column_dimensions['I'].width = 20
-ws_bilanz.column_dimensions['J'].width = 20
-ws_bilanz.column_dimensions['K'].width = 40
-
-# CRITICAL: Verify header row integrity
-print(f"[Template] Bilanzdaten sheet verification:")
-print(f"  - Headers count: {len(headers_bilanz)}")
-print(f"  - Max column: {ws_bilanz.max_column}")
-print(f"  - Header row 1 values:")
-for col in range(1, min(len(headers_bilanz) + 1, ws_bilanz.max_column + 1)):
-    header_cell = ws_bilanz.cell(row=1, column=col)
-    print(f"    Column {col}: '{header_cell.value}' (type: {type(header_cell.value).__name__})")
-
-# ===== BLATT 1: Anleitung (Now second sheet) =====
-ws_anleitung = wb.create_sheet("Anleitung", 1)
-
-# Titel
-ws_anleitung.merge_cells('A1:F1')
-title_cell = ws_anleitung.cell(row=1, column=1)
-title_cell.value = "HGB-Konsolidierung Import-Template - Anleitung"
-title_cell.font = Font(bold=True, size=16, color="FFFFFF")
-title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Version
-ws_anleitung.merge_cells('A2:F2')
-version_cell = ws_anleitung.cell(row=2, column=1)
-version_cell.value = "Version 3.0 - Stand: " + datetime.now().strftime("%Y-%m-%d")
-version_cell.font = Font(italic=True, size=10)
-version_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Übersicht
-row = 4
-ws_anleitung.cell(row=row, column=1).value = "ÜBERSICHT DER BLÄTTER:"
-ws_anleitung.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
+# ===== BLATT 1: Anleitung =====
 sheets_info = [
     ("1. Bilanzdaten", "Bilanzpositionen für alle Unternehmen (HGB § 266) - WICHTIG: Dieses Blatt wird automatisch für Import verwendet"),
     ("2. Anleitung", "Dieses Blatt - Übersicht und Anleitung"),
@@ -187,19 +60,9 @@ sheets_info = [
     ("9. Latente Steuern", "Aktive und passive latente Steuern (HGB § 274) - NEU"),
     ("10. HGB-Bilanzstruktur", "Referenz zur HGB-Bilanzgliederung (HGB § 266)"),
     ("11. Kontenplan-Referenz", "Typische Kontonummern-Bereiche"),
+    ("12. Auswahllisten", "Werte der Dropdowns (Währungen, Kontotypen) - erweiterbar"),
 ]
 
-for sheet_name, description in sheets_info:
-    ws_anleitung.cell(row=row, column=1).value = sheet_name
-    ws_anleitung.cell(row=row, column=1).font = Font(bold=True)
-    ws_anleitung.cell(row=row, column=2).value = description
-    row += 1
-
-row += 1
-ws_anleitung.cell(row=row, column=1).value = "SCHRITT-FÜR-SCHRITT-ANLEITUNG:"
-ws_anleitung.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
 steps = [
     ("Schritt 1:", "Füllen Sie 'Unternehmensinformationen' aus"),
     ("Schritt 2:", "Füllen Sie 'Bilanzdaten' für alle Unternehmen aus"),
@@ -212,17 +75,6 @@ steps = [
     ("Schritt 9:", "Importieren Sie die Datei im System"),
 ]
 
-for step_num, step_desc in steps:
-    ws_anleitung.cell(row=row, column=1).value = step_num
-    ws_anleitung.cell(row=row, column=1).font = Font(bold=True)
-    ws_anleitung.cell(row=row, column=2).value = step_desc
-    row += 1
-
-row += 1
-ws_anleitung.cell(row=row, column=1).value = "HGB-REFERENZEN:"
-ws_anleitung.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
 hgb_refs = [
     ("§ 266 HGB", "Bilanzgliederung"),
     ("§ 275 HGB", "Gewinn- und Verlustrechnung"),
@@ -233,17 +85,6 @@ hgb_refs = [
     ("§ 256a HGB", "Währungsumrechnung"),
 ]
 
-for hgb_par, hgb_desc in hgb_refs:
-    ws_anleitung.cell(row=row, column=1).value = hgb_par
-    ws_anleitung.cell(row=row, column=1).font = Font(bold=True)
-    ws_anleitung.cell(row=row, column=2).value = hgb_desc
-    row += 1
-
-row += 1
-ws_anleitung.cell(row=row, column=1).value = "FARBCODierung:"
-ws_anleitung.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
 color_info = [
     ("Blau", "Pflichtfelder (müssen ausgefüllt werden)"),
     ("Gelb", "Optionale Felder"),
@@ -251,84 +92,29 @@ color_info = [
     ("Rot", "Warnungen/Hinweise"),
 ]
 
-for color, desc in color_info:
-    ws_anleitung.cell(row=row, column=1).value = color
-    ws_anleitung.cell(row=row, column=1).font = Font(bold=True)
-    ws_anleitung.cell(row=row, column=2).value = desc
-    row += 1
-
-# Spaltenbreiten
-ws_anleitung.column_dimensions['A'].width = 20
-ws_anleitung.column_dimensions['B'].width = 60
-
 # ===== BLATT 2: GuV-Daten (Erweitert) =====
-ws_guv = wb.create_sheet("GuV-Daten", 2)
-
 headers_guv = [
-    "Unternehmen", "Kontonummer", "Kontoname", "Kontotyp", 
+    "Unternehmen", "Kontonummer", "Kontoname", "Kontotyp",
     "Betrag", "Zwischengesellschaft", "Gegenpartei", "Bemerkung"
 ]
-ws_guv.append(headers_guv)
-
-# Formatierung Header
-for col in range(1, len(headers_guv) + 1):
-    cell = ws_guv.cell(row=1, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
-# Erweiterte Beispiel-Daten GuV
 example_guv = [
     ["Mutterunternehmen H", "8000", "Umsatzerlöse", "revenue", "1000000.00", "Nein", "", ""],
-    ["Mutterunternehmen H", "8000", "Umsatzerlöse (an TU1)", "revenue", "100000.00", "Ja", "TU1", "Zwischenumsatz"],
+    ["Mutterunternehmen H", "8000", "Umsatzerlöse (an TU1)", "revenue", "100000.00", "Ja", "Tochterunternehmen TU1", "Zwischenumsatz"],
     ["Mutterunternehmen H", "4000", "Materialaufwand", "cost_of_sales", "600000.00", "Nein", "", ""],
     ["Mutterunternehmen H", "6000", "Personalaufwand", "operating_expense", "200000.00", "Nein", "", ""],
     ["Mutterunternehmen H", "7000", "Abschreibungen", "operating_expense", "50000.00", "Nein", "", ""],
     ["Mutterunternehmen H", "7500", "Zinsaufwand", "financial_expense", "10000.00", "Nein", "", ""],
     ["Tochterunternehmen TU1", "8000", "Umsatzerlöse", "revenue", "500000.00", "Nein", "", ""],
     ["Tochterunternehmen TU1", "4000", "Materialaufwand", "cost_of_sales", "300000.00", "Nein", "", ""],
-    ["Tochterunternehmen TU1", "4000", "Materialaufwand (von Mutter H)", "cost_of_sales", "80000.00", "Ja", "Mutter H", "Zwischenaufwand"],
+    ["Tochterunternehmen TU1", "4000", "Materialaufwand (von Mutter H)", "cost_of_sales", "80000.00", "Ja", "Mutterunternehmen H", "Zwischenaufwand"],
     ["Tochterunternehmen TU1", "6000", "Personalaufwand", "operating_expense", "100000.00", "Nein", "", ""],
     ["Tochterunternehmen TU2", "8000", "Umsatzerlöse", "revenue", "200000.00", "Nein", "", ""],
     ["Tochterunternehmen TU2", "4000", "Materialaufwand", "cost_of_sales", "120000.00", "Nein", "", ""],
 ]
 
-for row_idx, row_data in enumerate(example_guv, start=2):
-    ws_guv.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_guv.cell(row=row_idx, column=col)
-        cell.border = border
-        if col == 5:  # Betrag
-            cell.number_format = '#,##0.00'
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col == 1:  # Unternehmen
-            cell.fill = required_fill
-        elif col == 4:  # Kontotyp
-            dv = DataValidation(type="list", formula1='"revenue,cost_of_sales,operating_expense,financial_income,financial_expense,income_tax,net_income"')
-            ws_guv.add_data_validation(dv)
-            dv.add(cell)
-        elif col == 6:  # Zwischengesellschaft
-            dv = DataValidation(type="list", formula1='"Ja,Nein"')
-            ws_guv.add_data_validation(dv)
-            dv.add(cell)
-
-# Spaltenbreiten
-for col in range(1, len(headers_guv) + 1):
-    ws_guv.column_dimensions[get_column_letter(col)].width = 20
-
 # ===== BLATT 3: Unternehmensinformationen =====
-ws_unternehmen = wb.create_sheet("Unternehmensinformationen", 3)
-
 headers_unternehmen = ["Unternehmensname", "Typ", "Beteiligungs-%", "Erwerbsdatum", "Anschaffungskosten", "Bemerkung"]
-ws_unternehmen.append(headers_unternehmen)
-
-for col in range(1, len(headers_unternehmen) + 1):
-    cell = ws_unternehmen.cell(row=1, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_unternehmen = [
     ["Mutterunternehmen H", "Mutterunternehmen (H)", "100.00", "", "", "Hauptunternehmen"],
@@ -336,78 +122,20 @@ example_unternehmen = [
     ["Tochterunternehmen TU2", "Tochterunternehmen (TU)", "60.00", "2021-06-01", "300000.00", "60% Beteiligung"],
 ]
 
-for row_data in example_unternehmen:
-    ws_unternehmen.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_unternehmen.cell(row=ws_unternehmen.max_row, column=col)
-        cell.border = border
-        if col == 3:  # Beteiligungs-%
-            cell.number_format = '0.00"%"'
-        elif col == 5:  # Anschaffungskosten
-            cell.number_format = '#,##0.00'
-        elif col == 1:  # Unternehmensname
-            cell.fill = required_fill
-
-ws_unternehmen.column_dimensions['A'].width = 25
-ws_unternehmen.column_dimensions['B'].width = 25
-ws_unternehmen.column_dimensions['C'].width = 15
-ws_unternehmen.column_dimensions['D'].width = 15
-ws_unternehmen.column_dimensions['E'].width = 18
-ws_unternehmen.column_dimensions['F'].width = 40
-
 # ===== BLATT 4: Beteiligungsverhältnisse =====
-ws_beteiligung = wb.create_sheet("Beteiligungsverhältnisse", 4)
-
 headers_beteiligung = ["Mutterunternehmen", "Tochterunternehmen", "Beteiligungs-%", "Anschaffungskosten", "Erwerbsdatum", "Beteiligungsbuchwert", "Bemerkung"]
-ws_beteiligung.append(headers_beteiligung)
-
-for col in range(1, len(headers_beteiligung) + 1):
-    cell = ws_beteiligung.cell(row=1, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_beteiligung = [
     ["Mutterunternehmen H", "Tochterunternehmen TU1", "80.00", "500000.00", "2020-01-15", "500000.00", "Nach HGB § 301"],
     ["Mutterunternehmen H", "Tochterunternehmen TU2", "60.00", "300000.00", "2021-06-01", "300000.00", "Nach HGB § 301"],
 ]
 
-for row_data in example_beteiligung:
-    ws_beteiligung.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_beteiligung.cell(row=ws_beteiligung.max_row, column=col)
-        cell.border = border
-        if col == 3:  # Beteiligungs-%
-            cell.number_format = '0.00"%"'
-        elif col in [4, 6]:  # Anschaffungskosten, Beteiligungsbuchwert
-            cell.number_format = '#,##0.00'
-
-ws_beteiligung.column_dimensions['A'].width = 25
-ws_beteiligung.column_dimensions['B'].width = 25
-ws_beteiligung.column_dimensions['C'].width = 15
-ws_beteiligung.column_dimensions['D'].width = 18
-ws_beteiligung.column_dimensions['E'].width = 15
-ws_beteiligung.column_dimensions['F'].width = 18
-ws_beteiligung.column_dimensions['G'].width = 30
-
 # ===== BLATT 5: Zwischengesellschaftsgeschäfte (Verbessert) =====
-ws_intercompany = wb.create_sheet("Zwischengesellschaftsgeschäfte", 5)
-
-# Erweiterte Header
 headers_intercompany = [
-    "Transaktions-ID", "Von Unternehmen", "An Unternehmen", "Transaktionstyp", 
-    "Betrag", "Kontonummer", "Kontoname", "Gewinnmarge", 
+    "Transaktions-ID", "Von Unternehmen", "An Unternehmen", "Transaktionstyp",
+    "Betrag", "Kontonummer", "Kontoname", "Gewinnmarge",
     "Eliminierungsmethode", "Eliminierungsbetrag", "HGB-Referenz", "Bemerkung"
 ]
-ws_intercompany.append(headers_intercompany)
-
-for col in range(1, len(headers_intercompany) + 1):
-    cell = ws_intercompany.cell(row=1, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_intercompany = [
     ["T001", "Mutterunternehmen H", "Tochterunternehmen TU1", "Forderung", "50000.00", "1200", "Forderungen a. LL", "", "Vollständig", "50000.00", "§ 303", "Zu eliminieren"],
@@ -416,43 +144,8 @@ example_intercompany = [
     ["T003", "Mutterunternehmen H", "Tochterunternehmen TU2", "Dienstleistung", "30000.00", "8000", "Umsatzerlöse", "15.00", "Vollständig", "4500.00", "§ 305", "Zwischengewinn zu eliminieren"],
 ]
 
-for row_idx, row_data in enumerate(example_intercompany, start=2):
-    ws_intercompany.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_intercompany.cell(row=row_idx, column=col)
-        cell.border = border
-        if col in [5, 8, 10]:  # Betrag, Gewinnmarge, Eliminierungsbetrag
-            cell.number_format = '#,##0.00'
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col == 4:  # Transaktionstyp
-            dv = DataValidation(type="list", formula1='"Forderung,Verbindlichkeit,Lieferung,Dienstleistung,Zinsen,Dividenden"')
-            ws_intercompany.add_data_validation(dv)
-            dv.add(cell)
-        elif col == 9:  # Eliminierungsmethode
-            dv = DataValidation(type="list", formula1='"Vollständig,Teilweise,Zeitanteilig"')
-            ws_intercompany.add_data_validation(dv)
-            dv.add(cell)
-        elif col == 11:  # HGB-Referenz
-            dv = DataValidation(type="list", formula1='"§ 303,§ 305"')
-            ws_intercompany.add_data_validation(dv)
-            dv.add(cell)
-
-# Spaltenbreiten
-for col in range(1, len(headers_intercompany) + 1):
-    ws_intercompany.column_dimensions[get_column_letter(col)].width = 18
-
 # ===== BLATT 6: Eigenkapital-Aufteilung (Mit Formeln) =====
-ws_eigenkapital = wb.create_sheet("Eigenkapital-Aufteilung", 6)
-
 headers_eigenkapital = ["Unternehmen", "Gezeichnetes Kapital", "Kapitalrücklagen", "Gewinnrücklagen", "Jahresüberschuss", "Gesamt Eigenkapital", "Anteil Mutter", "Anteil Minderheit"]
-ws_eigenkapital.append(headers_eigenkapital)
-
-for col in range(1, len(headers_eigenkapital) + 1):
-    cell = ws_eigenkapital.cell(row=1, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_eigenkapital = [
     ["Mutterunternehmen H", "1000000.00", "200000.00", "300000.00", "150000.00", "", "100.00", "0.00"],
@@ -460,49 +153,8 @@ example_eigenkapital = [
     ["Tochterunternehmen TU2", "300000.00", "50000.00", "40000.00", "30000.00", "", "60.00", "40.00"],
 ]
 
-for row_idx, row_data in enumerate(example_eigenkapital, start=2):
-    ws_eigenkapital.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_eigenkapital.cell(row=row_idx, column=col)
-        cell.border = border
-        if col == 6:  # Gesamt Eigenkapital - Formel
-            cell.value = f"=B{row_idx}+C{row_idx}+D{row_idx}+E{row_idx}"
-            cell.number_format = '#,##0.00'
-            cell.fill = calculated_fill
-            cell.font = Font(bold=True)
-        elif col in [2, 3, 4, 5]:  # Beträge
-            cell.number_format = '#,##0.00'
-        elif col in [7, 8]:  # Anteile
-            cell.number_format = '0.00"%"'
-            if col == 8:  # Anteil Minderheit - Formel
-                cell.value = f"=F{row_idx}*(1-G{row_idx}/100)"
-                cell.fill = calculated_fill
-
-ws_eigenkapital.column_dimensions['A'].width = 25
-for col in range(2, 9):
-    ws_eigenkapital.column_dimensions[get_column_letter(col)].width = 18
-
 # ===== BLATT 7: Währungsumrechnung (NEU - Phase 2) =====
-ws_waehrung = wb.create_sheet("Währungsumrechnung", 7)
-
-# Titel
-ws_waehrung.merge_cells('A1:F1')
-title_cell = ws_waehrung.cell(row=1, column=1)
-title_cell.value = "Währungsumrechnung nach HGB § 256a"
-title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Header
 headers_waehrung = ["Unternehmen", "Währung (ISO)", "Umrechnungskurs (Stichtag)", "Durchschnittskurs (GuV)", "Umrechnungsdatum", "Bemerkung"]
-ws_waehrung.append(headers_waehrung)
-
-for col in range(1, len(headers_waehrung) + 1):
-    cell = ws_waehrung.cell(row=2, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_waehrung = [
     ["Mutterunternehmen H", "EUR", "1.0000", "1.0000", "2024-12-31", "Hauptwährung"],
@@ -510,49 +162,11 @@ example_waehrung = [
     ["Tochterunternehmen TU2", "USD", "0.9200", "0.9150", "2024-12-31", "Ausländische Tochter - Beispiel"],
 ]
 
-for row_idx, row_data in enumerate(example_waehrung, start=3):
-    ws_waehrung.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_waehrung.cell(row=row_idx, column=col)
-        cell.border = border
-        if col == 2:  # Währung
-            dv = DataValidation(type="list", formula1='"EUR,USD,GBP,CHF,JPY,CNY"')
-            ws_waehrung.add_data_validation(dv)
-            dv.add(cell)
-        elif col in [3, 4]:  # Kurse
-            cell.number_format = '#,##0.0000'
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col == 1:  # Unternehmen
-            cell.fill = required_fill
-
-# Spaltenbreiten
-for col in range(1, len(headers_waehrung) + 1):
-    ws_waehrung.column_dimensions[get_column_letter(col)].width = 20
-
 # ===== BLATT 8: Latente Steuern (NEU - Phase 2) =====
-ws_latente_steuern = wb.create_sheet("Latente Steuern", 8)
-
-# Titel
-ws_latente_steuern.merge_cells('A1:H1')
-title_cell = ws_latente_steuern.cell(row=1, column=1)
-title_cell.value = "Latente Steuern nach HGB § 274"
-title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Header
 headers_latente = [
-    "Unternehmen", "Steuerart", "Ursprung", "Temporäre Differenz", 
+    "Unternehmen", "Steuerart", "Ursprung", "Temporäre Differenz",
     "Steuersatz (%)", "Latente Steuer", "HGB-Position", "Bemerkung"
 ]
-ws_latente_steuern.append(headers_latente)
-
-for col in range(1, len(headers_latente) + 1):
-    cell = ws_latente_steuern.cell(row=2, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 example_latente = [
     ["Mutterunternehmen H", "Aktiv", "Bilanzierungshilfen", "50000.00", "25.00", "", "D", "Aktive latente Steuern"],
@@ -560,47 +174,7 @@ example_latente = [
     ["Tochterunternehmen TU1", "Aktiv", "Abschreibungen", "20000.00", "25.00", "", "D", "Aktive latente Steuern"],
 ]
 
-for row_idx, row_data in enumerate(example_latente, start=3):
-    ws_latente_steuern.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_latente_steuern.cell(row=row_idx, column=col)
-        cell.border = border
-        if col == 6:  # Latente Steuer - Formel
-            cell.value = f"=D{row_idx}*E{row_idx}/100"
-            cell.number_format = '#,##0.00'
-            cell.fill = calculated_fill
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col in [4, 5]:  # Temporäre Differenz, Steuersatz
-            cell.number_format = '#,##0.00'
-            cell.alignment = Alignment(horizontal="right", vertical="center")
-        elif col == 2:  # Steuerart
-            dv = DataValidation(type="list", formula1='"Aktiv,Passiv"')
-            ws_latente_steuern.add_data_validation(dv)
-            dv.add(cell)
-        elif col == 1:  # Unternehmen
-            cell.fill = required_fill
-
-# Spaltenbreiten
-for col in range(1, len(headers_latente) + 1):
-    ws_latente_steuern.column_dimensions[get_column_letter(col)].width = 20
-
 # ===== BLATT 9: HGB-Bilanzstruktur (Referenz) =====
-ws_hgb_struktur = wb.create_sheet("HGB-Bilanzstruktur", 9)
-
-# Titel
-ws_hgb_struktur.merge_cells('A1:C1')
-title_cell = ws_hgb_struktur.cell(row=1, column=1)
-title_cell.value = "HGB-Bilanzgliederung nach § 266 HGB"
-title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Aktivseite
-row = 3
-ws_hgb_struktur.cell(row=row, column=1).value = "AKTIVSEITE"
-ws_hgb_struktur.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
 aktiv_struktur = [
     ("A", "Anlagevermögen", ""),
     ("", "I. Immaterielle Vermögensgegenstände", ""),
@@ -615,21 +189,6 @@ aktiv_struktur = [
     ("D", "Aktive latente Steuern", ""),
 ]
 
-for pos, name, konten in aktiv_struktur:
-    ws_hgb_struktur.cell(row=row, column=1).value = pos
-    ws_hgb_struktur.cell(row=row, column=2).value = name
-    ws_hgb_struktur.cell(row=row, column=3).value = konten
-    if pos:  # Hauptposition
-        ws_hgb_struktur.cell(row=row, column=1).fill = subheader_fill
-        ws_hgb_struktur.cell(row=row, column=1).font = Font(bold=True)
-    row += 1
-
-# Passivseite
-row += 1
-ws_hgb_struktur.cell(row=row, column=1).value = "PASSIVSEITE"
-ws_hgb_struktur.cell(row=row, column=1).font = Font(bold=True, size=12)
-row += 1
-
 passiv_struktur = [
     ("A", "Eigenkapital", ""),
     ("", "I. Gezeichnetes Kapital", ""),
@@ -643,41 +202,8 @@ passiv_struktur = [
     ("E", "Passive latente Steuern", ""),
 ]
 
-for pos, name, konten in passiv_struktur:
-    ws_hgb_struktur.cell(row=row, column=1).value = pos
-    ws_hgb_struktur.cell(row=row, column=2).value = name
-    ws_hgb_struktur.cell(row=row, column=3).value = konten
-    if pos:  # Hauptposition
-        ws_hgb_struktur.cell(row=row, column=1).fill = subheader_fill
-        ws_hgb_struktur.cell(row=row, column=1).font = Font(bold=True)
-    row += 1
-
-# Spaltenbreiten
-ws_hgb_struktur.column_dimensions['A'].width = 5
-ws_hgb_struktur.column_dimensions['B'].width = 60
-ws_hgb_struktur.column_dimensions['C'].width = 30
-
 # ===== BLATT 10: Kontenplan-Referenz =====
-ws_kontenplan = wb.create_sheet("Kontenplan-Referenz", 10)
-
-# Titel
-ws_kontenplan.merge_cells('A1:D1')
-title_cell = ws_kontenplan.cell(row=1, column=1)
-title_cell.value = "Typische Kontonummern-Bereiche (SKR-Referenz)"
-title_cell.font = Font(bold=True, size=14, color="FFFFFF")
-title_cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-title_cell.alignment = Alignment(horizontal="center", vertical="center")
-
-# Header
 headers_kontenplan = ["Kontonummer-Bereich", "Kontotyp", "Beschreibung", "HGB-Position"]
-ws_kontenplan.append(headers_kontenplan)
-
-for col in range(1, len(headers_kontenplan) + 1):
-    cell = ws_kontenplan.cell(row=2, column=col)
-    cell.fill = header_fill
-    cell.font = header_font
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = border
 
 kontenplan_data = [
     ["0000-0999", "asset", "Anlagevermögen (Immaterielle Vermögensgegenstände)", "A.I"],
@@ -693,76 +219,673 @@ kontenplan_data = [
     ["9000-9999", "equity", "GuV-Abschluss", "A.V"],
 ]
 
-for row_data in kontenplan_data:
-    ws_kontenplan.append(row_data)
-    for col in range(1, len(row_data) + 1):
-        cell = ws_kontenplan.cell(row=ws_kontenplan.max_row, column=col)
-        cell.border = border
-
-# Spaltenbreiten
-ws_kontenplan.column_dimensions['A'].width = 20
-ws_kontenplan.column_dimensions['B'].width = 15
-ws_kontenplan.column_dimensions['C'].width = 50
-ws_kontenplan.column_dimensions['D'].width = 15
-
-# CRITICAL: Verify sheet order - Bilanzdaten MUST be first (index 0)
-print(f"\n[Template] Sheet order verification:")
-for idx, sheet_name in enumerate(wb.sheetnames):
-    print(f"  Sheet {idx}: '{sheet_name}'")
-    if idx == 0 and sheet_name != "Bilanzdaten":
-        print(f"  WARNING: First sheet is '{sheet_name}', not 'Bilanzdaten'!")
-    if sheet_name == "Bilanzdaten":
-        print(f"  [OK] Bilanzdaten found at index {idx}")
-
-# Verify Bilanzdaten sheet structure
-if "Bilanzdaten" in wb.sheetnames:
-    bilanz_sheet = wb["Bilanzdaten"]
-    print(f"\n[Template] Bilanzdaten sheet structure:")
-    print(f"  - Max row: {bilanz_sheet.max_row}")
-    print(f"  - Max column: {bilanz_sheet.max_column}")
-    print(f"  - Expected headers: {len(headers_bilanz)}")
-    if bilanz_sheet.max_column != len(headers_bilanz):
-        print(f"  WARNING: Column count mismatch! Expected {len(headers_bilanz)}, got {bilanz_sheet.max_column}")
-    
-    # Verify first row headers
-    first_row_headers = []
-    for col in range(1, bilanz_sheet.max_column + 1):
-        cell = bilanz_sheet.cell(row=1, column=col)
-        first_row_headers.append(str(cell.value) if cell.value else f"Column_{col}")
-    print(f"  - First row headers: {first_row_headers}")
-    
-    # Verify "Kontonummer" is in headers
-    if "Kontonummer" in first_row_headers:
-        kontonummer_idx = first_row_headers.index("Kontonummer")
-        print(f"  [OK] 'Kontonummer' found at index {kontonummer_idx} (column {kontonummer_idx + 1})")
-    else:
-        print(f"  ERROR: 'Kontonummer' NOT FOUND in headers!")
-        print(f"  Available headers: {first_row_headers}")
-
-# Speichere Datei
-filename = "templates/Konsolidierung_Muster_v3.0.xlsx"
-import os
-os.makedirs("templates", exist_ok=True)
-wb.save(filename)
-print(f"\n[SUCCESS] Excel-Template erfolgreich erstellt: {filename}")
-print("Version 3.0 - Vollständig mit Phase 1, 2 & 3:")
-print("  Phase 1:")
-print("    - Bilanzdaten-Blatt ist ERSTES Blatt (für Auto-Detection)")
-print("    - Anleitung-Blatt hinzugefügt")
-print("    - GuV-Daten-Blatt hinzugefügt (HGB § 275)")
-print("    - HGB-Bilanzstruktur-Referenz hinzugefügt (HGB § 266)")
-print("    - Kontenplan-Referenz hinzugefügt")
-print("    - Erweiterte Zwischengesellschaftsgeschäfte")
-print("    - Excel-Validierungsregeln implementiert")
-print("  Phase 2:")
-print("    - Währungsumrechnung-Blatt hinzugefügt (HGB § 256a)")
-print("    - Latente Steuern-Blatt hinzugefügt (HGB § 274)")
-print("    - Erweiterte Validierungsregeln")
-print("  Phase 3:")
-print("    - Erweiterte Beispiel-Daten")
-print("    - Vollständige Farbcodierung (Blau/Gelb/Grün/Rot)")
-print("    - Automatische Formeln für Berechnungen")
-print("    - Bilanzsumme automatisch berechnet")
-print("    - Eigenkapital-Summe automatisch berechnet")
-print("    - Minderheitsanteil automatisch berechnet")
-print("    - Latente Steuern automatisch berechnet")
+# ===== BLATT 12: Auswahllisten (Quelle der Dropdowns) =====
+headers_auswahllisten = ["Währung (ISO)", "Kontotyp (Bilanz)", "Kontotyp (GuV)"]
+
+waehrungen = ["EUR", "USD", "GBP", "CHF", "JPY", "CNY"]
+kontotypen_bilanz = ["asset", "liability", "equity"]
+kontotypen_guv = [
+    "revenue", "cost_of_sales", "operating_expense", "financial_income", "financial_expense", "income_tax", "net_income",
+]
+
+
+def _inline_list(values):
+    return '"' + ",".join(values) + '"'
+
+
+# Auswahllisten (Datenvalidierung)
+LIST_JA_NEIN = '"Ja,Nein"'
+LIST_KONTOTYP_BILANZ = _inline_list(kontotypen_bilanz)
+LIST_KONTOTYP_GUV = _inline_list(kontotypen_guv)
+LIST_TRANSAKTIONSTYP = '"Forderung,Verbindlichkeit,Lieferung,Dienstleistung,Zinsen,Dividenden"'
+LIST_ELIMINIERUNG = '"Vollständig,Teilweise,Zeitanteilig"'
+LIST_HGB_REFERENZ = '"§ 303,§ 305"'
+LIST_WAEHRUNG = _inline_list(waehrungen)
+LIST_STEUERART = '"Aktiv,Passiv"'
+
+# Arbeitsmappenweite Namen für Dropdowns, deren Werte im Template selbst gepflegt werden
+NAME_UNTERNEHMEN = "Liste_Unternehmen"
+NAME_WAEHRUNGEN = "Liste_Waehrungen"
+NAME_KONTOTYP_BILANZ = "Liste_Kontotyp_Bilanz"
+NAME_KONTOTYP_GUV = "Liste_Kontotyp_GuV"
+
+# Name -> (Quellblatt, Spalte, Inline-Liste falls das Quellblatt nicht ausgewählt ist)
+NAMED_LISTS = {
+    NAME_UNTERNEHMEN: ("Unternehmensinformationen", "A", None),
+    NAME_WAEHRUNGEN: ("Auswahllisten", "A", LIST_WAEHRUNG),
+    NAME_KONTOTYP_BILANZ: ("Auswahllisten", "B", LIST_KONTOTYP_BILANZ),
+    NAME_KONTOTYP_GUV: ("Auswahllisten", "C", LIST_KONTOTYP_GUV),
+}
+
+# Zeilen-Hashes (template_rowhash.py): versteckte Spalte hinter den Datenspalten und
+# verstecktes Blatt mit einem Digest je (Teil-)Blatt - Re-Importe verarbeiten nur geänderte Zeilen
+HASH_HEADER = "Zeilen-Hash"
+DIGEST_SHEET = "Prüfsummen"
+headers_pruefsummen = ["Blatt", "Teilblatt", "Zeilen", "Digest"]
+
+# Bedingte Formatierung (Rot für Warnungen): (Spalte(n), Formel relativ zur ersten Datenzeile {r})
+RULE_SALDO = ("H", 'AND($A{r}<>"",ROUND($H{r}-($F{r}-$G{r}),2)<>0)')  # Saldo ≠ Soll - Haben
+# Unternehmen, dessen Salden sich nicht zu 0 summieren (je Blatt)
+RULE_BILANZ_AUSGEGLICHEN = ("A", 'AND($A{r}<>"",ROUND(SUMIF($A:$A,$A{r},$H:$H),2)<>0)')
+# Regeln über ganze Spalten - nur gültig, solange ein Blatt keine Folgeblätter hat (ein Unternehmen
+# kann über zwei Teilblätter laufen); Folgeblätter sind beim Schreiben des ersten noch nicht bekannt
+WHOLE_SHEET_RULES = (RULE_BILANZ_AUSGEGLICHEN,)
+RULE_GEGENPARTEI_BILANZ = ("I:J", 'AND($I{r}="Ja",LEN(TRIM($J{r}))=0)')  # Zwischengesellschaft ohne Gegenpartei
+RULE_GEGENPARTEI_GUV = ("F:G", 'AND($F{r}="Ja",LEN(TRIM($G{r}))=0)')
+# Anteil Mutter + Anteil Minderheit ≠ 100 % (Minderheit als % oder als Betrag = Gesamt EK * (1 - Anteil Mutter))
+RULE_ANTEILE = ("G:H", 'AND($A{r}<>"",ROUND($G{r}+$H{r},2)<>100,ROUND($H{r}-$F{r}*(1-$G{r}/100),2)<>0)')
+
+# Spaltenstile der Datenzeilen (ein Eintrag je Spalte)
+STYLES_BILANZ = ("required", "cell", "cell", "cell", "cell", "amount", "amount", "calculated", "cell", "cell", "cell")
+STYLES_GUV = ("required", "cell", "cell", "cell", "amount", "cell", "cell", "cell")
+STYLES_UNTERNEHMEN = ("required", "cell", "percent", "cell", "amount_plain", "cell")
+STYLES_BETEILIGUNG = ("cell", "cell", "percent", "amount_plain", "cell", "amount_plain", "cell")
+STYLES_INTERCOMPANY = ("cell", "cell", "cell", "cell", "amount", "cell", "cell", "amount", "cell", "amount", "cell", "cell")
+STYLES_EIGENKAPITAL = ("cell", "amount_plain", "amount_plain", "amount_plain", "amount_plain", "calculated_bold", "percent", "calculated_percent")
+STYLES_WAEHRUNG = ("required", "cell", "rate", "rate", "cell", "cell")
+STYLES_LATENTE = ("required", "cell", "cell", "amount", "amount", "calculated", "cell", "cell")
+
+
+def _fit_row(row_data, width):
+    """Zeile auf exakt `width` Spalten bringen (keine Lücken, keine None-Werte)"""
+    row = ["" if value is None else value for value in list(row_data)[:width]]
+    while len(row) < width:
+        row.append("")  # Pad with empty strings if needed
+    return row
+
+
+def named_list_formula(sheet, letter):
+    """Mitwachsender Bereich ab Zeile 2 bis zum letzten Eintrag der Spalte (Header in Zeile 1)"""
+    return (
+        f"OFFSET({sheet_ref(sheet, f'${letter}$2')},0,0,"
+        f"MAX(1,COUNTA({sheet_ref(sheet, f'${letter}:${letter}')})-1),1)"
+    )
+
+
+def named_lists(selected):
+    """Namen der Dropdown-Listen, deren Quellblatt ausgewählt ist -> Formel"""
+    return {
+        name: named_list_formula(sheet, letter)
+        for name, (sheet, letter, _) in NAMED_LISTS.items() if sheet in selected
+    }
+
+
+def _list_source(workbook, formula1):
+    """Validierungsquelle: definierter Name, sonst Inline-Liste (None = keine Validierung)"""
+    if formula1 not in NAMED_LISTS or formula1 in workbook.defined_names:
+        return formula1
+    return NAMED_LISTS[formula1][2]
+
+
+def _write_data_rows(ws, rows, width, styles, formulas=None, validations=(), rules=(), hashed=False):
+    """
+    Schreibt Datenzeilen gestreamt in eine SheetSeries; ist ein Blatt voll, geht es
+    auf einem Folgeblatt weiter.
+    formulas: {Spaltenindex (0-basiert): Formel-Vorlage mit {r}}
+    validations: [(Spalte, Listenformel oder Name aus NAMED_LISTS)] - je Blatt eine Validierung
+                 über den Datenbereich
+    rules: [(Spalte(n), Formel-Vorlage mit {r})] - je Blatt eine bedingte Formatierung über den Datenbereich;
+           Regeln aus WHOLE_SHEET_RULES entfallen, sobald Folgeblätter nötig sind
+    hashed: Zeilen-Hash in die Spalte hinter den Daten schreiben, Digest je Teilblatt in row_digest
+    Gibt die Datenbereiche [(Blatt, erste, letzte Zeile)] zurück - leer ohne Zeilen.
+    """
+    validations = [
+        (letter, source) for letter, formula1 in validations
+        if (source := _list_source(ws.workbook, formula1)) is not None
+    ]
+    ranges = []
+    sheet = ws.current
+    first = sheet.row_count + 1
+    hasher = digest = None
+    if hashed:
+        from template_rowhash import MerkleDigest, row_hasher
+
+        hasher, digest = row_hasher(ws.title), MerkleDigest()
+        styles = tuple(styles) + (None,)
+    row_rules = [rule for rule in rules if rule not in WHOLE_SHEET_RULES]
+    for row_data in rows:
+        if sheet.row_count >= ws.row_limit:
+            _close_range(ranges, sheet, first, validations, row_rules)
+            rules = row_rules
+            if digest is not None:
+                sheet.row_digest, digest = (ws.title,) + digest.finish(), MerkleDigest()
+            sheet = ws.continue_sheet()
+            first = sheet.row_count + 1
+        row = _fit_row(row_data, width)
+        if hasher is not None:
+            # vor dem Einsetzen der Formeln - der Hash folgt den Werten, die der Reader berechnet
+            row_hash = hasher(row)
+            digest.add(row_hash)
+            row.append(row_hash)
+        if formulas:
+            r = sheet.row_count + 1
+            for col, template in formulas.items():
+                row[col] = template.format(r=r)
+        sheet.append(row, styles)
+    _close_range(ranges, sheet, first, validations, rules)
+    if digest is not None:
+        sheet.row_digest = (ws.title,) + digest.finish()
+    return ranges
+
+
+def _close_range(ranges, sheet, first, validations, rules=()):
+    """Schließt den Datenbereich eines Blatts ab (Validierungen/Regeln vor dem nächsten Folgeblatt)"""
+    last = sheet.row_count
+    if last < first:
+        return
+    for letter, formula1 in validations:
+        sheet.add_list_validation(formula1, f"{letter}{first}:{letter}{last}")
+    for columns, formula in rules:
+        start, _, end = columns.partition(":")
+        sheet.add_conditional_format(f"{start}{first}:{end or start}{last}", formula.format(r=first))
+    ranges.append((sheet, first, last))
+
+
+def _sum_formula(ranges, letter, sheet):
+    """SUM über alle Datenbereiche; Bereiche auf Folgeblättern blattübergreifend referenziert"""
+    if len(ranges) <= 1:
+        last = ranges[0][2] if ranges else 0
+        return f"=SUM({letter}2:{letter}{max(last, 2)})"
+    refs = [
+        ref if part is sheet else sheet_ref(part.title, ref)
+        for part, ref in ((part, f"{letter}{first}:{letter}{last}") for part, first, last in ranges)
+    ]
+    return "=SUM(" + ",".join(refs) + ")"
+
+
+def _write_title(ws, title, merge_ref, style="sheet_title"):
+    ws.append([title], [style])
+    ws.merge_cells(merge_ref)
+
+
+def _hash_column(ws, headers):
+    """Blendet die Spalte hinter den Datenspalten aus und gibt ihren Header zurück"""
+    ws.hide_columns([column_letter(len(headers) + 1)])
+    return [HASH_HEADER]
+
+
+def _head_bilanzdaten(ws):
+    ws.set_column_widths({
+        "A": 25, "B": 15, "C": 30, "D": 15, "E": 15, "F": 15,
+        "G": 15, "H": 15, "I": 20, "J": 20, "K": 40,
+    })
+    hash_header = _hash_column(ws, headers_bilanz)
+    # CRITICAL: Header explizit und vollständig schreiben (keine Lücken / null-Werte)
+    ws.append([str(h) if h else f"Column_{i}" for i, h in enumerate(headers_bilanz, start=1)] + hash_header, "header")
+
+
+def write_bilanzdaten(ws, rows):
+    # Leerzeile + BILANZSUMME bleiben auf dem letzten Blatt frei
+    ws.begin(_head_bilanzdaten, footer_rows=2)
+    print(f"[Template] Bilanzdaten headers written: {len(headers_bilanz)} columns")
+
+    # Saldo wird immer als Formel aus Soll und Haben berechnet
+    ranges = _write_data_rows(
+        ws, rows, len(headers_bilanz), STYLES_BILANZ, {7: "=F{r}-G{r}"},
+        [("I", LIST_JA_NEIN), ("E", NAME_KONTOTYP_BILANZ), ("A", NAME_UNTERNEHMEN), ("J", NAME_UNTERNEHMEN)],
+        [RULE_SALDO, RULE_GEGENPARTEI_BILANZ, RULE_BILANZ_AUSGEGLICHEN], hashed=True,
+    )
+
+    # Bilanzsumme-Zeile (über alle Folgeblätter)
+    ws.append([])
+    total = ["BILANZSUMME"] + [None] * 6 + [_sum_formula(ranges, "H", ws.current)]
+    ws.append(total, ("total_label",) + (None,) * 6 + ("total",))
+
+
+# Blatt -> Beschreibung in der Übersicht der Anleitung
+SHEET_DESCRIPTIONS = {label.split(". ", 1)[1]: description for label, description in sheets_info}
+
+# HGB-Referenz -> Blätter, für die sie relevant ist
+HGB_REF_SHEETS = {
+    "§ 266 HGB": ("Bilanzdaten", "HGB-Bilanzstruktur"),
+    "§ 275 HGB": ("GuV-Daten",),
+    "§ 301 HGB": ("Beteiligungsverhältnisse",),
+    "§ 303 HGB": ("Zwischengesellschaftsgeschäfte",),
+    "§ 305 HGB": ("Zwischengesellschaftsgeschäfte",),
+    "§ 274 HGB": ("Latente Steuern",),
+    "§ 256a HGB": ("Währungsumrechnung",),
+}
+
+
+def anleitung_content(selected):
+    """Versionszeile und Abschnitte der Anleitung passend zu den ausgewählten Blättern"""
+    overview = [(f"{idx}. {name}", SHEET_DESCRIPTIONS[name]) for idx, name in enumerate(selected, start=1)]
+    # Schritte ohne Blattbezug (z.B. Import) bleiben immer erhalten
+    selected_steps = [
+        description for _, description in steps
+        if (match := re.search(r"'([^']+)'", description)) is None or match.group(1) in selected
+    ]
+    refs = [(ref, text) for ref, text in hgb_refs if any(name in selected for name in HGB_REF_SHEETS.get(ref, ()))]
+    version = "Version 3.0 - Stand: " + datetime.now().strftime("%Y-%m-%d")
+    return version, [
+        ("ÜBERSICHT DER BLÄTTER:", overview),
+        ("SCHRITT-FÜR-SCHRITT-ANLEITUNG:", [(f"Schritt {idx}:", d) for idx, d in enumerate(selected_steps, start=1)]),
+        ("HGB-REFERENZEN:", refs),
+        ("FARBCODierung:", color_info),
+    ]
+
+
+def write_anleitung(ws, content):
+    version, sections = content
+    ws.set_column_widths({"A": 20, "B": 60})
+    _write_title(ws, "HGB-Konsolidierung Import-Template - Anleitung", "A1:F1", "title")
+    ws.append([version], ["version"])
+    ws.merge_cells("A2:F2")
+
+    for heading, entries in sections:
+        if not entries:
+            continue
+        ws.append([])
+        ws.append([heading], ["section"])
+        for label, description in entries:
+            ws.append([label, description], ("bold", None))
+
+
+def _head_guv(ws):
+    ws.set_column_widths({letter: 20 for letter in "ABCDEFGH"})
+    ws.append(headers_guv + _hash_column(ws, headers_guv), "header")
+
+
+def write_guv(ws, rows):
+    ws.begin(_head_guv)
+    _write_data_rows(
+        ws, rows, len(headers_guv), STYLES_GUV, None,
+        [("D", NAME_KONTOTYP_GUV), ("F", LIST_JA_NEIN), ("A", NAME_UNTERNEHMEN), ("G", NAME_UNTERNEHMEN)],
+        [RULE_GEGENPARTEI_GUV], hashed=True,
+    )
+
+
+def _head_unternehmen(ws):
+    ws.set_column_widths({"A": 25, "B": 25, "C": 15, "D": 15, "E": 18, "F": 40})
+    ws.append(headers_unternehmen, "header")
+
+
+def write_unternehmen(ws, rows):
+    ws.begin(_head_unternehmen)
+    _write_data_rows(ws, rows, len(headers_unternehmen), STYLES_UNTERNEHMEN)
+
+
+def _head_beteiligung(ws):
+    ws.set_column_widths({"A": 25, "B": 25, "C": 15, "D": 18, "E": 15, "F": 18, "G": 30})
+    ws.append(headers_beteiligung, "header")
+
+
+def write_beteiligung(ws, rows):
+    ws.begin(_head_beteiligung)
+    _write_data_rows(
+        ws, rows, len(headers_beteiligung), STYLES_BETEILIGUNG, None,
+        [("A", NAME_UNTERNEHMEN), ("B", NAME_UNTERNEHMEN)],
+    )
+
+
+def _head_intercompany(ws):
+    ws.set_column_widths({letter: 18 for letter in "ABCDEFGHIJKL"})
+    ws.append(headers_intercompany + _hash_column(ws, headers_intercompany), "header")
+
+
+def write_intercompany(ws, rows):
+    ws.begin(_head_intercompany)
+    _write_data_rows(
+        ws, rows, len(headers_intercompany), STYLES_INTERCOMPANY, None,
+        [
+            ("D", LIST_TRANSAKTIONSTYP), ("I", LIST_ELIMINIERUNG), ("K", LIST_HGB_REFERENZ),
+            ("B", NAME_UNTERNEHMEN), ("C", NAME_UNTERNEHMEN),
+        ],
+        hashed=True,
+    )
+
+
+def _head_eigenkapital(ws):
+    ws.set_column_widths({"A": 25, **{letter: 18 for letter in "BCDEFGH"}})
+    ws.append(headers_eigenkapital, "header")
+
+
+def write_eigenkapital(ws, rows):
+    ws.begin(_head_eigenkapital)
+    _write_data_rows(
+        ws, rows, len(headers_eigenkapital), STYLES_EIGENKAPITAL,
+        {5: "=B{r}+C{r}+D{r}+E{r}", 7: "=F{r}*(1-G{r}/100)"}, [("A", NAME_UNTERNEHMEN)], [RULE_ANTEILE],
+    )
+
+
+def _head_waehrung(ws):
+    ws.set_column_widths({letter: 20 for letter in "ABCDEF"})
+    _write_title(ws, "Währungsumrechnung nach HGB § 256a", "A1:F1")
+    ws.append(headers_waehrung, "header")
+
+
+def write_waehrung(ws, rows):
+    ws.begin(_head_waehrung)
+    _write_data_rows(
+        ws, rows, len(headers_waehrung), STYLES_WAEHRUNG, None, [("B", NAME_WAEHRUNGEN), ("A", NAME_UNTERNEHMEN)]
+    )
+
+
+def _head_latente_steuern(ws):
+    ws.set_column_widths({letter: 20 for letter in "ABCDEFGH"})
+    _write_title(ws, "Latente Steuern nach HGB § 274", "A1:H1")
+    ws.append(headers_latente, "header")
+
+
+def write_latente_steuern(ws, rows):
+    ws.begin(_head_latente_steuern)
+    _write_data_rows(
+        ws, rows, len(headers_latente), STYLES_LATENTE, {5: "=D{r}*E{r}/100"},
+        [("B", LIST_STEUERART), ("A", NAME_UNTERNEHMEN)],
+    )
+
+
+def write_hgb_struktur(ws, rows=None):
+    ws.set_column_widths({"A": 5, "B": 60, "C": 30})
+    _write_title(ws, "HGB-Bilanzgliederung nach § 266 HGB", "A1:C1")
+    for heading, struktur in (("AKTIVSEITE", aktiv_struktur), ("PASSIVSEITE", passiv_struktur)):
+        ws.append([])
+        ws.append([heading], ["section"])
+        for pos, name, konten in struktur:
+            # Hauptpositionen hervorheben
+            ws.append([pos, name, konten], ("subheader" if pos else None, None, None))
+
+
+def write_kontenplan(ws, rows):
+    ws.set_column_widths({"A": 20, "B": 15, "C": 50, "D": 15})
+    _write_title(ws, "Typische Kontonummern-Bereiche (SKR-Referenz)", "A1:D1")
+    ws.append(headers_kontenplan, "header")
+    _write_data_rows(ws, rows, len(headers_kontenplan), "cell")
+
+
+def auswahllisten_rows(_selected=None):
+    """Spaltenweise Listen -> Zeilen (kürzere Spalten mit Leerzellen aufgefüllt)"""
+    columns = (waehrungen, kontotypen_bilanz, kontotypen_guv)
+    return [
+        [column[idx] if idx < len(column) else "" for column in columns]
+        for idx in range(max(len(column) for column in columns))
+    ]
+
+
+def write_pruefsummen(writer):
+    """Verstecktes Blatt mit dem Digest je Teilblatt (nur wenn Blätter mit Zeilen-Hashes gebaut wurden)"""
+    digests = [(ws.title, ws.row_digest) for ws in writer.sheets if ws.row_digest is not None]
+    if not digests:
+        return
+    ws = writer.create_sheet(DIGEST_SHEET, "reference")
+    ws.hide()
+    ws.set_column_widths({"A": 30, "B": 30, "C": 12, "D": 40})
+    ws.append(headers_pruefsummen, "header")
+    for title, (sheet, rows, digest) in digests:
+        ws.append([sheet, title, rows, digest])
+
+
+def write_auswahllisten(ws, rows):
+    # Keine Titelzeile: die Namen in NAMED_LISTS beginnen in Zeile 2
+    ws.set_column_widths({"A": 18, "B": 18, "C": 22})
+    ws.append(headers_auswahllisten, "header")
+    _write_data_rows(ws, rows, len(headers_auswahllisten), "cell")
+
+
+# ===== Blatt-Registry =====
+
+@dataclass(frozen=True)
+class SheetBuilder:
+    """
+    Ein Blatt des Templates. write(ws, rows) wird nur für ausgewählte Blätter aufgerufen;
+    default_rows(ausgewählte Blattnamen) liefert die Zeilen, wenn keine Vorbelegung übergeben wird.
+    kind: "data" oder "reference" (Anleitung/Referenzblätter - eigene Kompressionsstufe)
+    """
+
+    name: str
+    write: object
+    default_rows: object = None
+    kind: str = "data"
+
+    def rows(self, selected):
+        return self.default_rows(selected) if self.default_rows else None
+
+
+# Registrierungsreihenfolge = Blattreihenfolge
+SHEET_BUILDERS = {}
+
+
+def register_sheet(name, write, default_rows=None, kind="data"):
+    SHEET_BUILDERS[name] = SheetBuilder(name, write, default_rows, kind)
+
+
+# Blattreihenfolge: Bilanzdaten MUSS Index 0 sein (Auto-Detection im Import)
+register_sheet("Bilanzdaten", write_bilanzdaten, lambda _: example_data)
+register_sheet("Anleitung", write_anleitung, anleitung_content, "reference")
+register_sheet("GuV-Daten", write_guv, lambda _: example_guv)
+register_sheet("Unternehmensinformationen", write_unternehmen, lambda _: example_unternehmen)
+register_sheet("Beteiligungsverhältnisse", write_beteiligung, lambda _: example_beteiligung)
+register_sheet("Zwischengesellschaftsgeschäfte", write_intercompany, lambda _: example_intercompany)
+register_sheet("Eigenkapital-Aufteilung", write_eigenkapital, lambda _: example_eigenkapital)
+register_sheet("Währungsumrechnung", write_waehrung, lambda _: example_waehrung)
+register_sheet("Latente Steuern", write_latente_steuern, lambda _: example_latente)
+register_sheet("HGB-Bilanzstruktur", write_hgb_struktur, kind="reference")
+register_sheet("Kontenplan-Referenz", write_kontenplan, lambda _: kontenplan_data, "reference")
+register_sheet("Auswahllisten", write_auswahllisten, auswahllisten_rows, "reference")
+
+REFERENCE_SHEETS = {name for name, builder in SHEET_BUILDERS.items() if builder.kind == "reference"}
+
+# Profile für --sheets; Blätter können zusätzlich einzeln genannt werden
+SHEET_PROFILES = {
+    "full": tuple(SHEET_BUILDERS),
+    "minimal": ("Bilanzdaten", "Anleitung", "GuV-Daten"),
+    "ic-only": ("Anleitung", "Unternehmensinformationen", "Zwischengesellschaftsgeschäfte"),
+}
+
+
+def select_sheets(spec="full"):
+    """
+    'minimal', 'Bilanzdaten,GuV-Daten', 'ic-only,Beteiligungsverhältnisse' oder eine Liste
+    -> Blattnamen in Template-Reihenfolge
+    """
+    items = [item.strip() for item in spec.split(",")] if isinstance(spec, str) else list(spec)
+    chosen = set()
+    for item in items:
+        if item in SHEET_PROFILES:
+            chosen.update(SHEET_PROFILES[item])
+        elif item in SHEET_BUILDERS:
+            chosen.add(item)
+        elif item:
+            raise ValueError(
+                f"Unbekanntes Blatt/Profil '{item}' - Profile: {', '.join(SHEET_PROFILES)}; "
+                f"Blätter: {', '.join(SHEET_BUILDERS)}"
+            )
+    if not chosen:
+        raise ValueError("Keine Blätter ausgewählt")
+    return [name for name in SHEET_BUILDERS if name in chosen]
+
+
+def build_template(filename=DEFAULT_OUTPUT, engine="openpyxl", data=None, bundle=None, max_rows=MAX_ROWS,
+                   sheets="full", incremental=False, jobs=1, **engine_options):
+    """
+    Erstellt das Template und gibt die BuildMetrics zurück.
+    sheets: Profil und/oder Blattnamen (siehe select_sheets) - nur diese Blätter werden gebaut.
+    incremental: nur Blätter mit geänderten Eingaben neu erzeugen, die übrigen aus der
+                 vorherigen Datei übernehmen (xml-Engine, siehe template_delta.py)
+    jobs: > 1 rendert die Datenblätter parallel in eigenen Prozessen (xml-Engine, siehe template_parallel.py)
+    Datenblätter mit mehr als `max_rows` Zeilen werden auf Folgeblätter ('Bilanzdaten (2)', ...)
+    mit gleichem Kopf, Validierungen und Formeln fortgesetzt.
+    bundle: optionaler template_bundle.BundleWriter - die Datenblätter werden im selben
+            Durchlauf zusätzlich als Spalten-Bundle geschrieben
+    engine_options: z.B. compression="transfer" oder {"data": "max", "styles": "stored"}
+    data: optionale Vorbelegung {Blattname: Zeilen (iterierbar)} statt der Beispiel-Daten -
+          Zeilen werden gestreamt, große Vorbelegungen müssen nicht im Speicher liegen.
+    """
+    data = data or {}
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    selected = select_sheets(sheets)
+    inputs = {name: data[name] if name in data else SHEET_BUILDERS[name].rows(selected) for name in selected}
+    names = named_lists(selected)
+    delta = None
+    if incremental and engine != "xml":
+        print(f"[Delta] Inkrementelle Builds benötigen die xml-Engine - vollständiger Build mit {engine}")
+    elif incremental:
+        from template_delta import DeltaBuild
+
+        delta = DeltaBuild(filename, max_rows, engine_options, names)
+        inputs = {name: delta.prepare(name, rows) for name, rows in inputs.items()}
+
+    parallel = None
+    data_sheets = [name for name in selected if SHEET_BUILDERS[name].kind == "data"]
+    if jobs > 1 and len(data_sheets) > 1:
+        from template_parallel import ParallelBuild, fork_available
+
+        if engine != "xml" or delta is not None or bundle is not None or not fork_available():
+            print("[Parallel] Parallele Builds benötigen die xml-Engine und fork (ohne --incremental/--bundle) "
+                  "- serieller Build")
+        else:
+            parallel = ParallelBuild(jobs, max_rows, engine_options, names)
+            parallel.start({name: inputs[name] for name in data_sheets})
+
+    writer = open_workbook_writer(delta.temp_path if delta else filename, engine, **engine_options)
+    try:
+        # Namen vor den Blättern - die Validierungen verweisen auf sie statt auf Inline-Listen
+        for name, formula in names.items():
+            writer.define_name(name, formula)
+        if delta is not None:
+            delta.start(writer)
+        for sheet_name in selected:
+            builder = SHEET_BUILDERS[sheet_name]
+            rows = inputs[sheet_name]
+            if bundle is not None and builder.kind == "data":
+                rows = bundle.tee(sheet_name, rows)
+            if delta is not None and delta.reuse(writer, sheet_name):
+                if bundle is not None and builder.kind == "data":
+                    deque(rows, maxlen=0)  # Bundle-Datei trotzdem schreiben
+                continue
+            if parallel is not None and sheet_name in parallel:
+                parallel.copy(writer, sheet_name)
+                continue
+            if builder.kind == "reference":
+                ws = SheetSeries(writer, sheet_name, "reference")
+            else:
+                ws = SheetSeries(writer, sheet_name, "data", max_rows)
+            builder.write(ws, rows)
+            if delta is not None:
+                delta.record(sheet_name, ws.parts)
+        write_pruefsummen(writer)
+        metrics = writer.close()
+    except BaseException:
+        writer.abort()
+        if delta is not None:
+            delta.abort()
+        raise
+    finally:
+        if parallel is not None:
+            parallel.close()
+    if delta is not None:
+        delta.finish()
+        print(f"[Delta] {delta.summary()}")
+    if bundle is not None:
+        bundle.close()
+
+    # CRITICAL: Verify sheet order - Bilanzdaten MUST be first (index 0)
+    print(f"\n[Template] Sheet order verification:")
+    for idx, ws in enumerate(writer.sheets):
+        print(f"  Sheet {idx}: '{ws.title}' ({ws.row_count} Zeilen)")
+        if idx == 0 and ws.title != "Bilanzdaten" and "Bilanzdaten" in selected:
+            print(f"  WARNING: First sheet is '{ws.title}', not 'Bilanzdaten'!")
+    return metrics
+
+
+def synthetic_bilanz_rows(count):
+    """Erzeugt `count` Bilanzzeilen (Benchmark großer vorbefüllter Exporte)"""
+    base = example_data
+    for i in range(count):
+        row = list(base[i % len(base)])
+        row[0] = f"{row[0]} #{i // 1000}"
+        row[1] = str(10000 + i % 90000)
+        yield row
+
+
+def _sheets_arg(spec):
+    try:
+        return select_sheets(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _compression_arg(spec):
+    try:
+        return parse_compression(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Erstellt das HGB-Konsolidierungs-Template (v3.0)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="openpyxl",
+                        help="Schreib-Engine (xml = direkter XML-Stream, deutlich schneller bei großen Vorbelegungen)")
+    parser.add_argument("--strings", choices=["shared", "inline"], default="shared",
+                        help="String-Ablage der xml-Engine")
+    parser.add_argument("--compression", type=_compression_arg, default="default", metavar="POLICY",
+                        help=f"Zip-Kompression: Preset ({', '.join(COMPRESSION_PRESETS)}) und/oder "
+                             f"TEIL=STUFE je Teiltyp ({', '.join(PART_KINDS)}; Stufen: {', '.join(COMPRESSION_LEVELS)}), "
+                             "z.B. 'max' für E-Mail-Versand oder 'data=fast,reference=stored,styles=stored'")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Zieldatei (Standard: {DEFAULT_OUTPUT})")
+    parser.add_argument("--bundle", metavar="DIR",
+                        help="Datenblätter zusätzlich als Spalten-Bundle (eine Datei je Blatt + manifest.json) schreiben")
+    parser.add_argument("--bundle-format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--synthetic-rows", type=int, default=0, metavar="N",
+                        help="Bilanzdaten mit N synthetischen Zeilen vorbelegen (Benchmark)")
+    parser.add_argument("--sheets", type=_sheets_arg, default="full", metavar="AUSWAHL",
+                        help=f"Profil ({', '.join(SHEET_PROFILES)}) und/oder Blattnamen, kommagetrennt - "
+                             "z.B. 'minimal' oder 'Bilanzdaten,GuV-Daten'")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Nur Blätter mit geänderten Eingaben neu erzeugen, übrige aus der vorhandenen "
+                             "Ausgabedatei übernehmen (xml-Engine; Fingerabdrücke in <output>.fingerprints.json)")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Datenblätter parallel in N Prozessen rendern (xml-Engine)")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS, metavar="N",
+                        help=f"Zeilen je Blatt, danach Folgeblatt (Standard und Maximum: {MAX_ROWS:,})")
+    args = parser.parse_args(argv)
+
+    options = {"compression": args.compression}
+    if args.engine == "xml":
+        options["strings"] = args.strings
+    data = {"Bilanzdaten": synthetic_bilanz_rows(args.synthetic_rows)} if args.synthetic_rows else None
+    bundle = None
+    if args.bundle:
+        from template_bundle import BundleWriter
+
+        bundle = BundleWriter(args.bundle, args.bundle_format, source=os.path.basename(args.output))
+    if not 4 <= args.max_rows <= MAX_ROWS:
+        parser.error(f"--max-rows muss zwischen 4 und {MAX_ROWS:,} liegen")
+    metrics = build_template(
+        args.output, args.engine, data, bundle, args.max_rows, args.sheets, args.incremental, args.jobs, **options
+    )
+
+    print(f"\n[SUCCESS] Excel-Template erfolgreich erstellt: {args.output}")
+    if bundle is not None:
+        print(f"[SUCCESS] Spalten-Bundle erstellt: {args.bundle} ({args.bundle_format})")
+    print(f"[Template] {metrics.summary()}")
+    print(f"[Template] {metrics.compression_summary()}")
+    print("Version 3.0 - Vollständig mit Phase 1, 2 & 3:")
+    print("  Phase 1:")
+    print("    - Bilanzdaten-Blatt ist ERSTES Blatt (für Auto-Detection)")
+    print("    - Anleitung-Blatt hinzugefügt")
+    print("    - GuV-Daten-Blatt hinzugefügt (HGB § 275)")
+    print("    - HGB-Bilanzstruktur-Referenz hinzugefügt (HGB § 266)")
+    print("    - Kontenplan-Referenz hinzugefügt")
+    print("    - Erweiterte Zwischengesellschaftsgeschäfte")
+    print("    - Excel-Validierungsregeln implementiert")
+    print("  Phase 2:")
+    print("    - Währungsumrechnung-Blatt hinzugefügt (HGB § 256a)")
+    print("    - Latente Steuern-Blatt hinzugefügt (HGB § 274)")
+    print("    - Erweiterte Validierungsregeln")
+    print("  Phase 3:")
+    print("    - Erweiterte Beispiel-Daten")
+    print("    - Vollständige Farbcodierung (Blau/Gelb/Grün/Rot)")
+    print("    - Automatische Formeln für Berechnungen")
+    print("    - Bilanzsumme automatisch berechnet")
+    print("    - Eigenkapital-Summe automatisch berechnet")
+    print("    - Minderheitsanteil automatisch berechnet")
+    print("    - Latente Steuern automatisch berechnet")
+    return metrics
+
+
+if __name__ == "__main__":
+    main()
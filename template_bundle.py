@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Spaltenorientiertes Export-Bundle für Konsolidierungs-Templates
+
+Ein Bundle ist ein Verzeichnis mit einer Datei je Datenblatt (CSV oder Parquet)
+mit denselben Headern wie im Template, plus manifest.json mit dem Schema.
+Bulk-Loader können es einlesen, ohne Spreadsheet-XML zu parsen.
+
+Aufruf:
+    python template_bundle.py export DATEI.xlsx BUNDLE_DIR [--format csv|parquet]
+    python template_bundle.py import BUNDLE_DIR DATEI.xlsx [--engine xml|openpyxl]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from template_schema import NUMBER, SCHEMAS, TEMPLATE_VERSION, get_schema, normalize_row
+
+BUNDLE_FORMAT = "konzern-template-bundle"
+BUNDLE_VERSION = 1
+MANIFEST = "manifest.json"
+FORMATS = ("csv", "parquet")
+
+# Zeilen je Parquet-Row-Group
+PARQUET_BATCH_ROWS = 65536
+# Schreibpuffer je offener CSV-Datei
+CSV_BUFFER_BYTES = 64 * 1024
+
+
+def _format_number(value):
+    if value is None:
+        return ""
+    text = repr(float(value))
+    return text[:-2] if text.endswith(".0") else text
+
+
+class CsvSheetSink:
+    def __init__(self, path, schema, append=False):
+        # append=True setzt eine bereits begonnene Datei fort (Header steht schon drin)
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8", buffering=CSV_BUFFER_BYTES)
+        self._writer = csv.writer(self._file)
+        if not append:
+            self._writer.writerow(schema.headers)
+        self._numeric = [schema.column_type(c) == NUMBER for c in schema.headers]
+
+    def write(self, row):
+        self._writer.writerow([
+            _format_number(v) if numeric else ("" if v is None else v)
+            for v, numeric in zip(row, self._numeric)
+        ])
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSheetSink:
+    def __init__(self, path, schema):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet-Bundles benötigen pyarrow (pip install pyarrow)") from None
+        self._pa = pa
+        self._schema = pa.schema([
+            (c, pa.float64() if schema.column_type(c) == NUMBER else pa.string()) for c in schema.headers
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        self._columns = [[] for _ in schema.headers]
+
+    def write(self, row):
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        if len(self._columns[0]) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._columns[0]:
+            batch = self._pa.record_batch(
+                [self._pa.array(values, type=f.type) for values, f in zip(self._columns, self._schema)],
+                schema=self._schema,
+            )
+            self._writer.write_batch(batch)
+            self._columns = [[] for _ in self._columns]
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+_SINKS = {"csv": CsvSheetSink, "parquet": ParquetSheetSink}
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BundleWriter:
+    """Schreibt ein Bundle Blatt für Blatt; manifest.json entsteht beim Schließen"""
+
+    def __init__(self, directory, fmt="csv", source=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unbekanntes Bundle-Format '{fmt}' - verfügbar: {', '.join(FORMATS)}")
+        self.directory = directory
+        self.format = fmt
+        self.source = source
+        self.sheets = []
+        os.makedirs(directory, exist_ok=True)
+
+    def write_sheet(self, sheet_name, rows):
+        """rows: bereits typisierte Zeilen in Schema-Reihenfolge; gibt die Zeilenzahl zurück"""
+        count = 0
+        for _ in self.tee(sheet_name, rows, normalize=False):
+            count += 1
+        return count
+
+    def tee(self, sheet_name, rows, normalize=True):
+        """
+        Reicht Template-Zeilen unverändert durch und schreibt sie nebenbei ins Bundle
+        (der Generator streamt so XLSX und Bundle in einem Durchlauf).
+        Berechnete Spalten werden wie die Formeln im Template neu berechnet.
+        """
+        schema = get_schema(sheet_name)
+        sink = _SINKS[self.format](self.sheet_path(sheet_name), schema)
+        count = 0
+        try:
+            for row in rows:
+                sink.write(normalize_row(schema, row, recompute=True) if normalize else row)
+                count += 1
+                yield row
+        finally:
+            sink.close()
+            self.register(sheet_name, count)
+
+    def sheet_path(self, sheet_name):
+        return os.path.join(self.directory, f"{get_schema(sheet_name).file}.{self.format}")
+
+    def register(self, sheet_name, rows):
+        """Trägt eine fertig geschriebene Blattdatei (siehe sheet_path) ins Manifest ein"""
+        schema = get_schema(sheet_name)
+        path = self.sheet_path(sheet_name)
+        self.sheets.append({
+            "name": schema.name,
+            "file": os.path.basename(path),
+            "rows": rows,
+            "sha256": _sha256(path),
+            "columns": [{"name": c, "type": schema.column_type(c)} for c in schema.headers],
+        })
+
+    def close(self):
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "template_version": TEMPLATE_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "source": self.source,
+            "file_format": self.format,
+            "sheets": self.sheets,
+        }
+        with open(os.path.join(self.directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{directory}: kein Template-Bundle (format={manifest.get('format')!r})")
+    if manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"{directory}: Bundle-Version {manifest['version']} wird nicht unterstützt")
+    return manifest
+
+
+def iter_bundle_rows(directory, sheet_name, manifest=None):
+    """Typisierte Zeilen eines Blatts aus dem Bundle (gestreamt)"""
+    manifest = manifest or read_manifest(directory)
+    entry = next((s for s in manifest["sheets"] if s["name"] == sheet_name), None)
+    if entry is None:
+        return
+    schema = get_schema(sheet_name)
+    path = os.path.join(directory, entry["file"])
+    if manifest["file_format"] == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=list(schema.headers)):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+        return
+    numeric = [schema.column_type(c) == NUMBER for c in schema.headers]
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        if tuple(header) != schema.headers:
+            raise ValueError(f"{path}: Header weichen vom Schema ab")
+        for record in reader:
+            yield [
+                (float(v) if v != "" else None) if is_num else v
+                for v, is_num in zip(record, numeric)
+            ]
+
+
+def xlsx_to_bundle(xlsx_path, directory, fmt="csv"):
+    """Ausgefülltes Template -> Bundle (read-only, zeilenweise)"""
+    from template_reader import data_sheets, iter_sheet_rows, open_template
+
+    wb = open_template(xlsx_path)
+    try:
+        bundle = BundleWriter(directory, fmt, source=os.path.basename(xlsx_path))
+        for schema in data_sheets(wb):
+            bundle.write_sheet(schema.name, (row for _, row in iter_sheet_rows(wb, schema.name)))
+        return bundle.close()
+    finally:
+        wb.close()
+
+
+def bundle_to_xlsx(directory, xlsx_path, engine="xml", **engine_options):
+    """Bundle -> Template; Blätter ohne Bundle-Datei bleiben leer"""
+    from create_excel_template import build_template
+
+    manifest = read_manifest(directory)
+    data = {schema.name: iter_bundle_rows(directory, schema.name, manifest) for schema in SCHEMAS}
+    return build_template(xlsx_path, engine, data, **engine_options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konvertiert zwischen Template (XLSX) und Spalten-Bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="XLSX -> Bundle")
+    export.add_argument("xlsx")
+    export.add_argument("directory")
+    export.add_argument("--format", choices=FORMATS, default="csv")
+    imp = sub.add_parser("import", help="Bundle -> XLSX")
+    imp.add_argument("directory")
+    imp.add_argument("xlsx")
+    imp.add_argument("--engine", default="xml")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        manifest = xlsx_to_bundle(args.xlsx, args.directory, args.format)
+        for sheet in manifest["sheets"]:
+            print(f"[Bundle] {sheet['name']}: {sheet['rows']} Zeilen -> {sheet['file']}")
+        print(f"[SUCCESS] Bundle erstellt: {args.directory}")
+    else:
+        metrics = bundle_to_xlsx(args.directory, args.xlsx, args.engine)
+        print(f"[SUCCESS] Template aus Bundle erstellt: {args.xlsx}")
+        print(f"[Template] {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
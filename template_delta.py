@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Inkrementelle Template-Builds (Delta-Regeneration)
+
+Jedes Blatt erhält einen Fingerabdruck über seine Eingabezeilen. Beim nächsten Build
+werden die Worksheet-Parts unveränderter Blätter roh (ohne Entpacken und Neu-Komprimieren)
+aus der vorherigen Ausgabedatei übernommen; nur geänderte Blätter werden neu erzeugt.
+
+Workbook-Parts (workbook.xml, Rels, Content-Types, styles.xml) werden immer neu
+geschrieben. Die Shared-String-Tabelle der Vorgängerdatei wird übernommen, damit die
+Indizes in übernommenen Blättern gültig bleiben - Strings ersetzter Zeilen bleiben
+bis zum nächsten vollständigen Build in der Tabelle.
+
+Fingerabdrücke und Part-Zuordnung stehen neben der Ausgabedatei in
+<Datei>.fingerprints.json. Passt die Datei nicht mehr dazu (z.B. in Excel gespeichert)
+oder haben sich Generator-Code bzw. Engine-Optionen geändert, wird vollständig neu gebaut.
+Nur für die xml-Engine.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import zipfile
+
+from template_writer import format_compression, parse_compression
+
+SIDECAR_SUFFIX = ".fingerprints.json"
+SIDECAR_VERSION = 1
+
+# Quelltexte, die Aussehen und Inhalt der Blätter bestimmen (Zeilen-Hash, Prüfsummen über
+# normalisierte Zeilen) - Änderungen erzwingen einen vollständigen Build
+GENERATOR_FILES = ("create_excel_template.py", "template_writer.py", "template_rowhash.py", "template_schema.py")
+
+
+def generator_fingerprint(max_rows, engine_options, defined_names=None):
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in GENERATOR_FILES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(f.read())
+    options = {
+        "max_rows": max_rows,
+        "strings": engine_options.get("strings", "shared"),
+        "compression": format_compression(parse_compression(engine_options.get("compression", "default"))),
+        # Validierungen verweisen auf Namen oder Inline-Listen - je nach Blattauswahl
+        "names": sorted(defined_names or ()),
+    }
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SpooledRows:
+    """Einmal gelesene Zeilen (z.B. aus einem Generator) erneut abspielbar - aus einer Temp-Datei"""
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for _ in range(self.count):
+                yield pickle.load(f)
+
+
+def fingerprint_rows(sheet_name, rows, spool_dir):
+    """
+    Gibt (Fingerabdruck, Zeilen) zurück. Listen/Tupel werden direkt verwendet,
+    andere Iterables beim Hashen in `spool_dir` zwischengespeichert.
+    """
+    digest = hashlib.sha256(sheet_name.encode("utf-8"))
+    if rows is None:
+        return digest.hexdigest(), rows
+    if isinstance(rows, (list, tuple)):
+        # zeilenweise wie beim Spoolen - gleiche Zeilen ergeben denselben Fingerabdruck
+        for row in rows:
+            digest.update(repr(row).encode("utf-8"))
+            digest.update(b"\n")
+        return digest.hexdigest(), rows
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix=".rows")
+    count = 0
+    with os.fdopen(fd, "wb", buffering=1 << 20) as f:
+        for row in rows:
+            digest.update(repr(row).encode("utf-8"))
+            digest.update(b"\n")
+            pickle.dump(row, f, pickle.HIGHEST_PROTOCOL)
+            count += 1
+    return digest.hexdigest(), SpooledRows(path, count)
+
+
+class DeltaBuild:
+    """
+    Ein inkrementeller Build von `filename`: prepare() je Blatt vor dem Schreiben,
+    start(writer), dann je Blatt reuse() oder Neu-Erzeugung + record(), zum Schluss finish().
+    Geschrieben wird in eine Temp-Datei neben dem Ziel, die erst in finish() das Ziel ersetzt.
+    """
+
+    def __init__(self, filename, max_rows, engine_options, defined_names=None):
+        self.filename = filename
+        self.sidecar_path = filename + SIDECAR_SUFFIX
+        self.temp_path = filename + ".partial"
+        self.generator = generator_fingerprint(max_rows, engine_options, defined_names)
+        self.previous = self._load_previous()
+        self.fingerprints = {}
+        self.parts = {}
+        self.reused = []
+        self.rebuilt = []
+        self._source = None
+        self._spool_dir = tempfile.mkdtemp(prefix="template-delta-")
+
+    def _load_previous(self):
+        """Blatt-Einträge der Sidecar - leer, wenn sie fehlt oder nicht mehr zur Datei passt"""
+        try:
+            with open(self.sidecar_path, encoding="utf-8") as f:
+                sidecar = json.load(f)
+            stat = os.stat(self.filename)
+        except (OSError, ValueError):
+            return {}
+        if (
+            sidecar.get("version") != SIDECAR_VERSION
+            or sidecar.get("generator") != self.generator
+            or sidecar.get("file") != {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        ):
+            return {}
+        return sidecar.get("sheets", {})
+
+    def prepare(self, sheet_name, rows):
+        fingerprint, rows = fingerprint_rows(sheet_name, rows, self._spool_dir)
+        self.fingerprints[sheet_name] = fingerprint
+        return rows
+
+    def _reusable(self, sheet_name):
+        entry = self.previous.get(sheet_name)
+        return entry is not None and entry["fingerprint"] == self.fingerprints.get(sheet_name)
+
+    def start(self, writer):
+        """Öffnet die Vorgängerdatei, falls mindestens ein Blatt übernommen werden kann"""
+        if not any(self._reusable(name) for name in self.fingerprints):
+            return
+        self._source = zipfile.ZipFile(self.filename)
+        if writer.shared_strings is not None:
+            writer.load_shared_strings(self._source)
+
+    def reuse(self, writer, sheet_name):
+        """Übernimmt alle Parts (inkl. Folgeblätter) eines unveränderten Blatts; False wenn neu zu erzeugen"""
+        if self._source is None or not self._reusable(sheet_name):
+            self.rebuilt.append(sheet_name)
+            return False
+        sheets = []
+        for part in self.previous[sheet_name]["parts"]:
+            ws = writer.copy_sheet(part["title"], part["kind"], self._source, part["part"], part["rows"], part["cells"])
+            if part.get("digest"):
+                ws.row_digest = tuple(part["digest"])
+            sheets.append(ws)
+        self.record(sheet_name, sheets)
+        self.reused.append(sheet_name)
+        return True
+
+    def record(self, sheet_name, sheets):
+        self.parts[sheet_name] = [
+            {
+                "title": ws.title, "kind": ws.kind, "part": ws.part_name, "rows": ws.row_count, "cells": ws.cell_count,
+                "digest": ws.row_digest,
+            }
+            for ws in sheets
+        ]
+
+    def finish(self):
+        """Ersetzt die Zieldatei und schreibt die neue Sidecar"""
+        self._cleanup()
+        os.replace(self.temp_path, self.filename)
+        stat = os.stat(self.filename)
+        sidecar = {
+            "version": SIDECAR_VERSION,
+            "generator": self.generator,
+            "file": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+            "sheets": {
+                name: {"fingerprint": self.fingerprints[name], "parts": parts}
+                for name, parts in self.parts.items()
+            },
+        }
+        with open(self.sidecar_path, "w", encoding="utf-8") as f:
+            json.dump(sidecar, f, ensure_ascii=False, indent=2)
+
+    def abort(self):
+        self._cleanup()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+    def _cleanup(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        shutil.rmtree(self._spool_dir, ignore_errors=True)
+
+    def summary(self):
+        return f"{len(self.reused)} Blätter übernommen, {len(self.rebuilt)} neu erzeugt" + (
+            f" ({', '.join(self.rebuilt)})" if self.rebuilt else ""
+        )
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Zwischenergebniseliminierung (§ 304 HGB) für Zwischengesellschaftsgeschäfte
+
+Berechnet den Eliminierungsbetrag aller Lieferungen und Dienstleistungen mit
+Gewinnmarge, statt ihn von Hand einzutragen:
+
+    Eliminierungsbetrag = Betrag x Gewinnmarge x Bestandsquote x Faktor(Methode)
+
+  - Bestandsquote: Anteil einer Lieferung, der am Stichtag noch im Vorratsbestand des
+    empfangenden Unternehmens liegt (Standard 100 %, je Empfänger überschreibbar).
+    Dienstleistungen werden immer voll angesetzt.
+  - Vollständig: Faktor 1
+  - Teilweise: durchgerechnete Konzernquote der Tochter - beim Verkauf einer Tochter
+    (upstream/Schwestern) die des Verkäufers, sonst die des Käufers
+  - Zeitanteilig: Anteil des Geschäftsjahres seit Erwerb der (zuletzt erworbenen)
+    beteiligten Tochter bis zum Stichtag
+
+Quoten und Erwerbsdaten kommen aus Beteiligungsverhältnissen bzw.
+Unternehmensinformationen. Die Geschäfte werden blockweise gelesen und je Block
+vektorisiert berechnet (numpy, falls installiert); übrige Zeilen und Blätter werden
+unverändert übernommen. Ausgabe ist ein neues Template oder Bundle.
+
+Aufruf:
+    python template_elimination.py EINGABE AUSGABE [--stichtag 2025-12-31]
+        [--bestand 100] [--bestand-fuer "Tochterunternehmen TU1=40" ...]
+    EINGABE: XLSX oder Bundle-Verzeichnis; AUSGABE: .xlsx oder Verzeichnis (Bundle)
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+from template_reader import open_rows
+from template_schema import SCHEMAS, get_schema
+
+try:
+    import numpy as np
+except ImportError:  # optional - ohne numpy wird zeilenweise gerechnet
+    np = None
+
+SHEET = "Zwischengesellschaftsgeschäfte"
+# Geschäfte mit Zwischengewinn; nur Lieferungen liegen im Vorratsbestand
+PROFIT_TYPES = ("Lieferung", "Dienstleistung")
+INVENTORY_TYPES = ("Lieferung",)
+
+METHOD_FULL = "Vollständig"
+METHOD_PARTIAL = "Teilweise"
+METHOD_TIME = "Zeitanteilig"
+METHODS = (METHOD_FULL, METHOD_PARTIAL, METHOD_TIME)
+
+# Zeilen je vektorisiertem Block
+BATCH_ROWS = 65536
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class Ownership:
+    """Durchgerechnete Konzernquoten und Erwerbsdaten aus Beteiligungen und Unternehmensinformationen"""
+
+    def __init__(self):
+        self._parents = {}  # Tochter -> (Mutter, Quote 0..1)
+        self._acquired = {}  # Unternehmen -> Erwerbsdatum
+        self._shares = {}
+
+    def add_participation(self, parent, child, percent, acquired=None):
+        if child and percent is not None:
+            self._parents[child] = (parent, percent / 100)
+        if child and acquired:
+            self._acquired[child] = acquired
+
+    def add_company(self, name, percent, acquired):
+        """Angaben aus Unternehmensinformationen - nur falls die Beteiligungen nichts enthalten"""
+        if name and name not in self._parents and percent is not None and percent < 100:
+            self._parents[name] = (None, percent / 100)
+        if name and acquired and name not in self._acquired:
+            self._acquired[name] = acquired
+
+    def share(self, company):
+        """Quote des Konzerns (Mutter = 1.0) über alle Beteiligungsstufen; unbekannte Unternehmen 1.0"""
+        cached = self._shares.get(company)
+        if cached is not None:
+            return cached
+        share, current, seen = 1.0, company, set()
+        while current in self._parents and current not in seen:
+            seen.add(current)
+            current, quote = self._parents[current]
+            share *= quote
+        self._shares[company] = share
+        return share
+
+    def acquired(self, company):
+        return self._acquired.get(company)
+
+
+def load_ownership(rows):
+    ownership = Ownership()
+    beteiligung = get_schema("Beteiligungsverhältnisse")
+    cols = [beteiligung.index(c) for c in ("Mutterunternehmen", "Tochterunternehmen", "Beteiligungs-%", "Erwerbsdatum")]
+    for row in rows("Beteiligungsverhältnisse"):
+        parent, child, percent, acquired = (row[c] for c in cols)
+        ownership.add_participation(parent, child, percent, _parse_date(acquired))
+    unternehmen = get_schema("Unternehmensinformationen")
+    cols = [unternehmen.index(c) for c in ("Unternehmensname", "Beteiligungs-%", "Erwerbsdatum")]
+    for row in rows("Unternehmensinformationen"):
+        name, percent, acquired = (row[c] for c in cols)
+        ownership.add_company(name, percent, _parse_date(acquired))
+    return ownership
+
+
+def time_factor(acquired, closing_date):
+    """Anteil des Geschäftsjahres (bis Stichtag), in dem das Unternehmen zum Konzern gehörte"""
+    year_start = date(closing_date.year, 1, 1)
+    if acquired is None or acquired <= year_start:
+        return 1.0
+    if acquired > closing_date:
+        return 0.0
+    return ((closing_date - acquired).days + 1) / ((closing_date - year_start).days + 1)
+
+
+def elimination_amounts(amounts, margins, inventory, factors):
+    """Vektorisiert: Betrag x Marge (%) x Bestandsquote x Methodenfaktor, auf Cent gerundet"""
+    if np is None:
+        return [round(a * m / 100 * q * f, 2) for a, m, q, f in zip(amounts, margins, inventory, factors)]
+    result = (
+        np.asarray(amounts, dtype=np.float64) * np.asarray(margins, dtype=np.float64) / 100
+        * np.asarray(inventory, dtype=np.float64) * np.asarray(factors, dtype=np.float64)
+    )
+    return np.round(result, 2).tolist()
+
+
+@dataclass
+class EliminationStats:
+    rows: int = 0
+    computed: dict = field(default_factory=lambda: {m: 0 for m in METHODS})
+    total: float = 0.0
+    changed: int = 0
+    skipped: dict = field(default_factory=dict)  # unbekannte Methode -> Anzahl
+
+
+class EliminationCalculator:
+    def __init__(self, ownership, closing_date, inventory_share=100.0, inventory_for=None):
+        self.ownership = ownership
+        self.closing_date = closing_date
+        self.inventory_share = inventory_share / 100
+        self.inventory_for = {k: v / 100 for k, v in (inventory_for or {}).items()}
+        self.stats = EliminationStats()
+        schema = get_schema(SHEET)
+        (self._from, self._to, self._type, self._amount, self._margin, self._method, self._result) = (
+            schema.index(c) for c in (
+                "Von Unternehmen", "An Unternehmen", "Transaktionstyp", "Betrag",
+                "Gewinnmarge", "Eliminierungsmethode", "Eliminierungsbetrag",
+            )
+        )
+
+    def _factor(self, method, seller, buyer):
+        if method == METHOD_FULL:
+            return 1.0
+        seller_share = self.ownership.share(seller)
+        if method == METHOD_PARTIAL:
+            return seller_share if seller_share < 1.0 else self.ownership.share(buyer)
+        dates = [d for d in (self.ownership.acquired(seller), self.ownership.acquired(buyer)) if d]
+        return time_factor(max(dates) if dates else None, self.closing_date)
+
+    def process(self, rows):
+        """Liest die Geschäfte blockweise und gibt sie mit berechnetem Eliminierungsbetrag zurück"""
+        rows = iter(rows)
+        while True:
+            batch = [list(row) for row in itertools.islice(rows, BATCH_ROWS)]
+            if not batch:
+                return
+            self._process_batch(batch)
+            yield from batch
+
+    def _process_batch(self, batch):
+        stats = self.stats
+        stats.rows += len(batch)
+        targets, amounts, margins, inventory, factors = [], [], [], [], []
+        for row in batch:
+            if row[self._type] not in PROFIT_TYPES or row[self._margin] is None:
+                continue
+            method = row[self._method] or METHOD_FULL
+            if method not in METHODS:
+                stats.skipped[method] = stats.skipped.get(method, 0) + 1
+                continue
+            seller, buyer = row[self._from], row[self._to]
+            targets.append(row)
+            amounts.append(row[self._amount] or 0.0)
+            margins.append(row[self._margin])
+            inventory.append(
+                self.inventory_for.get(buyer, self.inventory_share) if row[self._type] in INVENTORY_TYPES else 1.0
+            )
+            factors.append(self._factor(method, seller, buyer))
+            stats.computed[method] += 1
+        for row, value in zip(targets, elimination_amounts(amounts, margins, inventory, factors)):
+            if row[self._result] is None or abs(row[self._result] - value) >= 0.005:
+                stats.changed += 1
+            row[self._result] = value
+            stats.total += value
+
+
+def eliminate(input_path, output, closing_date, inventory_share=100.0, inventory_for=None, engine="xml", fmt="csv"):
+    """EINGABE (XLSX/Bundle) -> AUSGABE (.xlsx oder Bundle-Verzeichnis) mit berechneten Eliminierungsbeträgen"""
+    if os.path.abspath(input_path) == os.path.abspath(output):
+        raise ValueError("Ausgabe muss sich von der Eingabe unterscheiden (die Eingabe wird gestreamt gelesen)")
+    with open_rows(input_path) as rows:
+        calculator = EliminationCalculator(load_ownership(rows), closing_date, inventory_share, inventory_for)
+        data = {
+            schema.name: calculator.process(rows(SHEET)) if schema.name == SHEET else rows(schema.name)
+            for schema in SCHEMAS
+        }
+        if output.lower().endswith(".xlsx"):
+            from create_excel_template import build_template
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_template(output, engine, data)
+        else:
+            from template_bundle import BundleWriter
+
+            bundle = BundleWriter(output, fmt, source=os.path.basename(os.path.normpath(input_path)))
+            for name, sheet_rows in data.items():
+                bundle.write_sheet(name, sheet_rows)
+            bundle.close()
+    return calculator.stats
+
+
+def _parse_inventory_for(values):
+    result = {}
+    for value in values:
+        company, sep, percent = value.rpartition("=")
+        if not sep or not company:
+            raise ValueError(f"Ungültige Bestandsquote '{value}' (erwartet UNTERNEHMEN=PROZENT)")
+        result[company.strip()] = float(percent)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Berechnet die Zwischenergebniseliminierung für Zwischengesellschaftsgeschäfte")
+    parser.add_argument("input", help="Ausgefülltes Template (XLSX) oder Bundle-Verzeichnis")
+    parser.add_argument("output", help="Ziel: .xlsx oder Verzeichnis für ein Bundle")
+    parser.add_argument("--stichtag", type=date.fromisoformat, default=date(date.today().year, 12, 31),
+                        help="Bilanzstichtag für zeitanteilige Eliminierung (Standard: 31.12. des laufenden Jahres)")
+    parser.add_argument("--bestand", type=float, default=100.0, help="Bestandsquote beim Empfänger in %% (Standard: 100)")
+    parser.add_argument("--bestand-fuer", action="append", default=[], metavar="UNTERNEHMEN=PROZENT",
+                        help="Bestandsquote je empfangendem Unternehmen (mehrfach möglich)")
+    parser.add_argument("--engine", default="xml")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv", help="Format bei Bundle-Ausgabe")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = eliminate(
+        args.input, args.output, args.stichtag, args.bestand, _parse_inventory_for(args.bestand_fuer),
+        args.engine, args.format,
+    )
+    computed = ", ".join(f"{method}: {count:,}" for method, count in stats.computed.items())
+    print(f"[Elimination] {stats.rows:,} Geschäfte, berechnet: {computed}")
+    for method, count in stats.skipped.items():
+        print(f"[WARN] {count:,} Zeilen mit unbekannter Eliminierungsmethode '{method}' unverändert")
+    print(f"[Elimination] Summe Eliminierungsbeträge: {stats.total:,.2f} ({stats.changed:,} geändert)")
+    print(f"[SUCCESS] {args.output} in {time.perf_counter() - started:.2f}s erstellt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Paralleler Reader für ausgefüllte Templates (ein Worksheet-Teil je Prozess)
+
+openpyxl liest die Blätter eines Templates nacheinander in einem Prozess. Dieser
+Reader bildet die XLSX-Datei per mmap ab, löst sharedStrings.xml einmal im
+Hauptprozess auf (Worker erben die Tabelle per fork bzw. einmal je Worker über den
+Initializer) und parst jedes Worksheet - auch Folgeblätter wie 'Bilanzdaten (2)' -
+in einem eigenen Prozess mit einem inkrementellen Parser (ElementTree.iterparse).
+Jeder Worker liefert eine spaltenorientierte ColumnTable (template_table); Teilblätter
+werden danach aneinandergehängt.
+
+Ergebnisse entsprechen template_reader (Header-Suche, Summenzeile beendet die Tabelle,
+Formeln werden wie im Schema neu berechnet). Datumswerte als Excel-Seriennummer
+werden in ISO-Text umgewandelt.
+
+Aufruf:
+    python template_fastread.py GEFUELLT.xlsx [--jobs N] [--compare]
+"""
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import posixpath
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from xml.etree.ElementTree import iterparse
+
+from template_reader import HEADER_SCAN_ROWS, TemplateFormatError, _header_map
+from template_schema import DATE, SCHEMAS, get_schema, is_empty_row, normalize_row
+from template_table import ColumnTable
+from template_writer import continuation_title
+
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_ROW, _C, _V, _F, _IS, _T, _SI = (NS_MAIN + tag for tag in ("row", "c", "v", "f", "is", "t", "si"))
+
+# Kleinere Dateien (komprimiert) werden ohne Prozess-Pool gelesen
+PARALLEL_MIN_BYTES = 512 * 1024
+_EXCEL_EPOCH = date(1899, 12, 30)
+
+# Vom Hauptprozess gesetzt; Worker erben sie (fork) oder bekommen sie einmal per Initializer
+_shared_strings = []
+
+
+def _init_worker(shared_strings):
+    global _shared_strings
+    _shared_strings = shared_strings
+
+
+class _Mapping(mmap.mmap):
+    """mmap als Datei für zipfile (seekable() gibt es bei mmap erst ab Python 3.13)"""
+
+    def seekable(self):
+        return True
+
+
+class MappedZip:
+    """XLSX per mmap geöffnet - Worker öffnen dieselbe Datei und teilen sich den Page-Cache"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = _Mapping(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.zip = zipfile.ZipFile(self._map)
+
+    def close(self):
+        self.zip.close()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_shared_strings(zf):
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    strings = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _SI:
+                # Rich-Text: alle <t> einer <si> aneinanderhängen
+                strings.append("".join(t.text or "" for t in elem.iter(_T)))
+                elem.clear()
+    return strings
+
+
+def sheet_part_names(zf):
+    """{Blattname: Zip-Pfad des Worksheet-Teils}"""
+    from xml.etree.ElementTree import fromstring
+
+    rels = fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(NS_PKG_REL + "Relationship")}
+    workbook = fromstring(zf.read("xl/workbook.xml"))
+    parts = {}
+    for sheet in workbook.iter(NS_MAIN + "sheet"):
+        target = targets[sheet.get(NS_REL + "id")]
+        parts[sheet.get("name")] = target.lstrip("/") if target.startswith("/") else posixpath.normpath(
+            posixpath.join("xl", target)
+        )
+    return parts
+
+
+_column_cache = {}
+
+
+def _column_index(ref):
+    """'AB12' -> 27 (0-basiert)"""
+    letters = ref.rstrip("0123456789")
+    idx = _column_cache.get(letters)
+    if idx is None:
+        idx = 0
+        for ch in letters:
+            idx = idx * 26 + ord(ch) - 64
+        idx = _column_cache[letters] = idx - 1
+    return idx
+
+
+def iter_part_rows(stream, strings=None):
+    """
+    (Zeilennummer, Werte) eines Worksheet-Teils - Werte wie openpyxl (data_only=False: Formeln als '=...').
+    strings: Shared Strings (Standard: die im Prozess geladene Tabelle)
+    """
+    if strings is None:
+        strings = _shared_strings
+    row_number = 0
+    for _, elem in iterparse(stream):
+        if elem.tag != _ROW:
+            continue
+        r = elem.get("r")
+        row_number = int(r) if r else row_number + 1
+        values = []
+        for position, cell in enumerate(elem.iter(_C)):
+            ref = cell.get("r")
+            col = _column_index(ref) if ref else position
+            if col >= len(values):
+                values.extend([None] * (col + 1 - len(values)))
+            formula = cell.find(_F)
+            if formula is not None and formula.text:
+                values[col] = "=" + formula.text
+                continue
+            kind = cell.get("t")
+            if kind == "inlineStr":
+                inline = cell.find(_IS)
+                values[col] = "".join(t.text or "" for t in inline.iter(_T)) if inline is not None else None
+                continue
+            v = cell.find(_V)
+            if v is None or v.text is None:
+                continue
+            text = v.text
+            if kind == "s":
+                values[col] = strings[int(text)]
+            elif kind == "b":
+                values[col] = text == "1"
+            elif kind in ("str", "e"):
+                values[col] = text
+            else:
+                number = float(text)
+                values[col] = int(number) if number.is_integer() and "." not in text and "E" not in text else number
+        elem.clear()
+        yield row_number, values
+
+
+def _serial_to_iso(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (_EXCEL_EPOCH + timedelta(days=value)).isoformat()
+    return value
+
+
+class PartRows:
+    """
+    Typisierte Datenzeilen eines Worksheet-Teils (aus iter_part_rows). Die Header-Zeile wird
+    beim Anlegen gesucht (wie template_reader.locate_header); footer wird True, sobald die
+    Summenzeile erreicht ist.
+    """
+
+    def __init__(self, schema, rows):
+        self.schema = schema
+        self.footer = False
+        self._rows = rows
+        self._date_columns = [idx for idx, column in enumerate(schema.headers) if schema.column_type(column) == DATE]
+        self.mapping = None
+        for row_number, values in rows:
+            if row_number > schema.header_row + HEADER_SCAN_ROWS:
+                break
+            self.mapping = _header_map(schema, values)
+            if self.mapping is not None:
+                break
+        if self.mapping is None:
+            raise TemplateFormatError(
+                f"Blatt '{schema.name}': Header-Zeile nicht gefunden (erwartet: {', '.join(schema.headers)})"
+            )
+
+    def __iter__(self):
+        schema, mapping, width = self.schema, self.mapping, self.schema.width
+        identity = mapping == list(range(width))
+        for _, values in self._rows:
+            if identity:
+                values = values[:width]
+            else:
+                values = [values[col] if col is not None and col < len(values) else None for col in mapping]
+            if is_empty_row(values):
+                continue
+            if schema.footer_labels and str(values[0]).strip() in schema.footer_labels:
+                self.footer = True
+                return
+            for idx in self._date_columns:
+                if idx < len(values):
+                    values[idx] = _serial_to_iso(values[idx])
+            yield normalize_row(schema, values)
+
+
+def parse_part(path, sheet_name, part_name):
+    """Worker: ein Worksheet-Teil -> (ColumnTable, Summenzeile erreicht)"""
+    schema = get_schema(sheet_name)
+    table = ColumnTable(schema)
+    with MappedZip(path) as mz, mz.zip.open(part_name) as stream:
+        rows = PartRows(schema, iter_part_rows(stream))
+        table.extend(rows)
+    return table, rows.footer
+
+
+def _tasks(mz, sheets):
+    """[(Blattname, Teilnummer, Zip-Pfad)] - größte Teile zuerst (bessere Auslastung)"""
+    parts = sheet_part_names(mz.zip)
+    tasks = []
+    for schema in SCHEMAS:
+        if schema.name not in parts or (sheets and schema.name not in sheets):
+            continue
+        number, title = 1, schema.name
+        while title in parts:
+            tasks.append((schema.name, number, parts[title]))
+            number += 1
+            title = continuation_title(schema.name, number)
+    sizes = {info.filename: info.compress_size for info in mz.zip.infolist()}
+    return sorted(tasks, key=lambda task: -sizes.get(task[2], 0))
+
+
+def read_template_tables(path, sheets=None, jobs=None):
+    """Datenblätter -> {Blattname: ColumnTable}; Blätter und Teilblätter werden parallel geparst"""
+    global _shared_strings
+    with MappedZip(path) as mz:
+        _shared_strings = read_shared_strings(mz.zip)
+        tasks = _tasks(mz, sheets)
+    results = {}
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) < 2 or os.path.getsize(path) < PARALLEL_MIN_BYTES:
+        for name, number, part in tasks:
+            results[(name, number)] = parse_part(path, name, part)
+    else:
+        # fork: Worker erben die Shared Strings ohne Kopie; sonst einmal je Worker übertragen
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        initargs = () if context.get_start_method() == "fork" else (_shared_strings,)
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(tasks)), mp_context=context,
+            initializer=_init_worker if initargs else None, initargs=initargs,
+        ) as pool:
+            futures = {
+                (name, number): pool.submit(parse_part, path, name, part)
+                for name, number, part in tasks
+            }
+            results = {key: future.result() for key, future in futures.items()}
+
+    tables = {}
+    for schema in SCHEMAS:
+        parts = []
+        for number in range(1, len(results) + 1):
+            if (schema.name, number) not in results:
+                break
+            table, footer = results[(schema.name, number)]
+            parts.append(table)
+            if footer:
+                break  # Summenzeile beendet die Tabelle - wie template_reader
+        if parts:
+            tables[schema.name] = ColumnTable.concat(parts)
+    return tables
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Liest ein ausgefülltes Template parallel (ein Prozess je Blatt)")
+    parser.add_argument("template")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker-Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--compare", action="store_true", help="Mit template_reader (openpyxl) vergleichen")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    tables = read_template_tables(args.template, jobs=args.jobs)
+    elapsed = time.perf_counter() - started
+    for name, table in tables.items():
+        print(f"  - {name}: {len(table):,} Zeilen, {table.nbytes() / 1e6:,.1f} MB")
+    print(f"[FastRead] {sum(len(t) for t in tables.values()):,} Zeilen in {elapsed:.2f}s")
+
+    if args.compare:
+        from template_reader import iter_sheet_rows, open_template
+
+        started = time.perf_counter()
+        wb = open_template(args.template)
+        try:
+            reference = {name: [row for _, row in iter_sheet_rows(wb, name)] for name in tables}
+        finally:
+            wb.close()
+        baseline = time.perf_counter() - started
+        equal = all([list(row) for row in tables[name]] == rows for name, rows in reference.items())
+        print(f"[FastRead] openpyxl: {baseline:.2f}s ({baseline / elapsed:.1f}x) - Ergebnisse gleich: {equal}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Referenzprüfung ausgefüllter Templates
+
+Unternehmensnamen (Unternehmensinformationen) und die Werte des Blatts 'Auswahllisten'
+werden in Hash-Sets indiziert - dieselben Listen, aus denen die Dropdowns des Templates
+kommen (benannte Bereiche, siehe NAMED_LISTS im Generator). Danach werden alle
+Datenblätter in einem Durchlauf (read-only, zeilenweise) gegen den Index geprüft:
+Unternehmen, Gegenparteien, Von/An-Unternehmen, Währungen und Kontotypen müssen
+bekannt sein. Die Dropdowns erlauben weiterhin freie Eingaben - erst diese Prüfung
+findet Tippfehler wie 'Tochter GmbH' statt 'Tochterunternehmen GmbH'.
+
+Ohne Blatt 'Auswahllisten' gelten die Listen des Generators; ohne
+Unternehmensinformationen werden Unternehmensspalten nicht geprüft.
+
+Aufruf:
+    python template_integrity.py GEFUELLT.xlsx [--limit 50]
+"""
+
+import argparse
+import sys
+from dataclasses import dataclass
+
+import create_excel_template as tpl
+from template_reader import data_sheets, iter_sheet_part_rows, iter_sheet_rows, open_template
+from template_schema import get_schema
+
+LOOKUP_SHEET = "Auswahllisten"
+
+# Blatt -> {Spalte: Liste (Name aus NAMED_LISTS)}
+REFERENCES = {
+    "Bilanzdaten": {
+        "Unternehmen": tpl.NAME_UNTERNEHMEN,
+        "Gegenpartei": tpl.NAME_UNTERNEHMEN,
+        "Kontotyp": tpl.NAME_KONTOTYP_BILANZ,
+    },
+    "GuV-Daten": {
+        "Unternehmen": tpl.NAME_UNTERNEHMEN,
+        "Gegenpartei": tpl.NAME_UNTERNEHMEN,
+        "Kontotyp": tpl.NAME_KONTOTYP_GUV,
+    },
+    "Beteiligungsverhältnisse": {
+        "Mutterunternehmen": tpl.NAME_UNTERNEHMEN,
+        "Tochterunternehmen": tpl.NAME_UNTERNEHMEN,
+    },
+    "Zwischengesellschaftsgeschäfte": {
+        "Von Unternehmen": tpl.NAME_UNTERNEHMEN,
+        "An Unternehmen": tpl.NAME_UNTERNEHMEN,
+    },
+    "Eigenkapital-Aufteilung": {"Unternehmen": tpl.NAME_UNTERNEHMEN},
+    "Währungsumrechnung": {
+        "Unternehmen": tpl.NAME_UNTERNEHMEN,
+        "Währung (ISO)": tpl.NAME_WAEHRUNGEN,
+    },
+    "Latente Steuern": {"Unternehmen": tpl.NAME_UNTERNEHMEN},
+}
+
+# Werte der Auswahllisten laut Generator (falls das Blatt fehlt)
+DEFAULT_LISTS = {
+    tpl.NAME_WAEHRUNGEN: tpl.waehrungen,
+    tpl.NAME_KONTOTYP_BILANZ: tpl.kontotypen_bilanz,
+    tpl.NAME_KONTOTYP_GUV: tpl.kontotypen_guv,
+}
+
+
+def _key(value):
+    """Vergleichsschlüssel: Groß-/Kleinschreibung und Randleerzeichen spielen keine Rolle"""
+    return str(value).strip().casefold()
+
+
+class ReferenceIndex:
+    """Hash-Set je Liste; Listen ohne Quelle (None) werden nicht geprüft"""
+
+    def __init__(self):
+        self._lists = {}
+
+    def add(self, list_name, value):
+        if value is not None and str(value).strip():
+            self._lists.setdefault(list_name, set()).add(_key(value))
+
+    def add_all(self, list_name, values):
+        self._lists.setdefault(list_name, set())
+        for value in values:
+            self.add(list_name, value)
+
+    def has_list(self, list_name):
+        return list_name in self._lists
+
+    def __contains__(self, item):
+        list_name, value = item
+        return _key(value) in self._lists[list_name]
+
+    def sizes(self):
+        return {name: len(values) for name, values in self._lists.items()}
+
+
+@dataclass
+class Violation:
+    """Unbekannter Wert - einmal je (Blatt, Spalte, Wert) mit Anzahl und erster Fundstelle"""
+
+    sheet: str
+    column: str
+    value: str
+    list_name: str
+    first_part: str
+    first_row: int
+    count: int = 1
+
+    def describe(self):
+        more = f" (+{self.count - 1} weitere Zeilen)" if self.count > 1 else ""
+        return (
+            f"{self.sheet}: '{self.value}' in Spalte '{self.column}' nicht in {self.list_name} "
+            f"- {self.first_part}!{self.first_row}{more}"
+        )
+
+
+def build_index(wb):
+    index = ReferenceIndex()
+    if "Unternehmensinformationen" in wb.sheetnames:
+        col = get_schema("Unternehmensinformationen").index("Unternehmensname")
+        index.add_all(tpl.NAME_UNTERNEHMEN, (row[col] for _, row in iter_sheet_rows(wb, "Unternehmensinformationen")))
+
+    lookup_columns = {
+        name: ord(letter) - ord("A")
+        for name, (sheet, letter, _) in tpl.NAMED_LISTS.items() if sheet == LOOKUP_SHEET
+    }
+    if LOOKUP_SHEET in wb.sheetnames:
+        for name in lookup_columns:
+            index.add_all(name, ())
+        for values in wb[LOOKUP_SHEET].iter_rows(min_row=2, values_only=True):
+            for name, col in lookup_columns.items():
+                if col < len(values):
+                    index.add(name, values[col])
+    else:
+        for name, values in DEFAULT_LISTS.items():
+            index.add_all(name, values)
+    return index
+
+
+def check_references(wb, index=None):
+    """Prüft alle Datenblätter in einem Durchlauf; gibt (Verstöße, geprüfte Zeilen) zurück"""
+    index = index or build_index(wb)
+    violations = {}
+    rows_checked = 0
+    for schema in data_sheets(wb):
+        checks = [
+            (column, schema.index(column), list_name)
+            for column, list_name in REFERENCES.get(schema.name, {}).items()
+            if index.has_list(list_name)
+        ]
+        if not checks:
+            continue
+        for part, row_idx, row in iter_sheet_part_rows(wb, schema.name):
+            rows_checked += 1
+            for column, col, list_name in checks:
+                value = row[col]
+                if not value or (list_name, value) in index:
+                    continue
+                key = (schema.name, column, value)
+                found = violations.get(key)
+                if found is None:
+                    violations[key] = Violation(schema.name, column, value, list_name, part, row_idx)
+                else:
+                    found.count += 1
+    return list(violations.values()), rows_checked
+
+
+def check_template(path):
+    wb = open_template(path)
+    try:
+        index = build_index(wb)
+        violations, rows_checked = check_references(wb, index)
+        return violations, rows_checked, index.sizes()
+    finally:
+        wb.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prüft Unternehmens-, Währungs- und Kontotyp-Referenzen eines Templates")
+    parser.add_argument("template")
+    parser.add_argument("--limit", type=int, default=50, help="Maximal ausgegebene Verstöße")
+    args = parser.parse_args(argv)
+
+    violations, rows_checked, sizes = check_template(args.template)
+    lists = ", ".join(f"{name}: {size}" for name, size in sizes.items())
+    print(f"[Integrity] {rows_checked:,} Zeilen geprüft ({lists})")
+    for violation in violations[:args.limit]:
+        print(f"  - {violation.describe()}")
+    if len(violations) > args.limit:
+        print(f"  ... {len(violations) - args.limit} weitere")
+    if violations:
+        print(f"[ERROR] {len(violations)} unbekannte Referenzen")
+        sys.exit(1)
+    print("[SUCCESS] Alle Referenzen gültig")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+Persistente Job-Queue für Batch-Läufe (Template-Erstellung, Zusammenführung, Prüfung)
+
+Jobs liegen in einer SQLite-Datei (WAL) und überleben Abbrüche des Runners:
+
+  - Prioritäten: höhere Priorität zuerst, sonst Einstellreihenfolge
+  - begrenzte Parallelität: höchstens --jobs Worker-Prozesse
+  - Fortschritt je Job (geschriebene Zeilen, fertige Blätter), alle PROGRESS_ROWS Zeilen
+    gespeichert - dort wird auch ein Abbruch (cancel) erkannt
+  - Abhängigkeiten: ein Job mit --after BATCH startet erst, wenn alle Jobs dieses Batches fertig sind
+    (außer ihm selbst und Jobs mit demselben --after). Ein leerer oder unbekannter Batch gilt
+    nicht als fertig; wartet ein Job darauf oder auf fehlgeschlagene/abgebrochene Jobs,
+    melden run und status den Grund
+  - Wiederaufnahme: Templates entstehen in einer Temp-Datei und werden erst nach der
+    Prüfung (ZIP-CRC) umbenannt; fertige Jobs speichern die SHA-256 der Ausgabe. Ein neuer
+    Lauf setzt Jobs verstorbener Runner zurück und überspringt alle fertigen Jobs, deren
+    Datei noch unverändert vorhanden ist. Erneutes Einstellen desselben Batches ist idempotent.
+
+Aufruf:
+    python template_jobs.py QUEUE.db add-builds QUELLE AUSGABE_DIR [--companies A,B] [--batch NAME] [--priority N]
+    python template_jobs.py QUEUE.db add-merge KONZERN.xlsx --input-dir AUSGABE_DIR --after NAME
+    python template_jobs.py QUEUE.db add-check KONZERN.xlsx --after NAME
+    python template_jobs.py QUEUE.db run [--jobs N]
+    python template_jobs.py QUEUE.db status [--batch NAME]
+    python template_jobs.py QUEUE.db cancel [ID ...] [--batch NAME]
+    python template_jobs.py QUEUE.db retry [--batch NAME]
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+QUEUE_VERSION = 1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Jobs des Batches j.after, auf die Job j wartet - ohne j selbst und ohne Jobs, die ebenfalls
+# auf diesen Batch warten (sonst blockieren sich --after und --batch mit demselben Namen)
+_DEPENDENCY = "d.batch = j.after AND d.id != j.id AND (d.after IS NULL OR d.after != j.after)"
+
+KIND_BUILD = "build"
+KIND_MERGE = "merge"
+KIND_CHECK = "check"
+
+# Fortschritt/Abbruchprüfung alle N Zeilen; Heartbeat laufender Jobs durch den Runner
+PROGRESS_ROWS = 10000
+HEARTBEAT_SECONDS = 5.0
+# Laufende Jobs ohne Heartbeat gelten danach als verwaist (Runner auf anderem Rechner)
+STALE_SECONDS = 60.0
+BUSY_TIMEOUT = 30.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+@contextlib.contextmanager
+def _transaction(conn):
+    """Schreibtransaktion mit sofortiger Sperre - Claim und Statuswechsel sind so atomar"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_template(path):
+    """Prüft, ob eine Ausgabe ein vollständiges XLSX ist (ZIP-Verzeichnis und CRC aller Teile)"""
+    with zipfile.ZipFile(path) as zf:
+        if "xl/workbook.xml" not in zf.namelist():
+            raise ValueError(f"{path}: kein Workbook")
+        broken = zf.testzip()
+        if broken is not None:
+            raise ValueError(f"{path}: beschädigter Teil {broken}")
+
+
+def _runner_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _runner_alive(runner):
+    """Prüft Runner desselben Rechners über die PID; fremde Rechner nur über den Heartbeat"""
+    host, _, pid = (runner or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    def __init__(self, path):
+        self.path = path
+        self.conn = _connect(path)
+        self._create_tables()
+
+    def _create_tables(self):
+        with _transaction(self.conn):
+            self.conn.execute("CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("INSERT OR IGNORE INTO queue_meta VALUES ('version', ?)", (str(QUEUE_VERSION),))
+            version = int(self.conn.execute("SELECT value FROM queue_meta WHERE key = 'version'").fetchone()[0])
+            if version > QUEUE_VERSION:
+                raise ValueError(f"{self.path}: Queue-Version {version} wird nicht unterstützt")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, batch TEXT NOT NULL, kind TEXT NOT NULL, output TEXT NOT NULL, "
+                "params TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, after TEXT, "
+                "status TEXT NOT NULL DEFAULT 'queued', cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "rows_written INTEGER NOT NULL DEFAULT 0, sheets_done INTEGER NOT NULL DEFAULT 0, "
+                "sheets_total INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+                "runner TEXT, heartbeat REAL, sha256 TEXT, result TEXT, error TEXT, "
+                "created TEXT NOT NULL, started TEXT, finished TEXT, "
+                "UNIQUE (batch, kind, output))"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, priority DESC, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_batch ON jobs (batch, status)")
+
+    def close(self):
+        self.conn.close()
+
+    # ----- Einstellen -----
+
+    def add(self, kind, output, params, batch="default", priority=0, after=None):
+        """Stellt einen Job ein; derselbe (Batch, Art, Ausgabe) wird nicht doppelt angelegt. Gibt die ID zurück"""
+        output = os.path.abspath(output)
+        with _transaction(self.conn):
+            self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (batch, kind, output, params, priority, after, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (batch, kind, output, json.dumps(params, ensure_ascii=False), priority, after, _now()),
+            )
+            return self.conn.execute(
+                "SELECT id FROM jobs WHERE batch = ? AND kind = ? AND output = ?", (batch, kind, output)
+            ).fetchone()[0]
+
+    def add_builds(self, spec, output_dir, companies=None, batch="default", priority=0, engine="xml", sheets="full"):
+        """Ein Build-Job je Unternehmen der Vorbelegungsquelle (siehe template_prefill)"""
+        from create_excel_template import select_sheets
+        from template_prefill import company_template_path, source_companies
+
+        select_sheets(sheets)  # ungültige Auswahl schon beim Einstellen melden
+        if companies is None:
+            companies = source_companies(spec)
+        return [
+            self.add(
+                KIND_BUILD, company_template_path(output_dir, company),
+                {"source": spec, "company": company, "engine": engine, "sheets": sheets},
+                batch, priority,
+            )
+            for company in companies
+        ]
+
+    # ----- Runner -----
+
+    def recover(self):
+        """
+        Vor einem Lauf: Jobs verstorbener Runner zurück in die Queue; fertige Jobs,
+        deren Ausgabe fehlt oder verändert wurde, erneut einstellen. Gibt (zurückgesetzt, erneut) zurück
+        """
+        reset, redo = 0, 0
+        with _transaction(self.conn):
+            for job in self.conn.execute("SELECT id, runner, heartbeat FROM jobs WHERE status = ?", (RUNNING,)).fetchall():
+                alive = _runner_alive(job["runner"])
+                if alive is False or (alive is None and (job["heartbeat"] or 0) < time.time() - STALE_SECONDS):
+                    self.conn.execute("UPDATE jobs SET status = ?, runner = NULL WHERE id = ?", (QUEUED, job["id"]))
+                    reset += 1
+            for job in self.conn.execute(
+                "SELECT id, output, sha256 FROM jobs WHERE status = ? AND sha256 IS NOT NULL", (DONE,)
+            ).fetchall():
+                if not os.path.exists(job["output"]) or file_sha256(job["output"]) != job["sha256"]:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, sha256 = NULL, rows_written = 0, sheets_done = 0 WHERE id = ?",
+                        (QUEUED, job["id"]),
+                    )
+                    redo += 1
+        return reset, redo
+
+    def claim(self, runner):
+        """Nächster ausführbarer Job (Priorität, dann ID) - atomar als 'running' markiert, sonst None"""
+        with _transaction(self.conn):
+            job = self.conn.execute(
+                "SELECT * FROM jobs j WHERE status = ? AND (after IS NULL OR ("
+                f"  EXISTS (SELECT 1 FROM jobs d WHERE {_DEPENDENCY}) AND"
+                f"  NOT EXISTS (SELECT 1 FROM jobs d WHERE {_DEPENDENCY} AND d.status != ?))) "
+                "ORDER BY priority DESC, id LIMIT 1",
+                (QUEUED, DONE),
+            ).fetchone()
+            if job is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, runner = ?, heartbeat = ?, attempts = attempts + 1, started = ?, "
+                "rows_written = 0, sheets_done = 0, error = NULL WHERE id = ?",
+                (RUNNING, runner, time.time(), _now(), job["id"]),
+            )
+        return dict(job)
+
+    def heartbeat(self, job_ids):
+        if job_ids:
+            marks = ", ".join("?" * len(job_ids))
+            self.conn.execute(f"UPDATE jobs SET heartbeat = ? WHERE id IN ({marks})", (time.time(), *job_ids))
+
+    def finish(self, job_id, status, sha256=None, result=None, error=None, rows=None):
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, sha256 = ?, result = ?, error = ?, finished = ?, runner = NULL, "
+            "rows_written = COALESCE(?, rows_written) WHERE id = ?",
+            (status, sha256, result, error, _now(), rows, job_id),
+        )
+
+    # ----- Steuerung -----
+
+    def _where(self, job_ids=None, batch=None):
+        clauses, params = [], []
+        if job_ids:
+            clauses.append(f"id IN ({', '.join('?' * len(job_ids))})")
+            params.extend(job_ids)
+        if batch:
+            clauses.append("batch = ?")
+            params.append(batch)
+        return (" AND " + " AND ".join(clauses) if clauses else ""), params
+
+    def cancel(self, job_ids=None, batch=None):
+        """Wartende Jobs sofort abbrechen, laufende beim nächsten Fortschritts-Checkpoint"""
+        where, params = self._where(job_ids, batch)
+        with _transaction(self.conn):
+            queued = self.conn.execute(
+                f"UPDATE jobs SET status = ?, finished = ? WHERE status = ?{where}", (CANCELLED, _now(), QUEUED, *params)
+            ).rowcount
+            running = self.conn.execute(
+                f"UPDATE jobs SET cancel_requested = 1 WHERE status = ?{where}", (RUNNING, *params)
+            ).rowcount
+        return queued, running
+
+    def retry(self, job_ids=None, batch=None):
+        """Fehlgeschlagene und abgebrochene Jobs erneut einstellen"""
+        where, params = self._where(job_ids, batch)
+        return self.conn.execute(
+            f"UPDATE jobs SET status = ?, cancel_requested = 0, error = NULL WHERE status IN (?, ?){where}",
+            (QUEUED, FAILED, CANCELLED, *params),
+        ).rowcount
+
+    def jobs(self, batch=None):
+        where, params = self._where(batch=batch)
+        return self.conn.execute(f"SELECT * FROM jobs WHERE 1 = 1{where} ORDER BY id", params).fetchall()
+
+    def blocked(self, batch=None):
+        """
+        Wartende Jobs, deren Abhängigkeit nie fertig wird: {ID: Grund}. Gründe: Batch leer/unbekannt,
+        Jobs darin fehlgeschlagen/abgebrochen oder selbst blockiert
+        """
+        waiting = self.conn.execute(
+            "SELECT * FROM jobs WHERE status = ? AND after IS NOT NULL ORDER BY id", (QUEUED,)
+        ).fetchall()
+        dependencies = {
+            job["id"]: self.conn.execute(
+                f"SELECT d.id, d.status FROM jobs d JOIN jobs j ON j.id = ? WHERE {_DEPENDENCY}", (job["id"],)
+            ).fetchall()
+            for job in waiting
+        }
+        reasons = {}
+        for job in waiting:
+            statuses = [d["status"] for d in dependencies[job["id"]]]
+            if not statuses:
+                reasons[job["id"]] = f"Batch '{job['after']}' enthält keine Jobs"
+            elif FAILED in statuses or CANCELLED in statuses:
+                reasons[job["id"]] = (
+                    f"Batch '{job['after']}': {statuses.count(FAILED)} fehlgeschlagen, "
+                    f"{statuses.count(CANCELLED)} abgebrochen"
+                )
+        changed = True
+        while changed:  # Jobs, die auf blockierte Jobs warten
+            changed = False
+            for job in waiting:
+                if job["id"] in reasons:
+                    continue
+                stuck = [d["id"] for d in dependencies[job["id"]] if d["id"] in reasons]
+                if stuck:
+                    reasons[job["id"]] = f"Batch '{job['after']}': wartet auf blockierten Job #{stuck[0]}"
+                    changed = True
+        if batch:
+            return {job["id"]: reasons[job["id"]] for job in waiting if job["batch"] == batch and job["id"] in reasons}
+        return reasons
+
+    def counts(self, batch=None):
+        where, params = self._where(batch=batch)
+        return dict(self.conn.execute(f"SELECT status, COUNT(*) FROM jobs WHERE 1 = 1{where} GROUP BY status", params))
+
+
+# ===== Worker-Prozess =====
+
+class _Progress:
+    """Zählt geschriebene Zeilen und fertige Blätter; Checkpoint = Fortschritt speichern + Abbruch prüfen"""
+
+    def __init__(self, queue_path, job_id):
+        self.conn = _connect(queue_path)
+        self.job_id = job_id
+        self.rows = 0
+        self.sheets = 0
+
+    def start(self, sheets_total):
+        self.conn.execute("UPDATE jobs SET sheets_total = ? WHERE id = ?", (sheets_total, self.job_id))
+
+    def track(self, rows):
+        for row in rows:
+            yield row
+            self.rows += 1
+            if self.rows % PROGRESS_ROWS == 0:
+                self.checkpoint()
+        self.sheets += 1
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.conn.execute(
+            "UPDATE jobs SET rows_written = ?, sheets_done = ? WHERE id = ?", (self.rows, self.sheets, self.job_id)
+        )
+        (cancel,) = self.conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,)).fetchone()
+        if cancel:
+            raise JobCancelled()
+
+    def close(self):
+        self.conn.close()
+
+
+def _part_path(output):
+    directory, name = os.path.split(output)
+    return os.path.join(directory, f".{name}.part")
+
+
+def _run_build(progress, job, params, part):
+    from create_excel_template import build_template, select_sheets
+    from template_prefill import cached_source
+
+    selected = select_sheets(params["sheets"])
+    data = cached_source(params["source"]).company_data(params["company"])
+    data = {name: progress.track(rows) for name, rows in data.items() if name in selected}
+    progress.start(len(data))
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = build_template(part, params["engine"], data, sheets=params["sheets"])
+    return metrics.rows, f"{metrics.rows:,} Zeilen, {metrics.sheets} Blätter"
+
+
+def _run_merge(progress, job, params, part):
+    from template_merge import merge_templates
+
+    inputs = sorted(glob.glob(os.path.join(params["input_dir"], "*.xlsx"))) if params.get("input_dir") else []
+    inputs.extend(params.get("inputs", ()))
+    inputs = [p for p in inputs if os.path.abspath(p) != job["output"]]
+    progress.checkpoint()
+    conflicts_path = os.path.splitext(job["output"])[0] + ".conflicts.csv"
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics, _, conflicts = merge_templates(inputs, part, 1, params["engine"], conflicts_path)
+    return metrics.rows, f"{len(inputs)} Dateien, {metrics.rows:,} Zeilen, {conflicts} Konflikte"
+
+
+def run_job(queue_path, job):
+    """Führt einen Job aus; gibt (Status, SHA-256, Ergebnis, Fehler, Zeilen) zurück"""
+    params = json.loads(job["params"])
+    progress = _Progress(queue_path, job["id"])
+    part = _part_path(job["output"])
+    try:
+        if job["kind"] == KIND_CHECK:
+            from template_integrity import check_template
+
+            progress.checkpoint()
+            verify_template(job["output"])
+            violations, rows_checked, _ = check_template(job["output"])
+            result = f"{rows_checked:,} Zeilen geprüft, {len(violations)} unbekannte Referenzen"
+            if violations:
+                return FAILED, None, result, "; ".join(v.describe() for v in violations[:5]), rows_checked
+            return DONE, None, result, None, rows_checked
+
+        runner = {KIND_BUILD: _run_build, KIND_MERGE: _run_merge}[job["kind"]]
+        os.makedirs(os.path.dirname(job["output"]) or ".", exist_ok=True)
+        rows, result = runner(progress, job, params, part)
+        verify_template(part)
+        sha256 = file_sha256(part)
+        os.replace(part, job["output"])
+        return DONE, sha256, result, None, rows
+    except JobCancelled:
+        return CANCELLED, None, None, "abgebrochen", progress.rows
+    except Exception as exc:
+        return FAILED, None, None, f"{type(exc).__name__}: {exc}", progress.rows
+    finally:
+        progress.close()
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def run_queue(queue_path, jobs=None, on_finish=None):
+    """Arbeitet die Queue ab, bis kein ausführbarer Job mehr wartet; gibt die Statuszählung zurück"""
+    jobs = jobs or os.cpu_count() or 1
+    queue = JobQueue(queue_path)
+    runner = _runner_id()
+    try:
+        reset, redo = queue.recover()
+        if reset or redo:
+            print(f"[Jobs] {reset} unterbrochene Jobs fortgesetzt, {redo} fehlende Ausgaben neu eingestellt")
+        running = {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            while True:
+                while len(running) < jobs:
+                    job = queue.claim(runner)
+                    if job is None:
+                        break
+                    running[pool.submit(run_job, queue_path, job)] = job
+                if not running:
+                    break
+                finished, _ = wait(running, timeout=HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    try:
+                        status, sha256, result, error, rows = future.result()
+                    except Exception as exc:  # Worker-Prozess abgestürzt
+                        status, sha256, result, error, rows = FAILED, None, None, f"{type(exc).__name__}: {exc}", None
+                    queue.finish(job["id"], status, sha256, result, error, rows)
+                    if on_finish:
+                        on_finish(job, status, result or error)
+                queue.heartbeat([job["id"] for job in running.values()])
+        for job_id, reason in queue.blocked().items():
+            print(f"  WARNING: #{job_id} bleibt wartend - {reason}")
+        return queue.counts()
+    finally:
+        queue.close()
+
+
+# ===== CLI =====
+
+def _describe(job):
+    params = json.loads(job["params"])
+    target = params.get("company") or os.path.basename(job["output"])
+    return f"{job['kind']} {target}"
+
+
+def _print_status(queue, batch=None):
+    blocked = queue.blocked(batch)
+    for job in queue.jobs(batch):
+        progress = f"{job['rows_written']:,} Zeilen"
+        if job["sheets_total"]:
+            progress += f", Blätter {job['sheets_done']}/{job['sheets_total']}"
+        detail = job["error"] if job["status"] in (FAILED, CANCELLED) else blocked.get(job["id"], job["result"])
+        print(
+            f"  #{job['id']:<5} P{job['priority']:<3} {job['status']:<9} {job['batch']}: {_describe(job)}"
+            f" - {progress}{f' ({detail})' if detail else ''}"
+        )
+    counts = queue.counts(batch)
+    print("[Jobs] " + (", ".join(f"{status}: {count}" for status, count in sorted(counts.items())) or "keine Jobs"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistente Job-Queue für Template-Batch-Läufe")
+    parser.add_argument("queue", help="SQLite-Datei der Queue (wird angelegt)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    builds = sub.add_parser("add-builds", help="Ein Template je Unternehmen einer Vorbelegungsquelle")
+    builds.add_argument("source", help="Vorbelegungsquelle (siehe template_prefill)")
+    builds.add_argument("output_dir")
+    builds.add_argument("--companies", help="Kommagetrennte Unternehmen (Standard: alle der Quelle)")
+    builds.add_argument("--engine", default="xml")
+    builds.add_argument("--sheets", default="full")
+
+    merge = sub.add_parser("add-merge", help="Konzern-Template aus ausgefüllten Templates")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs="*")
+    merge.add_argument("--input-dir", help="Alle *.xlsx dieses Verzeichnisses (zur Laufzeit gelesen)")
+    merge.add_argument("--engine", default="xml")
+
+    check = sub.add_parser("add-check", help="Referenzprüfung eines Templates (template_integrity)")
+    check.add_argument("template")
+
+    for command in (builds, merge, check):
+        command.add_argument("--batch", default="default")
+        command.add_argument("--priority", type=int, default=0, help="Höher = früher (Standard: 0)")
+    for command in (merge, check):
+        command.add_argument("--after", help="Erst starten, wenn alle Jobs dieses Batches fertig sind")
+
+    run = sub.add_parser("run", help="Queue abarbeiten")
+    run.add_argument("--jobs", type=int, default=None, help="Parallele Jobs (Standard: CPU-Kerne)")
+
+    status = sub.add_parser("status")
+    status.add_argument("--batch")
+    cancel = sub.add_parser("cancel")
+    cancel.add_argument("ids", nargs="*", type=int)
+    cancel.add_argument("--batch")
+    retry = sub.add_parser("retry", help="Fehlgeschlagene/abgebrochene Jobs erneut einstellen")
+    retry.add_argument("ids", nargs="*", type=int)
+    retry.add_argument("--batch")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        started = time.perf_counter()
+        counts = run_queue(
+            args.queue, args.jobs,
+            on_finish=lambda job, status, detail: print(f"  #{job['id']} {status}: {_describe(job)} - {detail}"),
+        )
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+        print(f"[Jobs] Lauf beendet in {time.perf_counter() - started:.2f}s ({summary})")
+        if counts.get(FAILED) or counts.get(QUEUED):
+            sys.exit(1)
+        return
+
+    queue = JobQueue(args.queue)
+    try:
+        if args.command == "add-builds":
+            companies = [c.strip() for c in args.companies.split(",") if c.strip()] if args.companies else None
+            ids = queue.add_builds(args.source, args.output_dir, companies, args.batch, args.priority, args.engine, args.sheets)
+            print(f"[Jobs] {len(ids)} Build-Jobs in Batch '{args.batch}'")
+        elif args.command == "add-merge":
+            if not args.inputs and not args.input_dir:
+                parser.error("Keine Eingaben angegeben")
+            params = {
+                "inputs": [os.path.abspath(p) for p in args.inputs],
+                "input_dir": os.path.abspath(args.input_dir) if args.input_dir else None,
+                "engine": args.engine,
+            }
+            job_id = queue.add(KIND_MERGE, args.output, params, args.batch, args.priority, args.after)
+            print(f"[Jobs] Merge-Job #{job_id} in Batch '{args.batch}'")
+        elif args.command == "add-check":
+            job_id = queue.add(KIND_CHECK, args.template, {}, args.batch, args.priority, args.after)
+            print(f"[Jobs] Prüf-Job #{job_id} in Batch '{args.batch}'")
+        elif args.command == "status":
+            _print_status(queue, args.batch)
+        elif args.command == "cancel":
+            queued, running = queue.cancel(args.ids, args.batch)
+            print(f"[Jobs] {queued} wartende Jobs abgebrochen, {running} laufende zum Abbruch markiert")
+        elif args.command == "retry":
+            print(f"[Jobs] {queue.retry(args.ids, args.batch)} Jobs erneut eingestellt")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
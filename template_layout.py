@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Fremde Mandanten-Exporte auf das Template-Schema abbilden
+
+Viele Mandanten liefern eigene Exporte statt des Templates: Spalten umsortiert,
+'Konto-Nr.' statt 'Kontonummer', 'S'/'H' statt 'Soll'/'Haben' oder ein
+Soll/Haben-Kennzeichen neben einer Betragsspalte (DATEV-Stil). Je Blatt (bzw.
+CSV-Datei) werden nur die ersten SCAN_ROWS Zeilen gelesen; jede Kandidatenzeile wird
+normalisiert und gehasht (Fingerprint). Bekannte Fingerprints kommen aus dem
+Layout-Cache - ohne Bewertung. Unbekannte Layouts werden über Synonyme und
+unscharfen Vergleich (difflib) gegen Bilanzdaten, GuV-Daten und
+Zwischengesellschaftsgeschäfte bewertet und die Spaltenzuordnung im Cache abgelegt.
+Die Datenzeilen laufen danach gestreamt durch normalize_row in typisierte Zeilen.
+
+Aufruf:
+    python template_layout.py EXPORT.xlsx|EXPORT.csv                      # erkannte Zuordnung anzeigen
+    python template_layout.py EXPORT.xlsx AUSGABE.xlsx|BUNDLE_DIR [--company NAME] [--cache DATEI]
+"""
+
+import argparse
+import contextlib
+import csv
+import difflib
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+from template_schema import SCHEMAS, get_schema, is_empty_row, normalize_row
+
+# Zeilen je Blatt, in denen die Header-Zeile gesucht wird
+SCAN_ROWS = 15
+# Mindestähnlichkeit für unscharfe Treffer; exakte Synonyme zählen 1.0
+FUZZY_MIN = 0.82
+FUZZY_WEIGHT = 0.9
+# Bonus, wenn der Blatt-/Dateiname zum Zielblatt passt (Anzeige; entschieden wird zuerst über
+# den Namenshinweis, siehe resolve_layout)
+NAME_HINT_BONUS = 1.0
+CACHE_VERSION = 2
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "konzern-template", "layouts.json")
+
+TARGETS = ("Bilanzdaten", "GuV-Daten", "Zwischengesellschaftsgeschäfte")
+
+# Pseudo-Spalten (nur Bilanzdaten): Soll/Haben-Kennzeichen und zugehöriger Betrag
+SIDE = "S/H-Kennzeichen"
+AMOUNT = "Betrag (S/H)"
+
+SYNONYMS = {
+    "Unternehmen": ("Gesellschaft", "Firma", "Mandant", "Unternehmensname", "Buchungskreis", "Company", "Entity"),
+    "Kontonummer": ("Konto", "Konto-Nr.", "Kontonr", "Kto", "Kto-Nr.", "Sachkonto", "Account", "Account No"),
+    "Kontoname": ("Kontobezeichnung", "Bezeichnung", "Kontenbezeichnung", "Beschriftung", "Account Name", "Description"),
+    "HGB-Position": ("HGB Position", "Bilanzposition", "Position", "HGB-Pos."),
+    "Kontotyp": ("Kontoart", "Typ", "Account Type"),
+    "Soll": ("S", "Soll EUR", "Sollsaldo", "Debit", "Dr"),
+    "Haben": ("H", "Haben EUR", "Habensaldo", "Credit", "Cr"),
+    "Saldo": ("Endsaldo", "Schlusssaldo", "Saldo EUR", "Bestand", "Balance"),
+    "Betrag": ("Betrag EUR", "Wert", "Umsatz", "Amount", "Saldo", "Endsaldo"),
+    "Zwischengesellschaft": ("IC", "Intercompany", "Konzern", "Verbundenes Unternehmen", "ZG"),
+    "Gegenpartei": ("Partner", "Partnergesellschaft", "Gegenseite", "IC-Partner", "Counterparty"),
+    "Bemerkung": ("Kommentar", "Anmerkung", "Hinweis", "Notiz", "Comment"),
+    "Transaktions-ID": ("Transaktion", "Beleg", "Belegnummer", "Beleg-Nr.", "ID", "Transaction ID"),
+    "Von Unternehmen": ("Von", "Lieferant", "Verkäufer", "Sender", "From"),
+    "An Unternehmen": ("An", "Empfänger", "Käufer", "To"),
+    "Transaktionstyp": ("Geschäftsart", "Art", "Typ", "Transaction Type"),
+    "Gewinnmarge": ("Marge", "Marge %", "Zwischengewinn %", "Margin"),
+    "Eliminierungsmethode": ("Methode", "Eliminierung"),
+    "Eliminierungsbetrag": ("Eliminierung EUR", "Elimination"),
+    "HGB-Referenz": ("Rechtsgrundlage", "Paragraph", "§"),
+    SIDE: ("S/H", "Soll/Haben", "Soll-Haben-Kennzeichen", "SH-Kennzeichen", "D/C"),
+    AMOUNT: ("Betrag", "Betrag EUR", "Umsatz", "Wert", "Amount"),
+}
+
+# Mindestens eine Spalte je Gruppe muss zugeordnet sein
+REQUIRED = {
+    "Bilanzdaten": (("Kontonummer",), ("Saldo", "Soll", "Haben", AMOUNT)),
+    "GuV-Daten": (("Kontonummer",), ("Betrag",)),
+    "Zwischengesellschaftsgeschäfte": (("Betrag",), ("Von Unternehmen", "An Unternehmen", "Transaktions-ID")),
+}
+
+NAME_HINTS = {
+    "Bilanzdaten": ("bilanz", "summensaldenliste", "susa", "balance"),
+    "GuV-Daten": ("guv", "gewinn", "erfolg", "ergebnis", "income", "pl"),
+    "Zwischengesellschaftsgeschäfte": ("ic", "intercompany", "zwischengesellschaft", "konzernverrechnung"),
+}
+
+# Hinweise bis zu dieser Länge zählen nur als ganzes Wort ('pl' nicht in 'Kontenplan')
+HINT_WORD_LENGTH = 3
+
+SIDE_DEBIT = ("s", "soll", "d", "debit", "dr")
+FOOTER_LABELS = ("summe", "gesamt", "total", "bilanzsumme")
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+
+
+def normalize_header(value):
+    """'Konto-Nr.' -> 'kontonr'; Groß-/Kleinschreibung, Umlaute und Satzzeichen spielen keine Rolle"""
+    if value is None:
+        return ""
+    return re.sub(r"[^a-z0-9§]", "", str(value).strip().casefold().translate(_UMLAUTS))
+
+
+def fingerprint(values):
+    """Fingerprint einer Kandidatenzeile (normalisierte Zellen in Reihenfolge, leere Randspalten ignoriert)"""
+    cells = [normalize_header(v) for v in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    if sum(1 for c in cells if c) < 2:
+        return None
+    return hashlib.sha1("\x1f".join(cells).encode("utf-8")).hexdigest()[:20]
+
+
+def name_hints(sheet_name):
+    """Zielblätter, auf die der Blatt-/Dateiname hinweist"""
+    if not sheet_name:
+        return ()
+    text = str(sheet_name).casefold().translate(_UMLAUTS)
+    name, words = normalize_header(sheet_name), set(re.findall(r"[a-z0-9]+", text))
+    return tuple(
+        target for target in TARGETS
+        if any(hint in words if len(hint) <= HINT_WORD_LENGTH else hint in name for hint in NAME_HINTS[target])
+    )
+
+
+def _candidates(schema):
+    columns = list(schema.headers) + ([SIDE, AMOUNT] if schema.name == "Bilanzdaten" else [])
+    return {
+        column: {normalize_header(c) for c in (column, *SYNONYMS.get(column, ()))} - {""}
+        for column in columns
+    }
+
+
+_CANDIDATES = {name: _candidates(get_schema(name)) for name in TARGETS}
+
+
+def _match_score(header, names):
+    if header in names:
+        return 1.0
+    best = max(
+        (difflib.SequenceMatcher(None, header, name).ratio() for name in names if len(name) >= 4),
+        default=0.0,
+    )
+    return best * FUZZY_WEIGHT if best >= FUZZY_MIN and len(header) >= 4 else 0.0
+
+
+@dataclass
+class Layout:
+    """Zuordnung einer Header-Zeile auf ein Zielblatt; columns: Schema-Spalte -> Quellspalte (oder None)"""
+
+    schema: str
+    columns: list
+    side: int = None
+    amount: int = None
+    score: float = 0.0
+    headers: list = None  # Original-Header (Anzeige)
+    hinted: bool = False  # Blattname weist auf das Zielblatt hin
+
+    def describe(self):
+        schema = get_schema(self.schema)
+        pairs = [
+            f"{self.headers[col]!s} -> {column}"
+            for column, col in zip(schema.headers, self.columns) if col is not None
+        ]
+        if self.side is not None:
+            pairs.append(f"{self.headers[self.amount]} + {self.headers[self.side]} -> Soll/Haben")
+        return ", ".join(pairs)
+
+    def mapper(self, company=None):
+        """Quellzeile -> Rohwerte in Schema-Reihenfolge (Soll/Haben aus Kennzeichen, fehlendes Unternehmen ergänzt)"""
+        schema = get_schema(self.schema)
+        columns = self.columns
+        side, amount = self.side, self.amount
+        soll, haben = (schema.index("Soll"), schema.index("Haben")) if side is not None else (None, None)
+        fill = (
+            [idx for idx, column in enumerate(schema.headers) if column in schema.company_columns[:1]
+             and columns[idx] is None]
+            if company else []
+        )
+
+        def map_row(values):
+            width = len(values)
+            row = [values[col] if col is not None and col < width else None for col in columns]
+            if side is not None and side < width and amount < width:
+                flag = str(values[side] or "").strip().casefold()
+                row[soll if flag in SIDE_DEBIT else haben] = values[amount]
+            for idx in fill:
+                row[idx] = company
+            return row
+
+        return map_row
+
+
+def score_row(values, target, sheet_name=""):
+    """Bewertet eine Kandidatenzeile gegen ein Zielblatt; Layout oder None"""
+    headers = [normalize_header(v) for v in values]
+    candidates = _CANDIDATES[target]
+    scored = sorted(
+        (
+            (score, col, column)
+            for col, header in enumerate(headers) if header
+            for column, names in candidates.items()
+            for score in [_match_score(header, names)] if score > 0
+        ),
+        key=lambda item: (-item[0], item[1]),
+    )
+    assigned, used = {}, set()
+    for score, col, column in scored:
+        if column not in assigned and col not in used:
+            assigned[column] = (col, score)
+            used.add(col)
+    # Kennzeichen/Betrag nur gemeinsam und nur ohne eigene Soll/Haben-Spalten
+    pair = SIDE in assigned and AMOUNT in assigned and "Soll" not in assigned and "Haben" not in assigned
+    if not pair:
+        assigned.pop(SIDE, None)
+        assigned.pop(AMOUNT, None)
+    if any(not any(column in assigned for column in group) for group in REQUIRED[target]):
+        return None
+    total = sum(score for _, score in assigned.values())
+    hinted = target in name_hints(sheet_name)
+    if hinted:
+        total += NAME_HINT_BONUS
+    schema = get_schema(target)
+    return Layout(
+        target,
+        [assigned[column][0] if column in assigned else None for column in schema.headers],
+        assigned[SIDE][0] if pair else None,
+        assigned[AMOUNT][0] if pair else None,
+        round(total, 3),
+        ["" if v is None else str(v) for v in values],
+        hinted,
+    )
+
+
+def resolve_layout(rows, sheet_name=""):
+    """
+    Beste (Zeilenindex, Layout) unter den Kandidatenzeilen oder None. Erfüllen mehrere Zielblätter
+    REQUIRED, entscheidet der Namenshinweis ('GuV' mit Kto/Soll/Haben/Saldo -> GuV-Daten), dann die Bewertung.
+    """
+    best = None
+    for idx, values in enumerate(rows):
+        for target in TARGETS:
+            layout = score_row(values, target, sheet_name)
+            if layout is not None and (best is None or (layout.hinted, layout.score) > (best[1].hinted, best[1].score)):
+                best = (idx, layout)
+    return best
+
+
+def cache_key(values, sheet_name=""):
+    """Fingerprint plus Namenshinweise - dieselben Header können je Blattname ein anderes Ziel haben"""
+    key = fingerprint(values)
+    return None if key is None else f"{key}:{','.join(name_hints(sheet_name))}"
+
+
+class LayoutCache:
+    """cache_key (Fingerprint + Namenshinweise) -> Layout; optional als JSON-Datei gespeichert"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data.get("layouts", {})
+
+    def lookup(self, rows, sheet_name=""):
+        """Erste Kandidatenzeile mit bekanntem Fingerprint -> (Zeilenindex, Layout) oder None"""
+        for idx, values in enumerate(rows):
+            entry = self.entries.get(cache_key(values, sheet_name))
+            if entry is not None:
+                self.hits += 1
+                return idx, Layout(**entry)
+        return None
+
+    def store(self, values, layout, sheet_name=""):
+        self.misses += 1
+        key = cache_key(values, sheet_name)
+        if key is not None:
+            self.entries[key] = asdict(layout)
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "layouts": self.entries}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+@dataclass
+class ForeignSheet:
+    name: str
+    header_row: int  # 1-basiert
+    layout: Layout
+    cached: bool
+
+
+# ===== Quellen: XLSX-Blätter und CSV-Dateien =====
+
+# Trennzeichen-Kandidaten für CSV-Exporte; bei Gleichstand gewinnt das erste
+CSV_DELIMITERS = ";\t|,"
+
+
+def _csv_delimiter(path):
+    """
+    Trennzeichen, das die meisten der ersten SCAN_ROWS Zeilen in mindestens zwei Felder teilt.
+    Nicht csv.Sniffer: Titelzeilen und Dezimalkommas ('1.234,56') führen ihn bei ';'-Exporten zu ','
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        lines = list(itertools.islice(f, SCAN_ROWS))
+
+    def split_rows(delimiter):
+        return sum(1 for values in csv.reader(lines, delimiter=delimiter) if len(values) >= 2)
+
+    return max(CSV_DELIMITERS, key=split_rows)
+
+
+class _CsvSource:
+    def __init__(self, path):
+        self.path = path
+        self.delimiter = _csv_delimiter(path)
+        self.sheetnames = [os.path.splitext(os.path.basename(path))[0]]
+
+    def iter_rows(self, name, min_row=1, max_row=None):
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row_idx, values in enumerate(csv.reader(f, delimiter=self.delimiter), start=1):
+                if max_row is not None and row_idx > max_row:
+                    return
+                if row_idx >= min_row:
+                    yield values
+
+    def close(self):
+        pass
+
+
+class _XlsxSource:
+    def __init__(self, path):
+        from openpyxl import load_workbook
+
+        self.wb = load_workbook(path, read_only=True, data_only=True)
+        self.sheetnames = self.wb.sheetnames
+
+    def iter_rows(self, name, min_row=1, max_row=None):
+        return self.wb[name].iter_rows(min_row=min_row, max_row=max_row, values_only=True)
+
+    def close(self):
+        self.wb.close()
+
+
+def _open_source(path):
+    return _CsvSource(path) if path.lower().endswith((".csv", ".txt")) else _XlsxSource(path)
+
+
+def scan_layouts(source, cache):
+    """Liest je Blatt nur die ersten SCAN_ROWS Zeilen; gibt (erkannte Blätter, übersprungene Blattnamen) zurück"""
+    found, skipped = [], []
+    for name in source.sheetnames:
+        rows = [list(values) for values in source.iter_rows(name, max_row=SCAN_ROWS)]
+        hit = cache.lookup(rows, name)
+        cached = hit is not None
+        if hit is None:
+            hit = resolve_layout(rows, name)
+            if hit is not None:
+                cache.store(rows[hit[0]], hit[1], name)
+        if hit is None:
+            skipped.append(name)
+            continue
+        found.append(ForeignSheet(name, hit[0] + 1, hit[1], cached))
+    return found, skipped
+
+
+def _is_footer(values):
+    first = next((v for v in values if v is not None and str(v).strip()), None)
+    return isinstance(first, str) and normalize_header(first).startswith(FOOTER_LABELS)
+
+
+def iter_foreign_rows(source, sheet, company=None):
+    """Typisierte Zeilen (Schema-Reihenfolge) eines erkannten Blatts"""
+    schema = get_schema(sheet.layout.schema)
+    map_row = sheet.layout.mapper(company)
+    for values in source.iter_rows(sheet.name, min_row=sheet.header_row + 1):
+        if is_empty_row(values):
+            continue
+        if _is_footer(values):
+            break
+        row = map_row(values)
+        if not is_empty_row(row):
+            yield normalize_row(schema, row)
+
+
+@contextlib.contextmanager
+def open_foreign_rows(path, cache=None, company=None):
+    """
+    Fremder Export (XLSX/CSV) -> (rows(Blattname), erkannte Blätter, übersprungene Blätter).
+    rows() liefert wie template_reader.open_rows typisierte Zeilen; mehrere Quellblätter
+    desselben Zielblatts werden aneinandergehängt.
+    """
+    cache = cache if cache is not None else LayoutCache()
+    source = _open_source(path)
+    try:
+        found, skipped = scan_layouts(source, cache)
+        cache.save()
+
+        def rows(sheet_name):
+            for sheet in found:
+                if sheet.layout.schema == sheet_name:
+                    yield from iter_foreign_rows(source, sheet, company)
+
+        yield rows, found, skipped
+    finally:
+        source.close()
+
+
+def convert(path, output, cache=None, company=None, engine="xml", fmt="csv"):
+    """Fremder Export -> Template (.xlsx) oder Bundle-Verzeichnis; gibt (erkannte, übersprungene Blätter) zurück"""
+    with open_foreign_rows(path, cache, company) as (rows, found, skipped):
+        if not found:
+            raise ValueError(f"{path}: kein Blatt passt auf Bilanzdaten, GuV-Daten oder Zwischengesellschaftsgeschäfte")
+        targets = {sheet.layout.schema for sheet in found}
+        if output.lower().endswith(".xlsx"):
+            from create_excel_template import build_template
+
+            data = {schema.name: rows(schema.name) for schema in SCHEMAS if schema.name in targets}
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_template(output, engine, data, sheets=",".join(sorted(targets)) + ",Anleitung")
+        else:
+            from template_bundle import BundleWriter
+
+            bundle = BundleWriter(output, fmt, source=os.path.basename(path))
+            for schema in SCHEMAS:
+                if schema.name in targets:
+                    bundle.write_sheet(schema.name, rows(schema.name))
+            bundle.close()
+    return found, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bildet fremde Mandanten-Exporte auf das Template-Schema ab")
+    parser.add_argument("input", help="Export als XLSX oder CSV")
+    parser.add_argument("output", nargs="?", help="Ziel: .xlsx oder Verzeichnis für ein Bundle (ohne: nur anzeigen)")
+    parser.add_argument("--company", help="Unternehmen für Exporte ohne Unternehmensspalte")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help=f"Layout-Cache (Standard: {DEFAULT_CACHE})")
+    parser.add_argument("--no-cache", action="store_true", help="Layouts nicht lesen/speichern")
+    parser.add_argument("--engine", default="xml")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv", help="Format bei Bundle-Ausgabe")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    cache = LayoutCache(None if args.no_cache else args.cache)
+    if args.output:
+        found, skipped = convert(args.input, args.output, cache, args.company, args.engine, args.format)
+    else:
+        with open_foreign_rows(args.input, cache, args.company) as (_, found, skipped):
+            pass
+    for sheet in found:
+        origin = "Cache" if sheet.cached else f"Score {sheet.layout.score}"
+        print(f"  - {sheet.name} (Zeile {sheet.header_row}) -> {sheet.layout.schema} [{origin}]")
+        print(f"      {sheet.layout.describe()}")
+    for name in skipped:
+        print(f"  - {name}: kein passendes Layout, übersprungen")
+    print(f"[Layout] {len(found)} Blätter erkannt ({cache.hits} aus Cache, {cache.misses} neu bewertet)")
+    if not found:
+        sys.exit(1)
+    if args.output:
+        print(f"[SUCCESS] {args.output} in {time.perf_counter() - started:.2f}s erstellt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Führt ausgefüllte Templates der Tochterunternehmen zu einem Konzern-Template zusammen
+
+  - Bilanzdaten, GuV-Daten, Latente Steuern: aneinandergehängt
+  - Unternehmensinformationen, Beteiligungsverhältnisse, Eigenkapital-Aufteilung,
+    Währungsumrechnung: je Schlüssel dedupliziert (erste Datei gewinnt)
+  - Zwischengesellschaftsgeschäfte: über Transaktions-ID zusammengeführt - dieselbe
+    Buchung aus beiden Gesellschaften erscheint nur einmal
+
+Die Eingabedateien werden parallel (Prozess-Pool, read-only) in Spalten-Bundles
+gelesen; die Ausgabe wird daraus gestreamt geschrieben. Im Speicher liegen nur die
+Schlüssel der deduplizierten Blätter. Abweichungen (z.B. unterschiedliche
+Beteiligungs-% für dasselbe Paar) werden als Konflikte in eine CSV-Datei geschrieben.
+
+Aufruf:
+    python template_merge.py KONZERN.xlsx TU1.xlsx TU2.xlsx ... [--jobs N]
+    python template_merge.py KONZERN.xlsx --input-dir rueckläufer/
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from template_bundle import iter_bundle_rows, xlsx_to_bundle
+from template_schema import SCHEMAS
+
+# Blatt -> (Schlüsselspalten, verglichene Spalten); fehlende Blätter werden aneinandergehängt
+MERGE_KEYS = {
+    "Unternehmensinformationen": (
+        ("Unternehmensname",),
+        ("Typ", "Beteiligungs-%", "Erwerbsdatum", "Anschaffungskosten"),
+    ),
+    "Beteiligungsverhältnisse": (
+        ("Mutterunternehmen", "Tochterunternehmen"),
+        ("Beteiligungs-%", "Anschaffungskosten", "Erwerbsdatum", "Beteiligungsbuchwert"),
+    ),
+    "Zwischengesellschaftsgeschäfte": (
+        ("Transaktions-ID", "Von Unternehmen", "An Unternehmen", "Transaktionstyp"),
+        ("Betrag", "Gewinnmarge", "Eliminierungsmethode", "Eliminierungsbetrag"),
+    ),
+    "Eigenkapital-Aufteilung": (
+        ("Unternehmen",),
+        ("Gezeichnetes Kapital", "Kapitalrücklagen", "Gewinnrücklagen", "Jahresüberschuss", "Anteil Mutter"),
+    ),
+    "Währungsumrechnung": (
+        ("Unternehmen",),
+        ("Währung (ISO)", "Umrechnungskurs (Stichtag)", "Durchschnittskurs (GuV)"),
+    ),
+}
+
+CONFLICT_HEADERS = ["Blatt", "Schlüssel", "Spalte", "Wert", "Quelle", "Abweichender Wert", "Abweichende Quelle"]
+
+
+class ConflictLog:
+    """Schreibt Konflikte gestreamt als CSV"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CONFLICT_HEADERS)
+
+    def add(self, sheet, key, column, value, source, other_value, other_source):
+        self._writer.writerow([sheet, " | ".join(str(k) for k in key), column, value, source, other_value, other_source])
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+
+class SheetMerger:
+    """Führt die Zeilen eines Blatts aus allen Eingaben zusammen"""
+
+    def __init__(self, schema, conflicts):
+        self.schema = schema
+        self.conflicts = conflicts
+        self.rows_in = 0
+        self.rows_out = 0
+        rule = MERGE_KEYS.get(schema.name)
+        self._key_idx = [schema.index(c) for c in rule[0]] if rule else None
+        self._cmp = [(c, schema.index(c)) for c in rule[1]] if rule else []
+        self._seen = {}  # Schlüssel -> (verglichene Werte, Quelle)
+        # IC: beide Seiten einer Transaktion sollten denselben Betrag melden
+        self._tx_amounts = {} if schema.name == "Zwischengesellschaftsgeschäfte" else None
+
+    def merge(self, sources):
+        """sources: [(Quellname, Zeilen)] in Eingabereihenfolge; liefert die Ausgabezeilen"""
+        for source, rows in sources:
+            for row in rows:
+                self.rows_in += 1
+                if self._key_idx is not None and not self._accept(row, source):
+                    continue
+                self.rows_out += 1
+                yield row
+
+    def _accept(self, row, source):
+        key = tuple(row[i] for i in self._key_idx)
+        values = tuple(row[i] for _, i in self._cmp)
+        seen = self._seen.get(key)
+        if seen is None:
+            self._seen[key] = (values, source)
+            if self._tx_amounts is not None:
+                self._check_transaction(row, source)
+            return True
+        first_values, first_source = seen
+        for (column, _), first, other in zip(self._cmp, first_values, values):
+            if first != other:
+                self.conflicts.add(self.schema.name, key, column, first, first_source, other, source)
+        return False
+
+    def _check_transaction(self, row, source):
+        tx_id = row[self.schema.index("Transaktions-ID")]
+        amount = row[self.schema.index("Betrag")]
+        if not tx_id:
+            return
+        first = self._tx_amounts.setdefault(tx_id, (amount, source))
+        if first[0] != amount:
+            self.conflicts.add(self.schema.name, (tx_id,), "Betrag", first[0], first[1], amount, source)
+
+
+def _parse_input(path, directory):
+    """Worker: Eingabedatei -> Bundle"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        xlsx_to_bundle(path, directory)
+    return directory
+
+
+def merge_templates(inputs, output, jobs=None, engine="xml", conflicts_path=None, **engine_options):
+    """Gibt (BuildMetrics, Statistik je Blatt, Anzahl Konflikte) zurück"""
+    from create_excel_template import build_template
+
+    if not inputs:
+        raise ValueError("Keine Eingabedateien")
+    started = time.perf_counter()
+    conflicts = ConflictLog(conflicts_path or os.path.splitext(output)[0] + ".conflicts.csv")
+    work_dir = tempfile.mkdtemp(prefix="template-merge-")
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                (os.path.basename(path), pool.submit(_parse_input, path, os.path.join(work_dir, str(i))))
+                for i, path in enumerate(inputs)
+            ]
+
+            def sources(sheet_name):
+                # Eingabereihenfolge; wartet nur auf die jeweils nächste Datei
+                for name, future in futures:
+                    yield name, iter_bundle_rows(future.result(), sheet_name)
+
+            mergers = {schema.name: SheetMerger(schema, conflicts) for schema in SCHEMAS}
+            data = {name: merger.merge(sources(name)) for name, merger in mergers.items()}
+            metrics = build_template(output, engine, data, **engine_options)
+    finally:
+        conflicts.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = {name: (m.rows_in, m.rows_out) for name, m in mergers.items()}
+    print(f"[Merge] {len(inputs)} Dateien in {time.perf_counter() - started:.2f}s zusammengeführt")
+    return metrics, stats, conflicts.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Führt ausgefüllte Templates zu einem Konzern-Template zusammen")
+    parser.add_argument("output")
+    parser.add_argument("inputs", nargs="*")
+    parser.add_argument("--input-dir", help="Alle *.xlsx dieses Verzeichnisses einlesen")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallele Leser (Standard: CPU-Kerne)")
+    parser.add_argument("--engine", default="xml")
+    parser.add_argument("--conflicts", help="Konfliktbericht (Standard: <output>.conflicts.csv)")
+    args = parser.parse_args(argv)
+
+    inputs = list(args.inputs)
+    if args.input_dir:
+        inputs.extend(sorted(glob.glob(os.path.join(args.input_dir, "*.xlsx"))))
+    inputs = [p for p in inputs if os.path.abspath(p) != os.path.abspath(args.output)]
+    if not inputs:
+        parser.error("Keine Eingabedateien angegeben")
+
+    conflicts_path = args.conflicts or os.path.splitext(args.output)[0] + ".conflicts.csv"
+    metrics, stats, conflict_count = merge_templates(inputs, args.output, args.jobs, args.engine, conflicts_path)
+    for sheet, (rows_in, rows_out) in stats.items():
+        dropped = f", {rows_in - rows_out:,} Duplikate entfernt" if rows_in != rows_out else ""
+        print(f"  - {sheet}: {rows_out:,} Zeilen{dropped}")
+    if conflict_count:
+        print(f"  WARNING: {conflict_count} Konflikte - siehe {conflicts_path}")
+    print(f"[SUCCESS] Konzern-Template erstellt: {args.output}")
+    print(f"[Template] {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
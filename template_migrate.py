@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Migration ausgefüllter v2.0-Templates (create_excel_template_hgb_improved.py) auf v3.0
+
+v2.0 unterscheidet sich von v3.0 in:
+  - Blattreihenfolge: 'Anleitung' steht vorn, der Backend-Import erwartet Bilanzdaten an Index 0
+  - fehlende Blätter: Währungsumrechnung, Latente Steuern, Auswahllisten
+  - Header-Zeile teils in Zeile 1, teils in Zeile 2 (wird beim Lesen gesucht)
+Die Spalten der Datenblätter sind identisch; nur 'Anteil Minderheit' (Eigenkapital-Aufteilung)
+war in v2.0 ein Prozentsatz und ist in v3.0 der Betrag - der v3.0-Generator schreibt die
+Spalte (wie 'Gesamt Eigenkapital') als Formel, der alte Wert wird nicht übernommen.
+
+Die Datenzeilen werden mit openpyxl (read-only) gelesen und gestreamt in ein neues
+v3.0-Template geschrieben (build_template) - Validierungen, Formeln und Dropdowns
+kommen aus dem v3.0-Generator. Werte, die eine v3.0-Auswahlliste ablehnen würde
+(z.B. alter GuV-Kontotyp), werden übernommen und im Bericht aufgeführt.
+
+Verzeichnisse und ZIP-Archive werden im Batch konvertiert; Dateien, die bereits
+v3.0 sind, werden unverändert übernommen.
+
+Aufruf:
+    python template_migrate.py detect DATEI.xlsx ...
+    python template_migrate.py convert AUSGABE_DIR EINGABE.xlsx|VERZEICHNIS|ARCHIV.zip ... [--jobs N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import create_excel_template as tpl
+from template_fastread import sheet_part_names
+from template_reader import open_rows
+from template_schema import SCHEMAS, TEMPLATE_VERSION
+
+LEGACY_VERSION = "2.0"
+
+# Blatt -> {Spalte: erlaubte Werte} - die Auswahllisten des v3.0-Generators
+ALLOWED_VALUES = {
+    "Bilanzdaten": {"Kontotyp": tpl.kontotypen_bilanz, "Zwischengesellschaft": ("Ja", "Nein")},
+    "GuV-Daten": {"Kontotyp": tpl.kontotypen_guv, "Zwischengesellschaft": ("Ja", "Nein")},
+    "Zwischengesellschaftsgeschäfte": {
+        "Transaktionstyp": tpl.LIST_TRANSAKTIONSTYP.strip('"').split(","),
+        "Eliminierungsmethode": tpl.LIST_ELIMINIERUNG.strip('"').split(","),
+        "HGB-Referenz": tpl.LIST_HGB_REFERENZ.strip('"').split(","),
+    },
+}
+EXAMPLES = 3
+
+
+def sheet_names(path):
+    """Blattnamen in Arbeitsmappen-Reihenfolge (nur workbook.xml, ohne die Blätter zu laden)"""
+    with zipfile.ZipFile(path) as zf:
+        return list(sheet_part_names(zf))
+
+
+def detect_version(path):
+    """'3.0', '2.0' oder None (kein Konsolidierungs-Template)"""
+    names = sheet_names(path)
+    data = [schema.name for schema in SCHEMAS if schema.name in names]
+    if not data:
+        return None
+    # v3.0 stellt Bilanzdaten immer an Index 0; v2.0 enthält Bilanzdaten immer (nach der Anleitung).
+    # Währungsumrechnung/Latente Steuern kommen auch in nachträglich ergänzten v2.0-Mustern vor.
+    if "Bilanzdaten" in names:
+        return TEMPLATE_VERSION if names[0] == "Bilanzdaten" else LEGACY_VERSION
+    return TEMPLATE_VERSION  # Blatt-Profil ohne Bilanzdaten (z.B. ic-only) gibt es nur in v3.0
+
+
+class ValueCheck:
+    """Zählt Werte, die eine v3.0-Auswahlliste ablehnen würde (leere Zellen sind erlaubt)"""
+
+    def __init__(self):
+        self.issues = Counter()  # (Blatt, Spalte, Wert) -> Anzahl
+
+    def wrap(self, schema, rows):
+        allowed = ALLOWED_VALUES.get(schema.name)
+        if not allowed:
+            return rows
+        checks = [(column, schema.index(column), set(values)) for column, values in allowed.items()]
+        return self._check(schema.name, checks, rows)
+
+    def _check(self, sheet, checks, rows):
+        for row in rows:
+            for column, idx, values in checks:
+                value = row[idx]
+                if value and value not in values:
+                    self.issues[(sheet, column, value)] += 1
+            yield row
+
+    def summary(self):
+        """[(Blatt, Spalte, Anzahl, Beispielwerte)]"""
+        grouped = {}
+        for (sheet, column, value), count in self.issues.most_common():
+            entry = grouped.setdefault((sheet, column), [0, []])
+            entry[0] += count
+            if len(entry[1]) < EXAMPLES:
+                entry[1].append(value)
+        return [(sheet, column, count, examples) for (sheet, column), (count, examples) in grouped.items()]
+
+
+class _Counted:
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def migrate_template(source, output, engine="xml", **engine_options):
+    """
+    Schreibt ein ausgefülltes v2.0-Template als v3.0 nach output.
+    Gibt ({Blatt: Zeilen}, [(Blatt, Spalte, Anzahl, Beispielwerte)]) zurück.
+    """
+    version = detect_version(source)
+    if version != LEGACY_VERSION:
+        raise ValueError(f"{source}: kein v{LEGACY_VERSION}-Template (erkannt: {version or 'unbekannt'})")
+    check = ValueCheck()
+    with open_rows(source) as rows:
+        # Fehlende Blätter leer lassen - sonst schreibt der Generator seine Beispielzeilen
+        data = {}
+        for schema in SCHEMAS:
+            data[schema.name] = _Counted(check.wrap(schema, rows(schema.name)))
+        tpl.build_template(output, engine, data, **engine_options)
+    return {name: counted.count for name, counted in data.items()}, check.summary()
+
+
+def _migrate_file(source, output, engine):
+    """Worker: (Status, Zeilen, Abweichungen, Fehler)"""
+    try:
+        version = detect_version(source)
+        if version == TEMPLATE_VERSION:
+            shutil.copyfile(source, output)
+            return "übernommen", 0, [], None
+        if version is None:
+            return "übersprungen", 0, [], "kein Konsolidierungs-Template"
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts, issues = migrate_template(source, output, engine)
+        return "konvertiert", sum(counts.values()), issues, None
+    except Exception as exc:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(output)
+        return "fehlgeschlagen", 0, [], f"{type(exc).__name__}: {exc}"
+
+
+def _expand_inputs(inputs, work_dir):
+    """[(Anzeigename, Pfad, relativer Ausgabepfad)] - ZIP-Archive werden entpackt (nur *.xlsx)"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in sorted(names):
+                    if name.lower().endswith(".xlsx") and not name.startswith("~$"):
+                        path = os.path.join(root, name)
+                        files.append((path, path, os.path.relpath(path, item)))
+        elif zipfile.is_zipfile(item) and not item.lower().endswith(".xlsx"):
+            archive = os.path.splitext(os.path.basename(item))[0]
+            with zipfile.ZipFile(item) as zf:
+                for info in zf.infolist():
+                    name = info.filename
+                    if info.is_dir() or not name.lower().endswith(".xlsx") or os.path.basename(name).startswith("~$"):
+                        continue
+                    relative = os.path.join(archive, *[part for part in name.split("/") if part not in ("", "..")])
+                    target = os.path.join(work_dir, relative)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with zf.open(info) as src, open(target, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                    files.append((f"{item}:{name}", target, relative))
+        else:
+            files.append((item, item, os.path.basename(item)))
+    return files
+
+
+def migrate_batch(inputs, output_dir, jobs=None, engine="xml"):
+    """Konvertiert Dateien, Verzeichnisse und ZIP-Archive; gibt [(Name, Status, Zeilen, Abweichungen, Fehler)] zurück"""
+    work_dir = tempfile.mkdtemp(prefix="template-migrate-")
+    try:
+        files = _expand_inputs(inputs, work_dir)
+        outputs = []
+        for _, path, relative in files:
+            output = os.path.join(output_dir, relative)
+            if os.path.abspath(output) == os.path.abspath(path):
+                raise ValueError(f"Ausgabe überschreibt Eingabe: {path}")
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            outputs.append(output)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(_migrate_file, path, output, engine)
+                for (_, path, _), output in zip(files, outputs)
+            ]
+            return [(name,) + future.result() for (name, _, _), future in zip(files, futures)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migriert ausgefüllte v2.0-Templates auf das v3.0-Layout")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("detect", help="Template-Version erkennen")
+    p.add_argument("files", nargs="+")
+    p = sub.add_parser("convert", help="Dateien, Verzeichnisse oder ZIP-Archive konvertieren")
+    p.add_argument("output_dir")
+    p.add_argument("inputs", nargs="+")
+    p.add_argument("--jobs", type=int, default=None, help="Parallele Konvertierungen (Standard: CPU-Kerne)")
+    p.add_argument("--engine", default="xml")
+    args = parser.parse_args(argv)
+
+    if args.command == "detect":
+        for path in args.files:
+            print(f"  - {path}: {detect_version(path) or 'unbekannt'}")
+        return
+
+    started = time.perf_counter()
+    results = migrate_batch(args.inputs, args.output_dir, args.jobs, args.engine)
+    for name, status, rows, issues, error in results:
+        detail = f", {rows:,} Zeilen" if status == "konvertiert" else (f" - {error}" if error else "")
+        print(f"  - {name}: {status}{detail}")
+        for sheet, column, count, examples in issues:
+            print(f"      WARNING: {sheet}/{column}: {count} Werte außerhalb der v3.0-Auswahlliste ({', '.join(examples)})")
+    statuses = Counter(status for _, status, _, _, _ in results)
+    print(
+        f"[Migrate] {len(results)} Dateien in {time.perf_counter() - started:.2f}s: "
+        + ", ".join(f"{count} {status}" for status, count in statuses.items())
+    )
+    if statuses.get("fehlgeschlagen"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
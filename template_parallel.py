@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Parallele Template-Builds: Datenblätter in eigenen Prozessen
+
+Bilanzdaten, GuV-Daten, Zwischengesellschaftsgeschäfte usw. sind voneinander unabhängig.
+Jedes Datenblatt (inklusive Folgeblätter) wird in einem Worker-Prozess in eine eigene
+Temp-Zip-Datei gerendert und komprimiert - gegen dieselbe, fest vereinbarte Stiltabelle
+(STYLE_TABLE) und dieselben definierten Namen. Der Elternprozess schreibt Anleitung und
+Referenzblätter selbst und übernimmt die fertigen Worksheet-Parts roh (copy_zip_member,
+ohne Neu-Komprimieren) in der Template-Reihenfolge. workbook.xml, styles.xml, Rels und
+Content-Types entstehen wie bisher beim Schließen.
+
+Shared-String-Indizes lassen sich nicht vorab zwischen Prozessen vereinbaren - parallel
+gerenderte Blätter schreiben Texte daher inline (wie strings="inline").
+
+Die Zeilenquellen werden per fork an die Worker vererbt (nicht gepickelt) - Generatoren
+und Bundle-Reader funktionieren, solange sie ihre Dateien erst beim Iterieren öffnen.
+Nur für die xml-Engine; ohne fork (Windows) wird seriell gebaut.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from template_writer import SheetSeries, XmlWorkbookWriter
+
+# Vom Elternprozess vor dem Start der Worker gesetzt: Blattname -> Zeilen (per fork vererbt)
+_pending_rows = {}
+
+
+def fork_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _render_sheet(sheet_name, path, max_rows, defined_names, engine_options):
+    """Worker: ein Datenblatt in eine eigene Zip-Datei -> [(Titel, Part, Zeilen, Zellen, Digest)] je Teilblatt"""
+    from create_excel_template import SHEET_BUILDERS
+
+    writer = XmlWorkbookWriter(path, **dict(engine_options, strings="inline"))
+    for name, formula in defined_names.items():
+        writer.define_name(name, formula)
+    ws = SheetSeries(writer, sheet_name, "data", max_rows)
+    SHEET_BUILDERS[sheet_name].write(ws, _pending_rows[sheet_name])
+    writer.close()
+    return [(part.title, part.part_name, part.row_count, part.cell_count, part.row_digest) for part in ws.parts]
+
+
+class ParallelBuild:
+    """
+    start(Zeilen je Datenblatt) startet die Worker; im Build kopiert copy(writer, Blatt) die
+    Parts eines Datenblatts, sobald sein Worker fertig ist. close() räumt die Temp-Dateien auf.
+    """
+
+    def __init__(self, jobs, max_rows, engine_options, defined_names=None):
+        self.jobs = jobs
+        self.max_rows = max_rows
+        self.engine_options = {k: v for k, v in engine_options.items() if k != "strings"}
+        self.defined_names = dict(defined_names or {})
+        self._work_dir = tempfile.mkdtemp(prefix="template-parallel-")
+        self._pool = None
+        self._futures = {}
+
+    def start(self, inputs):
+        global _pending_rows
+        _pending_rows = dict(inputs)
+        self._pool = ProcessPoolExecutor(
+            max_workers=min(self.jobs, len(inputs)), mp_context=multiprocessing.get_context("fork")
+        )
+        for idx, sheet_name in enumerate(inputs):
+            path = os.path.join(self._work_dir, f"sheet{idx}.xlsx")
+            future = self._pool.submit(
+                _render_sheet, sheet_name, path, self.max_rows, self.defined_names, self.engine_options
+            )
+            self._futures[sheet_name] = (path, future)
+
+    def __contains__(self, sheet_name):
+        return sheet_name in self._futures
+
+    def copy(self, writer, sheet_name):
+        """Wartet auf den Worker und übernimmt seine Parts; gibt die Arbeitsblätter zurück"""
+        path, future = self._futures[sheet_name]
+        parts = future.result()
+        sheets = []
+        with zipfile.ZipFile(path) as source:
+            for title, part_name, rows, cells, digest in parts:
+                ws = writer.copy_sheet(title, "data", source, part_name, rows, cells)
+                ws.row_digest = digest
+                sheets.append(ws)
+        return sheets
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        shutil.rmtree(self._work_dir, ignore_errors=True)
@@ -0,0 +1,602 @@
+#!/usr/bin/env python3
+"""
+Verarbeitungskette über ausgefüllte Templates als Pipeline
+
+Lesen -> Prüfen -> Konten zuordnen -> Währung umrechnen -> Schreiben liefen bisher
+nacheinander; jede Stufe war fertig, bevor die nächste begann. Hier läuft jede Stufe in
+einem eigenen Thread, verbunden durch beschränkte Queues mit Zeilen-Batches
+(BATCH_ROWS Zeilen eines Blatts):
+  - Backpressure: ist eine Queue voll (QUEUE_BATCHES), wartet die vorige Stufe -
+    der Speicherbedarf hängt nur von Batch-Größe und Queue-Länge ab, nicht von der Datei
+  - Metriken je Stufe: Zeilen, Batches, aktive Zeit, Wartezeit auf Eingabe/Ausgabe,
+    Durchsatz und Füllstand der Ausgabe-Queue - die langsamste Stufe ist die, deren
+    Nachbarn warten
+  - Abbruch: der erste Fehler einer Stufe (oder Strg+C) bricht alle Stufen ab; run()
+    wirft PipelineError mit dem ursprünglichen Fehler, eine halb geschriebene XLSX wird verworfen
+
+Threads statt Prozesse: Batches müssten sonst zwischen Prozessen gepickelt werden.
+Überlappen können Dekomprimieren (Lesen), Komprimieren und Dateizugriffe (Schreiben) mit
+der Python-Arbeit der übrigen Stufen.
+
+Stufen (Reihenfolge fest, optionale Stufen nur mit Option):
+  - Prüfen: Werte außerhalb der Auswahllisten (wie template_migrate); mit --strict fatal
+  - Konten zuordnen (--accounts KONTEN.csv): leere HGB-Position der Bilanzdaten aus einer
+    Zuordnung Kontonummer (einzeln oder Bereich '1000-1499') -> HGB-Position
+  - Währung umrechnen (--translate): mit den Kursen des Blatts Währungsumrechnung -
+    Aktiva/Passiva zum Stichtagskurs, GuV zum Durchschnittskurs (§ 308a HGB); Eigenkapital
+    bleibt (historischer Kurs, nicht im Template)
+
+Aufruf:
+    python template_pipeline.py EINGABE.xlsx|BUNDLE_DIR AUSGABE.xlsx [--validate] [--accounts KONTEN.csv] [--translate]
+    python template_pipeline.py EINGABE.xlsx AUSGABE_DIR --bundle csv|parquet [--mode auto|threads|serial]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+
+from template_bundle import MANIFEST, BundleWriter, iter_bundle_rows, read_manifest
+from template_fastread import MappedZip, PartRows, iter_part_rows, read_shared_strings, sheet_part_names
+from template_migrate import ValueCheck
+from template_schema import SCHEMAS, get_schema
+from template_writer import continuation_title
+
+BATCH_ROWS = 2048
+QUEUE_BATCHES = 8
+POLL_SECONDS = 0.1  # so oft prüfen blockierte Stufen, ob abgebrochen wurde
+EXAMPLES = 5  # Beispielwerte je Warnung im Bericht
+
+Batch = namedtuple("Batch", "sheet rows")
+
+_END = object()
+
+
+class PipelineError(RuntimeError):
+    """Eine Stufe ist fehlgeschlagen; __cause__ ist der ursprüngliche Fehler"""
+
+    def __init__(self, stage, error):
+        super().__init__(f"Stufe '{stage}' fehlgeschlagen: {type(error).__name__}: {error}")
+        self.stage = stage
+
+
+class ValidationError(ValueError):
+    pass
+
+
+class _Cancelled(Exception):
+    """Wird in Stufen geworfen, nachdem eine andere Stufe fehlgeschlagen ist"""
+
+
+@dataclass
+class StageMetrics:
+    name: str
+    batches: int = 0
+    rows_in: int = 0
+    rows_out: int = 0
+    busy: float = 0.0  # Sekunden mit eigener Arbeit
+    wait_in: float = 0.0  # Sekunden auf die vorige Stufe gewartet (Queue leer)
+    wait_out: float = 0.0  # Sekunden auf die nächste Stufe gewartet (Queue voll)
+    depth_max: int = 0  # Füllstand der Ausgabe-Queue nach jedem put
+    depth_sum: int = 0
+
+    @property
+    def throughput(self):
+        """Zeilen je Sekunde aktiver Zeit"""
+        rows = self.rows_out or self.rows_in
+        return rows / self.busy if self.busy else 0.0
+
+    @property
+    def depth_avg(self):
+        return self.depth_sum / self.batches if self.batches else 0.0
+
+    def describe(self):
+        text = (
+            f"{self.name}: {max(self.rows_in, self.rows_out):,} Zeilen in {self.batches:,} Batches, "
+            f"{self.busy:.2f}s aktiv ({self.throughput:,.0f} Zeilen/s), "
+            f"Warten auf Eingabe {self.wait_in:.2f}s / Ausgabe {self.wait_out:.2f}s"
+        )
+        if self.depth_max:
+            text += f", Queue Ø {self.depth_avg:.1f} / max {self.depth_max}"
+        return text
+
+
+# ===== Quelle =====
+
+class TemplateSource:
+    """Ausgefülltes Template (XLSX, mmap + iterparse) oder Bundle-Verzeichnis als Zeilenquelle"""
+
+    def __init__(self, path):
+        self.path = path
+        self._mapped = None
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST)):
+            self._manifest = read_manifest(path)
+            present = {entry["name"] for entry in self._manifest["sheets"]}
+            self.sheets = [schema.name for schema in SCHEMAS if schema.name in present]
+            return
+        self._manifest = None
+        self._mapped = MappedZip(path)
+        self._strings = read_shared_strings(self._mapped.zip)
+        self._parts = sheet_part_names(self._mapped.zip)
+        self.sheets = [schema.name for schema in SCHEMAS if schema.name in self._parts]
+
+    def rows(self, sheet_name):
+        """Typisierte Zeilen eines Datenblatts (Folgeblätter eingeschlossen)"""
+        if self._manifest is not None:
+            yield from iter_bundle_rows(self.path, sheet_name, self._manifest)
+            return
+        schema = get_schema(sheet_name)
+        number, title = 1, sheet_name
+        while title in self._parts:
+            with self._mapped.zip.open(self._parts[title]) as stream:
+                part_rows = PartRows(schema, iter_part_rows(stream, self._strings))
+                yield from part_rows
+            if part_rows.footer:
+                return
+            number += 1
+            title = continuation_title(sheet_name, number)
+
+    def batches(self, batch_rows=BATCH_ROWS):
+        for sheet_name in self.sheets:
+            batch = []
+            for row in self.rows(sheet_name):
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    yield Batch(sheet_name, batch)
+                    batch = []
+            if batch:
+                yield Batch(sheet_name, batch)
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+
+# ===== Stufen =====
+
+class Stage:
+    """prepare(Quelle) läuft vor dem Start; process(Blatt, Zeilen) je Batch im Stufen-Thread"""
+
+    name = "Stufe"
+
+    def prepare(self, source):
+        pass
+
+    def process(self, sheet_name, rows):
+        return rows
+
+    def summary(self):
+        """Zeilen für den Bericht"""
+        return []
+
+
+class Validate(Stage):
+    name = "Prüfen"
+
+    def __init__(self, strict=False):
+        self.strict = strict
+        self.check = ValueCheck()
+
+    def process(self, sheet_name, rows):
+        rows = list(self.check.wrap(get_schema(sheet_name), rows))
+        if self.strict and self.check.issues:
+            # strict bricht beim ersten Verstoß ab - alle gezählten stammen aus diesem Batch
+            sheet, column, value = next(iter(self.check.issues))
+            raise ValidationError(f"{sheet}/{column}: '{value}' steht in keiner Auswahlliste")
+        return rows
+
+    def summary(self):
+        return [
+            f"WARNING: {sheet}/{column}: {count} Werte außerhalb der Auswahlliste ({', '.join(map(str, examples))})"
+            for sheet, column, count, examples in self.check.summary()
+        ]
+
+
+def load_account_map(path):
+    """KONTEN.csv (Kontonummer;HGB-Position, ',' oder ';') -> ({Konto: Position}, [(von, bis, Position)])"""
+    exact, ranges = {}, []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        reader = csv.reader(f, delimiter=";" if sample.count(";") >= sample.count(",") else ",")
+        for record in reader:
+            if len(record) < 2 or not record[0].strip() or record[0].strip() == "Kontonummer":
+                continue
+            account, position = record[0].strip(), record[1].strip()
+            low, sep, high = account.partition("-")
+            if sep and low.strip().isdigit() and high.strip().isdigit():
+                ranges.append((int(low), int(high), position))
+            else:
+                exact[account] = position
+    return exact, ranges
+
+
+class AccountMapping(Stage):
+    name = "Konten zuordnen"
+
+    def __init__(self, path):
+        self.exact, self.ranges = load_account_map(path)
+        self.mapped = 0
+        self.unmapped = {}  # Kontonummer -> Anzahl Zeilen ohne Position
+        self._account = get_schema("Bilanzdaten").index("Kontonummer")
+        self._position = get_schema("Bilanzdaten").index("HGB-Position")
+
+    def lookup(self, account):
+        position = self.exact.get(account)
+        if position is None and account.isdigit():
+            number = int(account)
+            position = next((p for low, high, p in self.ranges if low <= number <= high), None)
+        return position
+
+    def process(self, sheet_name, rows):
+        if sheet_name != "Bilanzdaten":
+            return rows
+        result = []
+        for row in rows:
+            if not row[self._position]:
+                account = str(row[self._account] or "").strip()
+                position = self.lookup(account)
+                if position:
+                    row = list(row)
+                    row[self._position] = position
+                    self.mapped += 1
+                else:
+                    self.unmapped[account] = self.unmapped.get(account, 0) + 1
+            result.append(row)
+        return result
+
+    def summary(self):
+        lines = [f"{self.mapped:,} HGB-Positionen ergänzt"]
+        if self.unmapped:
+            examples = ", ".join(sorted(self.unmapped)[:EXAMPLES])
+            lines.append(f"WARNING: {sum(self.unmapped.values()):,} Zeilen ohne Zuordnung (Konten: {examples})")
+        return lines
+
+
+class CurrencyTranslation(Stage):
+    name = "Währung umrechnen"
+
+    # Blatt -> [(Spalte mit dem Kontotyp oder None, Kontotypen, Beträge, Kurs: 0 Stichtag / 1 Durchschnitt)]
+    AMOUNTS = {
+        "Bilanzdaten": ("Kontotyp", ("asset", "liability"), ("Soll", "Haben", "Saldo"), 0),
+        "GuV-Daten": (None, None, ("Betrag",), 1),
+    }
+
+    def __init__(self):
+        self.rates = {}
+        self.translated = 0
+        self.missing = {}  # Unternehmen ohne Kurs -> Anzahl Zeilen
+
+    def prepare(self, source):
+        schema = get_schema("Währungsumrechnung")
+        company, closing, average = (
+            schema.index(c) for c in ("Unternehmen", "Umrechnungskurs (Stichtag)", "Durchschnittskurs (GuV)")
+        )
+        if "Währungsumrechnung" in source.sheets:
+            for row in source.rows("Währungsumrechnung"):
+                if row[company]:
+                    self.rates[row[company]] = (row[closing], row[average])
+
+    def process(self, sheet_name, rows):
+        spec = self.AMOUNTS.get(sheet_name)
+        if spec is None:
+            return rows
+        schema = get_schema(sheet_name)
+        type_column, types, columns, which = spec
+        company = schema.index("Unternehmen")
+        type_idx = schema.index(type_column) if type_column else None
+        amounts = [schema.index(c) for c in columns]
+        result = []
+        for row in rows:
+            if type_idx is None or row[type_idx] in types:
+                rates = self.rates.get(row[company])
+                rate = rates[which] if rates else None
+                if rate is None:
+                    self.missing[row[company]] = self.missing.get(row[company], 0) + 1
+                elif rate != 1:
+                    row = list(row)
+                    for idx in amounts:
+                        if row[idx] is not None:
+                            row[idx] = round(row[idx] * rate, 2)
+                    self.translated += 1
+            result.append(row)
+        return result
+
+    def summary(self):
+        lines = [f"{self.translated:,} Zeilen umgerechnet ({len(self.rates)} Kurse)"]
+        if self.missing:
+            names = sorted(map(str, self.missing))
+            more = f" und {len(names) - EXAMPLES} weitere" if len(names) > EXAMPLES else ""
+            lines.append(
+                f"WARNING: {sum(self.missing.values()):,} Zeilen ohne Kurs ({', '.join(names[:EXAMPLES])}{more})"
+            )
+        return lines
+
+
+# ===== Senken =====
+
+class _SheetFeed:
+    """
+    Teilt den Batch-Strom in Zeilen je Blatt. Die Quelle liefert Blatt für Blatt in
+    Template-Reihenfolge - der erste Batch eines anderen Blatts beendet das aktuelle.
+    """
+
+    def __init__(self, batches):
+        self._batches = iter(batches)
+        self._next = None
+
+    def rows(self, sheet_name):
+        if self._next is not None:
+            if self._next.sheet != sheet_name:
+                return
+            yield from self._next.rows
+            self._next = None
+        for batch in self._batches:
+            if batch.sheet != sheet_name:
+                self._next = batch
+                return
+            yield from batch.rows
+
+
+def xlsx_sink(output, sheets, engine="xml", **engine_options):
+    """Senke: Template mit den Zeilen der Pipeline (build_template, gestreamt)"""
+    from create_excel_template import build_template
+
+    def write(batches):
+        feed = _SheetFeed(batches)
+        data = {schema.name: feed.rows(schema.name) if schema.name in sheets else iter(()) for schema in SCHEMAS}
+        # Bricht die Pipeline ab, verwirft der Writer seine Temp-Datei - eine vorhandene Ausgabe bleibt
+        with contextlib.redirect_stdout(io.StringIO()):  # Blattübersicht des Generators nicht in den Bericht
+            build_template(output, engine, data, **engine_options)
+
+    return write
+
+
+def bundle_sink(directory, sheets, fmt="csv", source=None):
+    """Senke: Spalten-Bundle (BundleWriter)"""
+
+    def write(batches):
+        feed = _SheetFeed(batches)
+        bundle = BundleWriter(directory, fmt, source=source)
+        for sheet_name in sheets:
+            bundle.write_sheet(sheet_name, feed.rows(sheet_name))
+        bundle.close()
+
+    return write
+
+
+# ===== Pipeline =====
+
+class Pipeline:
+    """
+    Quelle -> Stufen -> Senke. sink(batches) bekommt einen Iterator über Batches und läuft
+    im aufrufenden Thread; Quelle und Stufen in eigenen Threads.
+    """
+
+    def __init__(self, source, stages, sink, batch_rows=BATCH_ROWS, queue_size=QUEUE_BATCHES):
+        self.source = source
+        self.stages = list(stages)
+        self.sink = sink
+        self.batch_rows = batch_rows
+        self.queue_size = queue_size
+        self.metrics = [StageMetrics("Lesen")] + [StageMetrics(s.name) for s in self.stages] + [StageMetrics("Schreiben")]
+        self._cancel = threading.Event()
+        self._error = None
+        self._lock = threading.Lock()
+
+    def _fail(self, stage, error):
+        with self._lock:
+            if self._error is None:
+                self._error = (stage, error)
+        self._cancel.set()
+
+    def _put(self, q, item, metrics):
+        started = time.perf_counter()
+        while True:
+            if self._cancel.is_set():
+                raise _Cancelled()
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                break
+            except queue.Full:
+                pass
+        metrics.wait_out += time.perf_counter() - started
+        if item is not _END:
+            depth = q.qsize()
+            metrics.depth_max = max(metrics.depth_max, depth)
+            metrics.depth_sum += depth
+
+    def _get(self, q, metrics):
+        started = time.perf_counter()
+        while True:
+            if self._cancel.is_set():
+                raise _Cancelled()
+            try:
+                item = q.get(timeout=POLL_SECONDS)
+                break
+            except queue.Empty:
+                pass
+        metrics.wait_in += time.perf_counter() - started
+        return item
+
+    def _produce(self, out, metrics):
+        try:
+            batches = self.source.batches(self.batch_rows)
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, _END)
+                metrics.busy += time.perf_counter() - started
+                if batch is not _END:
+                    metrics.batches += 1
+                    metrics.rows_out += len(batch.rows)
+                self._put(out, batch, metrics)
+                if batch is _END:
+                    return
+        except _Cancelled:
+            pass
+        except BaseException as exc:
+            self._fail(metrics.name, exc)
+
+    def _transform(self, stage, source, out, metrics):
+        try:
+            while True:
+                batch = self._get(source, metrics)
+                if batch is _END:
+                    self._put(out, _END, metrics)
+                    return
+                started = time.perf_counter()
+                rows = stage.process(batch.sheet, batch.rows)
+                metrics.busy += time.perf_counter() - started
+                metrics.batches += 1
+                metrics.rows_in += len(batch.rows)
+                metrics.rows_out += len(rows)
+                self._put(out, Batch(batch.sheet, rows), metrics)
+        except _Cancelled:
+            pass
+        except BaseException as exc:
+            self._fail(metrics.name, exc)
+
+    def _drain(self, source, metrics):
+        while True:
+            batch = self._get(source, metrics)
+            if batch is _END:
+                return
+            metrics.batches += 1
+            metrics.rows_in += len(batch.rows)
+            yield batch
+
+    def run(self):
+        """Führt die Pipeline aus; gibt die Metriken je Stufe zurück"""
+        for stage in self.stages:
+            stage.prepare(self.source)
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._produce, args=(queues[0], self.metrics[0]), name="Lesen", daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._transform, args=(stage, queues[idx], queues[idx + 1], self.metrics[idx + 1]),
+                name=stage.name, daemon=True,
+            ))
+        sink_metrics = self.metrics[-1]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            self.sink(self._drain(queues[-1], sink_metrics))
+        except _Cancelled:
+            pass
+        except BaseException as exc:
+            self._fail(sink_metrics.name, exc)
+        finally:
+            self._cancel.set()  # beendet Stufen, die noch auf eine Queue warten
+            for thread in threads:
+                thread.join()
+        sink_metrics.busy = time.perf_counter() - started - sink_metrics.wait_in
+        if self._error is not None:
+            stage, error = self._error
+            if isinstance(error, KeyboardInterrupt):
+                raise error
+            raise PipelineError(stage, error) from error
+        return self.metrics
+
+    def run_serial(self):
+        """Dieselben Stufen nacheinander je Batch im aufrufenden Thread (Vergleich, Fehlersuche)"""
+        for stage in self.stages:
+            stage.prepare(self.source)
+        started = time.perf_counter()
+        self.sink(self._serial_batches())
+        total = time.perf_counter() - started
+        self.metrics[-1].busy = total - sum(m.busy for m in self.metrics[:-1])
+        return self.metrics
+
+    def _serial_batches(self):
+        batches = self.source.batches(self.batch_rows)
+        source_metrics, sink_metrics = self.metrics[0], self.metrics[-1]
+        while True:
+            started = time.perf_counter()
+            batch = next(batches, None)
+            source_metrics.busy += time.perf_counter() - started
+            if batch is None:
+                return
+            source_metrics.batches += 1
+            source_metrics.rows_out += len(batch.rows)
+            for stage, metrics in zip(self.stages, self.metrics[1:-1]):
+                started = time.perf_counter()
+                rows = stage.process(batch.sheet, batch.rows)
+                metrics.busy += time.perf_counter() - started
+                metrics.batches += 1
+                metrics.rows_in += len(batch.rows)
+                metrics.rows_out += len(rows)
+                batch = Batch(batch.sheet, rows)
+            sink_metrics.batches += 1
+            sink_metrics.rows_in += len(batch.rows)
+            yield batch
+
+
+def build_stages(validate=False, strict=False, accounts=None, translate=False):
+    stages = []
+    if validate or strict:
+        stages.append(Validate(strict))
+    if accounts:
+        stages.append(AccountMapping(accounts))
+    if translate:
+        stages.append(CurrencyTranslation())
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verarbeitet ein ausgefülltes Template als Pipeline (Lesen -> Stufen -> Schreiben)")
+    parser.add_argument("input", help="Ausgefülltes Template (XLSX) oder Bundle-Verzeichnis")
+    parser.add_argument("output", help="Ausgabe-XLSX bzw. Bundle-Verzeichnis (mit --bundle)")
+    parser.add_argument("--bundle", choices=("csv", "parquet"), help="Als Spalten-Bundle statt XLSX schreiben")
+    parser.add_argument("--validate", action="store_true", help="Werte gegen die Auswahllisten prüfen")
+    parser.add_argument("--strict", action="store_true", help="Wie --validate, aber der erste Verstoß bricht ab")
+    parser.add_argument("--accounts", help="Kontenzuordnung (CSV: Kontonummer;HGB-Position)")
+    parser.add_argument("--translate", action="store_true", help="Beträge mit den Kursen aus Währungsumrechnung umrechnen")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_BATCHES, help="Batches je Queue (Backpressure)")
+    parser.add_argument(
+        "--mode", choices=("auto", "threads", "serial"), default="auto",
+        help="threads: Stufen in eigenen Threads; serial: im selben Thread (Vergleich); auto: seriell bei nur einem CPU-Kern",
+    )
+    args = parser.parse_args(argv)
+
+    serial = args.mode == "serial"
+    if args.mode == "auto" and (os.cpu_count() or 1) == 1:
+        # ohne zweiten Kern überlappt nichts - Thread-Wechsel kosten nur
+        print("[Pipeline] Nur ein CPU-Kern - Stufen laufen seriell")
+        serial = True
+
+    stages = build_stages(args.validate, args.strict, args.accounts, args.translate)
+    source = TemplateSource(args.input)
+    try:
+        if args.bundle:
+            sink = bundle_sink(args.output, source.sheets, args.bundle, os.path.basename(args.input))
+        else:
+            sink = xlsx_sink(args.output, source.sheets)
+        pipeline = Pipeline(source, stages, sink, args.batch_rows, args.queue_size)
+        started = time.perf_counter()
+        try:
+            metrics = pipeline.run_serial() if serial else pipeline.run()
+        except PipelineError as exc:
+            print(f"[Pipeline] ERROR: {exc}")
+            raise SystemExit(1)
+        elapsed = time.perf_counter() - started
+    finally:
+        source.close()
+    for stage_metrics in metrics:
+        print(f"  - {stage_metrics.describe()}")
+    for stage in stages:
+        for line in stage.summary():
+            print(f"      {stage.name}: {line}")
+    print(f"[Pipeline] {metrics[0].rows_out:,} Zeilen in {elapsed:.2f}s ({'seriell' if serial else 'parallel'}) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Vorbelegungsquellen für Template-Builds
+
+Eine Quelle liefert je Unternehmen die Zeilen der Datenblätter
+({Blattname: iterierbare Zeilen}) - direkt verwendbar als `data` für
+create_excel_template.build_template().
+
+Quellen werden über eine Spezifikation geöffnet:
+    bundle:/pfad/zum/bundle   Spalten-Bundle (siehe template_bundle.py)
+    sqlite:/pfad/store.db     SQLite-Store (siehe template_store.py), zuletzt geladenes Template
+    sqlite:/pfad/store.db#Q   ... Template mit Quellname/ID Q
+    postgresql://user@host/db Backend-Datenbank (benötigt psycopg2), letztes Geschäftsjahr je Unternehmen
+    postgresql://...#2025     ... Geschäftsjahr 2025
+
+Aufruf (ein vorbefülltes Template je Unternehmen, parallel gebaut):
+    python template_prefill.py QUELLE AUSGABE_DIR [--companies A,B] [--jobs N]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from template_schema import SCHEMAS
+
+
+class UnknownCompany(LookupError):
+    """Unternehmen kommt in der Vorbelegungsquelle nicht vor"""
+
+    def __init__(self, company):
+        super().__init__(f"Unbekanntes Unternehmen '{company}'")
+        self.company = company
+
+
+class PrefillSource:
+    """Gemeinsame Schnittstelle aller Vorbelegungsquellen"""
+
+    def version(self):
+        """Kennung des Datenstands - ändert sich, wenn sich die Daten ändern (Cache-Schlüssel)"""
+        raise NotImplementedError
+
+    def companies(self):
+        raise NotImplementedError
+
+    def company_data(self, company):
+        """{Blattname: Zeilen} mit allen Zeilen, die das Unternehmen betreffen"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BundlePrefillSource(PrefillSource):
+    """Vorbelegung aus einem Spalten-Bundle; Zeilen werden je Abruf gestreamt gefiltert"""
+
+    def __init__(self, directory):
+        from template_bundle import read_manifest
+
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+
+    def version(self):
+        from template_bundle import MANIFEST
+
+        stat = os.stat(os.path.join(self.directory, MANIFEST))
+        return f"bundle:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _rows(self, sheet_name):
+        from template_bundle import iter_bundle_rows
+
+        return iter_bundle_rows(self.directory, sheet_name, self.manifest)
+
+    def companies(self):
+        names = []
+        seen = set()
+        for schema in SCHEMAS:
+            if schema.name not in ("Unternehmensinformationen", "Bilanzdaten"):
+                continue
+            for row in self._rows(schema.name):
+                for company in schema.companies(row):
+                    if company not in seen:
+                        seen.add(company)
+                        names.append(company)
+        return names
+
+    def company_data(self, company):
+        return {schema.name: _company_rows(self._rows(schema.name), schema, company) for schema in SCHEMAS}
+
+
+def _company_rows(rows, schema, company):
+    """Zeilen, die das Unternehmen betreffen - schema je Blatt gebunden (nicht das der letzten Iteration)"""
+    return (row for row in rows if company in schema.companies(row))
+
+
+class StorePrefillSource(PrefillSource):
+    """Vorbelegung aus dem SQLite-Store - Zeilen je Unternehmen über die Indizes der Unternehmensspalten"""
+
+    def __init__(self, path, template=None):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.template = template
+        # Der Dienst fragt version() im Event-Loop und companies() aus Executor-Threads ab -
+        # eine sqlite3-Verbindung je Thread statt einer gemeinsamen ohne Sperre
+        self._local = threading.local()
+        self._stores = []
+        self._lock = threading.Lock()
+        self.store  # Datei sofort öffnen (Fehler beim Start, nicht bei der ersten Anfrage)
+
+    @property
+    def store(self):
+        store = getattr(self._local, "store", None)
+        if store is None:
+            from template_store import TemplateStore
+
+            # check_same_thread=False nur, damit close() alle Verbindungen schließen kann
+            store = self._local.store = TemplateStore(self.path, check_same_thread=False)
+            with self._lock:
+                self._stores.append(store)
+        return store
+
+    def _template_id(self):
+        return self.store.resolve(self.template)
+
+    def version(self):
+        template_id = self._template_id()
+        loaded = self.store.conn.execute("SELECT loaded FROM templates WHERE id = ?", (template_id,)).fetchone()[0]
+        return f"sqlite:{template_id}:{loaded}"
+
+    def companies(self):
+        return self.store.companies(self._template_id())
+
+    def company_data(self, company):
+        return self.store.company_data(self._template_id(), company)
+
+    def close(self):
+        with self._lock:
+            stores, self._stores = self._stores, []
+        for store in stores:
+            store.close()
+
+
+# Zeilen je fetchmany() der serverseitigen Cursor
+PG_FETCH_ROWS = 2000
+PG_POOL_SIZE = 4
+
+# Tabellen, deren Änderungen den Datenstand (version) ändern
+PG_TABLES = ("companies", "participations", "financial_statements", "account_balances", "accounts", "exchange_rates")
+
+# Geschäftsjahr: angegeben oder das letzte des Unternehmens
+_PG_YEAR = """COALESCE(%(year)s::int, (
+    SELECT MAX(fiscal_year) FROM financial_statements WHERE company_id = c.id))"""
+
+_PG_BALANCES = """
+    SELECT c.name, a.account_number, a.name, {columns},
+           CASE WHEN ab.is_intercompany THEN 'Ja' ELSE 'Nein' END, '', ''
+    FROM companies c
+    JOIN financial_statements fs ON fs.company_id = c.id
+    JOIN account_balances ab ON ab.financial_statement_id = fs.id
+    JOIN accounts a ON a.id = ab.account_id
+    WHERE c.name = %(company)s AND fs.fiscal_year = """ + _PG_YEAR + """
+      AND a.account_type IN ({types})
+    ORDER BY a.account_number"""
+
+PG_QUERIES = {
+    "Unternehmensinformationen": """
+        SELECT c.name,
+               CASE WHEN c.parent_company_id IS NULL THEN 'Mutterunternehmen (H)' ELSE 'Tochterunternehmen (TU)' END,
+               COALESCE(p.participation_percentage, CASE WHEN c.parent_company_id IS NULL THEN 100 END),
+               p.acquisition_date, p.acquisition_cost, COALESCE(c.notes, '')
+        FROM companies c
+        LEFT JOIN participations p ON p.subsidiary_company_id = c.id AND p.parent_company_id = c.parent_company_id
+        WHERE c.name = %(company)s""",
+    # HGB-Position ist im Backend nicht gepflegt -> leer
+    "Bilanzdaten": _PG_BALANCES.format(
+        columns="'', a.account_type, ab.debit, ab.credit, ab.balance", types="'asset', 'liability', 'equity'"
+    ),
+    # GuV-Daten ohne Soll/Haben; Aufwandskonten als betrieblicher Aufwand
+    "GuV-Daten": _PG_BALANCES.format(
+        columns="CASE WHEN a.account_type = 'revenue' THEN 'revenue' ELSE 'operating_expense' END, ab.balance",
+        types="'revenue', 'expense'",
+    ),
+    "Beteiligungsverhältnisse": """
+        SELECT m.name, t.name, p.participation_percentage, p.acquisition_cost, p.acquisition_date,
+               p.acquisition_cost, ''
+        FROM participations p
+        JOIN companies m ON m.id = p.parent_company_id
+        JOIN companies t ON t.id = p.subsidiary_company_id
+        WHERE (m.name = %(company)s OR t.name = %(company)s) AND COALESCE(p.is_active, TRUE)
+        ORDER BY m.name, t.name""",
+    # Kurse Fremdwährung -> EUR (wie exchange-rate.service.ts): Stichtag = spot, GuV = average
+    "Währungsumrechnung": """
+        SELECT c.name, cur.code,
+               CASE WHEN cur.code = 'EUR' THEN 1 ELSE spot.rate END,
+               CASE WHEN cur.code = 'EUR' THEN 1 ELSE COALESCE(avg.rate, spot.rate) END,
+               spot.rate_date, ''
+        FROM companies c
+        CROSS JOIN LATERAL (SELECT COALESCE(c.functional_currency, 'EUR') AS code) cur
+        LEFT JOIN LATERAL (
+            SELECT rate, rate_date FROM exchange_rates
+            WHERE from_currency = cur.code AND to_currency = 'EUR' AND rate_type = 'spot'
+              AND (%(year)s::int IS NULL OR rate_date <= make_date(%(year)s::int, 12, 31))
+            ORDER BY rate_date DESC LIMIT 1
+        ) spot ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT rate FROM exchange_rates
+            WHERE from_currency = cur.code AND to_currency = 'EUR' AND rate_type = 'average'
+              AND (%(year)s::int IS NULL OR rate_date <= make_date(%(year)s::int, 12, 31))
+            ORDER BY rate_date DESC LIMIT 1
+        ) avg ON TRUE
+        WHERE c.name = %(company)s""",
+}
+
+
+class PostgresPrefillSource(PrefillSource):
+    """
+    Vorbelegung direkt aus der Backend-Datenbank (companies, participations, account_balances,
+    exchange_rates). Jede Blattabfrage läuft über einen benannten (serverseitigen) Cursor und
+    wird blockweise (fetchmany) gestreamt - Ergebnismengen liegen nie vollständig im Speicher.
+    Verbindungen kommen aus einem kleinen Pool; eine Verbindung ist nur belegt, solange das
+    Blatt geschrieben wird. Blätter ohne Tabelle im Backend bleiben leer.
+    """
+
+    def __init__(self, dsn, fiscal_year=None, pool_size=PG_POOL_SIZE):
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+        except ImportError:
+            raise RuntimeError("Postgres-Vorbelegung benötigt psycopg2 (pip install psycopg2-binary)") from None
+        self.fiscal_year = fiscal_year
+        self._pool = ThreadedConnectionPool(1, pool_size, dsn)
+        self._cursor_ids = itertools.count(1)
+
+    def _stream(self, sql, params):
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor(name=f"prefill_{next(self._cursor_ids)}") as cursor:
+                cursor.itersize = PG_FETCH_ROWS
+                cursor.execute(sql, params)
+                while True:
+                    batch = cursor.fetchmany(PG_FETCH_ROWS)
+                    if not batch:
+                        break
+                    yield from batch
+        finally:
+            conn.rollback()  # Lesetransaktion des benannten Cursors beenden
+            self._pool.putconn(conn)
+
+    def _fetch_all(self, sql, params=None):
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        finally:
+            conn.rollback()
+            self._pool.putconn(conn)
+
+    def version(self):
+        # Schreibzähler der Statistik - günstiger als COUNT/MAX über große Tabellen, erfasst auch Löschungen
+        (writes,), = self._fetch_all(
+            "SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0) FROM pg_stat_user_tables "
+            "WHERE relname = ANY(%s)",
+            (list(PG_TABLES),),
+        )
+        return f"postgres:{self.fiscal_year}:{writes}"
+
+    def companies(self):
+        return [
+            name for (name,) in self._stream(
+                "SELECT name FROM companies ORDER BY parent_company_id IS NOT NULL, name", {}
+            )
+        ]
+
+    def company_data(self, company):
+        params = {"company": company, "year": self.fiscal_year}
+        # Generatoren starten erst beim Schreiben des jeweiligen Blatts
+        return {
+            schema.name: self._stream(PG_QUERIES[schema.name], params) if schema.name in PG_QUERIES else ()
+            for schema in SCHEMAS
+        }
+
+    def close(self):
+        self._pool.closeall()
+
+
+def open_prefill_source(spec):
+    """'bundle:DIR' / 'sqlite:DATEI[#Template]' / 'postgresql://...[#Jahr]' -> PrefillSource"""
+    if spec.startswith(("postgres://", "postgresql://")):
+        dsn, _, year = spec.partition("#")
+        return PostgresPrefillSource(dsn, int(year) if year else None)
+    kind, _, target = spec.partition(":")
+    if kind == "bundle" and target:
+        return BundlePrefillSource(target)
+    if kind == "sqlite" and target:
+        path, _, template = target.partition("#")
+        return StorePrefillSource(path, template or None)
+    raise ValueError(
+        f"Unbekannte Vorbelegungsquelle '{spec}' (erwartet z.B. bundle:/pfad, sqlite:/pfad.db oder postgresql://...)"
+    )
+
+
+# ===== Batch: ein Template je Unternehmen =====
+
+_worker_sources = {}
+
+
+def cached_source(spec):
+    """Eine geöffnete Quelle je Prozess und Spezifikation (Worker bauen viele Templates nacheinander)"""
+    source = _worker_sources.get(spec)
+    if source is None:
+        source = _worker_sources[spec] = open_prefill_source(spec)
+    return source
+
+
+def _build_company(spec, company, path, engine, sheets):
+    from create_excel_template import build_template
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        metrics = build_template(path, engine, cached_source(spec).company_data(company), sheets=sheets)
+    return metrics.rows
+
+
+def company_template_path(output_dir, company):
+    from template_split import shard_name
+
+    return os.path.join(output_dir, shard_name(company) + ".xlsx")
+
+
+def source_companies(spec):
+    source = open_prefill_source(spec)
+    try:
+        return source.companies()
+    finally:
+        source.close()
+
+
+def prefill_templates(spec, output_dir, companies=None, jobs=None, engine="xml", sheets="full"):
+    """Baut je Unternehmen ein vorbefülltes Template (parallel); gibt {Unternehmen: (Datei, Zeilen)} zurück"""
+    if companies is None:
+        companies = source_companies(spec)
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            company: (path, pool.submit(_build_company, spec, company, path, engine, sheets))
+            for company in companies
+            for path in [company_template_path(output_dir, company)]
+        }
+        return {company: (path, future.result()) for company, (path, future) in futures.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Erstellt je Unternehmen ein vorbefülltes Template")
+    parser.add_argument("source", help="Vorbelegungsquelle, z.B. postgresql://user@host/db#2025 oder bundle:/pfad")
+    parser.add_argument("output_dir")
+    parser.add_argument("--companies", help="Kommagetrennte Unternehmen (Standard: alle der Quelle)")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallele Builds (Standard: CPU-Kerne)")
+    parser.add_argument("--engine", default="xml")
+    parser.add_argument("--sheets", default="full", help="Profil und/oder Blattnamen (siehe create_excel_template)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    companies = [c.strip() for c in args.companies.split(",") if c.strip()] if args.companies else None
+    results = prefill_templates(args.source, args.output_dir, companies, args.jobs, args.engine, args.sheets)
+    for company, (path, rows) in results.items():
+        print(f"  - {company}: {rows:,} Zeilen -> {os.path.basename(path)}")
+    print(f"[SUCCESS] {len(results)} Templates in {time.perf_counter() - started:.2f}s erstellt: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
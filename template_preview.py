@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Sofort-Vorschau eines hochgeladenen Templates
+
+Statt auf den vollständigen Import zu warten, liest die Vorschau die Datenblätter als
+Stream (mmap + iterparse, siehe template_fastread.py) in zwei Durchläufen:
+  1. Stichprobe: die ersten N Zeilen jedes Blatts; jedes Blatt wird nach N Zeilen
+     verlassen - alle Stichproben stehen fest, bevor ein Blatt vollständig gelesen wird.
+     Shared Strings werden nur so weit gelesen, wie Indizes gebraucht werden (Texte
+     späterer Blätter stehen weiter hinten - dafür zählt die Größe der Shared Strings,
+     nicht die der Blätter)
+  2. Sketches: ungefähre Anzahl verschiedener Unternehmen/Kontonummern (HyperLogLog,
+     bis DISTINCT_EXACT Werte exakt), Summe/Min/Max je Zahlenspalte (Soll/Haben-Summen)
+     und Anteil leerer Pflichtfelder
+Nach `scan_rows` Zeilen je Blatt wird der zweite Durchlauf abgebrochen; das Ergebnis ist
+dann als unvollständig markiert (complete=False) und beschreibt nur die gelesenen Zeilen.
+
+Aufruf:
+    python template_preview.py GEFUELLT.xlsx [--rows 10] [--scan-rows 100000 | --full] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+from template_fastread import NS_MAIN, MappedZip, PartRows, iter_part_rows, sheet_part_names
+from template_schema import NUMBER, SCHEMAS
+from template_writer import continuation_title
+
+SAMPLE_ROWS = 10
+SCAN_ROWS = 100_000
+HLL_PRECISION = 12  # 4096 Register, Standardfehler ~1,6 %
+DISTINCT_EXACT = 1024  # bis hierhin exakt gezählt
+
+# Spalten mit Distinct-Sketch (sofern im Blatt vorhanden)
+DISTINCT_COLUMNS = ("Unternehmen", "Unternehmensname", "Kontonummer", "Von Unternehmen", "An Unternehmen")
+
+# Pflichtfelder je Blatt - Anteil leerer Zellen wird gemeldet
+REQUIRED_COLUMNS = {
+    "Bilanzdaten": ("Unternehmen", "Kontonummer", "Kontoname", "Kontotyp"),
+    "GuV-Daten": ("Unternehmen", "Kontonummer", "Kontotyp", "Betrag"),
+    "Unternehmensinformationen": ("Unternehmensname", "Typ"),
+    "Beteiligungsverhältnisse": ("Mutterunternehmen", "Tochterunternehmen", "Beteiligungs-%"),
+    "Zwischengesellschaftsgeschäfte": ("Von Unternehmen", "An Unternehmen", "Transaktionstyp", "Betrag"),
+    "Eigenkapital-Aufteilung": ("Unternehmen",),
+    "Währungsumrechnung": ("Unternehmen", "Währung (ISO)", "Umrechnungskurs (Stichtag)"),
+    "Latente Steuern": ("Unternehmen", "Steuerart", "Temporäre Differenz"),
+}
+
+_SI, _T = NS_MAIN + "si", NS_MAIN + "t"
+
+
+class LazySharedStrings:
+    """sharedStrings.xml wird nur bis zum höchsten angefragten Index gelesen"""
+
+    def __init__(self, zf):
+        self._strings = []
+        self._file = zf.open("xl/sharedStrings.xml") if "xl/sharedStrings.xml" in zf.namelist() else None
+        self._events = iterparse(self._file) if self._file is not None else iter(())
+
+    def __getitem__(self, idx):
+        strings = self._strings
+        while idx >= len(strings):
+            for _, elem in self._events:
+                if elem.tag == _SI:
+                    strings.append("".join(t.text or "" for t in elem.iter(_T)))
+                    elem.clear()
+                    break
+            else:
+                raise IndexError(f"Shared String {idx} fehlt")
+        return strings[idx]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class HyperLogLog:
+    """Distinct-Schätzer; bis DISTINCT_EXACT verschiedene Werte exakt"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._exact = set()
+
+    def add(self, value):
+        exact = self._exact
+        if exact is not None:
+            if value in exact:
+                return
+            exact.add(value)
+            if len(exact) > DISTINCT_EXACT:
+                self._exact = None
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        x = int.from_bytes(digest, "big")
+        bits = 64 - self.precision
+        idx, rest = x >> bits, x & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def count(self):
+        if self._exact is not None:
+            return len(self._exact)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear Counting für kleine Mengen
+        return round(estimate)
+
+    @property
+    def exact(self):
+        return self._exact is not None
+
+
+@dataclass
+class NumberStats:
+    count: int = 0
+    total: float = 0.0
+    min: float = None
+    max: float = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+
+@dataclass
+class SheetPreview:
+    sheet: str
+    headers: list
+    sample: list = field(default_factory=list)
+    rows: int = 0
+    complete: bool = True
+    distinct: dict = field(default_factory=dict)  # Spalte -> Anzahl (geschätzt, außer bei exact)
+    distinct_exact: dict = field(default_factory=dict)
+    numbers: dict = field(default_factory=dict)  # Spalte -> NumberStats
+    empty_required: dict = field(default_factory=dict)  # Spalte -> Anteil leerer Zellen
+    sample_ms: float = 0.0
+
+
+def _sheet_rows(zf, parts, schema, strings):
+    """Typisierte Zeilen eines Datenblatts über alle Teilblätter (bis zur Summenzeile)"""
+    for part in parts:
+        with zf.open(part) as stream:
+            part_rows = PartRows(schema, iter_part_rows(stream, strings))
+            yield from part_rows
+        if part_rows.footer:
+            return
+
+
+def sample_sheet(zf, parts, schema, strings, sample_rows=SAMPLE_ROWS):
+    """Erste Zeilen eines Datenblatts - liest nur so weit wie nötig"""
+    rows = _sheet_rows(zf, parts, schema, strings)
+    try:
+        return list(islice(rows, sample_rows))
+    finally:
+        rows.close()  # schließt das offene Teilblatt
+
+
+def scan_sheet(zf, parts, schema, strings, scan_rows=SCAN_ROWS):
+    """Sketches eines Datenblatts (Teilblätter nacheinander) in einem Durchlauf"""
+    result = SheetPreview(schema.name, list(schema.headers))
+    sketches = [(c, schema.index(c), HyperLogLog()) for c in DISTINCT_COLUMNS if c in schema.headers]
+    numbers = [
+        (column, idx, NumberStats()) for idx, column in enumerate(schema.headers)
+        if schema.column_type(column) == NUMBER
+    ]
+    required = [(c, schema.index(c)) for c in REQUIRED_COLUMNS.get(schema.name, ())]
+    empty = [0] * len(required)
+    rows = 0
+    source = _sheet_rows(zf, parts, schema, strings)
+    try:
+        for row in source:
+            if scan_rows is not None and rows >= scan_rows:
+                result.complete = False
+                break
+            rows += 1
+            for _, idx, sketch in sketches:
+                if row[idx]:
+                    sketch.add(row[idx])
+            for _, idx, stats in numbers:
+                if row[idx] is not None:
+                    stats.add(row[idx])
+            for i, (_, idx) in enumerate(required):
+                if row[idx] is None or row[idx] == "":
+                    empty[i] += 1
+    finally:
+        source.close()
+    result.rows = rows
+    result.distinct = {column: sketch.count() for column, _, sketch in sketches}
+    result.distinct_exact = {column: sketch.exact for column, _, sketch in sketches}
+    result.numbers = {column: stats for column, _, stats in numbers if stats.count}
+    result.empty_required = {column: (empty[i] / rows if rows else 0.0) for i, (column, _) in enumerate(required)}
+    return result
+
+
+def preview_template(path, sample_rows=SAMPLE_ROWS, scan_rows=SCAN_ROWS):
+    """{Blattname: SheetPreview} für alle Datenblätter - erst alle Stichproben, dann die Sketches"""
+    started = time.perf_counter()
+    with MappedZip(path) as mz:
+        zf = mz.zip
+        part_names = sheet_part_names(zf)
+        strings = LazySharedStrings(zf)
+        try:
+            sheets = []
+            for schema in SCHEMAS:
+                parts, number, title = [], 1, schema.name
+                while title in part_names:
+                    parts.append(part_names[title])
+                    number += 1
+                    title = continuation_title(schema.name, number)
+                if parts:
+                    sheets.append((schema, parts))
+            samples = {}
+            for schema, parts in sheets:
+                samples[schema.name] = (
+                    sample_sheet(zf, parts, schema, strings, sample_rows), (time.perf_counter() - started) * 1000
+                )
+            previews = {}
+            for schema, parts in sheets:
+                preview = scan_sheet(zf, parts, schema, strings, scan_rows)
+                preview.sample, preview.sample_ms = samples[schema.name]
+                previews[schema.name] = preview
+            return previews
+        finally:
+            strings.close()
+
+
+def preview_json(previews):
+    return {name: asdict(preview) for name, preview in previews.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sofort-Vorschau eines ausgefüllten Templates (Stichprobe + Sketches)")
+    parser.add_argument("template")
+    parser.add_argument("--rows", type=int, default=SAMPLE_ROWS, help="Stichprobe: erste N Zeilen je Blatt")
+    parser.add_argument("--scan-rows", type=int, default=SCAN_ROWS, help="Sketches über höchstens N Zeilen je Blatt")
+    parser.add_argument("--full", action="store_true", help="Sketches über alle Zeilen")
+    parser.add_argument("--json", action="store_true", help="Ergebnis als JSON ausgeben")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    previews = preview_template(args.template, args.rows, None if args.full else args.scan_rows)
+    elapsed = time.perf_counter() - started
+    if args.json:
+        print(json.dumps(preview_json(previews), ensure_ascii=False, default=str))
+        return
+    for name, p in previews.items():
+        scope = "" if p.complete else f" (abgebrochen nach {p.rows:,} Zeilen)"
+        print(f"  - {name}: {p.rows:,} Zeilen{scope}, Stichprobe nach {p.sample_ms:.1f} ms")
+        for row in p.sample[:3]:
+            print(f"      {row[:4]}")
+        for column, count in p.distinct.items():
+            print(f"      {column}: {'' if p.distinct_exact[column] else '~'}{count:,} verschiedene")
+        for column, stats in p.numbers.items():
+            print(f"      {column}: Summe {stats.total:,.2f}, Min {stats.min:,.2f}, Max {stats.max:,.2f}")
+        for column, share in p.empty_required.items():
+            if share:
+                print(f"      WARNING: {column}: {share:.1%} leer")
+    print(f"[Preview] {len(previews)} Blätter in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Streaming-Reader für ausgefüllte Konsolidierungs-Templates
+
+Liest Datenblätter mit openpyxl im read-only Modus Zeile für Zeile und liefert
+typisierte Zeilen in Schema-Reihenfolge (siehe template_schema.py). Folgeblätter
+übergroßer Datenblätter ('Bilanzdaten (2)', ...) werden als eine Tabelle gelesen.
+"""
+
+import contextlib
+import os
+
+from template_schema import SCHEMAS, get_schema, is_empty_row, normalize_row
+from template_writer import continuation_title
+
+# So viele Zeilen werden nach der Header-Zeile durchsucht, falls sie verschoben ist
+HEADER_SCAN_ROWS = 5
+
+
+class TemplateFormatError(ValueError):
+    """Blatt entspricht nicht dem erwarteten Template-Layout"""
+
+
+def open_template(path):
+    from openpyxl import load_workbook
+
+    return load_workbook(path, read_only=True, data_only=False)
+
+
+def _header_map(schema, header_values):
+    """Spalte im Blatt -> Index im Schema; None wenn zu wenige Header passen"""
+    positions = {}
+    for col, value in enumerate(header_values):
+        name = str(value).strip() if value is not None else ""
+        if name in schema.headers and name not in positions:
+            positions[name] = col
+    if schema.headers[0] not in positions or len(positions) * 2 < schema.width:
+        return None
+    return [positions.get(column) for column in schema.headers]
+
+
+def locate_header(ws, schema):
+    """
+    Sucht die Header-Zeile (zuerst an der Schema-Position) und liefert
+    (Zeilennummer, Spaltenzuordnung).
+    """
+    for row_idx, values in enumerate(ws.iter_rows(max_row=schema.header_row + HEADER_SCAN_ROWS, values_only=True), start=1):
+        mapping = _header_map(schema, values)
+        if mapping is not None:
+            return row_idx, mapping
+    raise TemplateFormatError(f"Blatt '{schema.name}': Header-Zeile nicht gefunden (erwartet: {', '.join(schema.headers)})")
+
+
+def sheet_parts(wb, sheet_name):
+    """Blattnamen eines Datenblatts inklusive vorhandener Folgeblätter, in Reihenfolge"""
+    parts = [sheet_name]
+    while continuation_title(sheet_name, len(parts) + 1) in wb.sheetnames:
+        parts.append(continuation_title(sheet_name, len(parts) + 1))
+    return parts
+
+
+def iter_sheet_rows(wb, sheet_name, raw=False):
+    """
+    Liefert (Excel-Zeilennummer, Zeile) für alle Datenzeilen des Blatts und seiner
+    Folgeblätter; die Zeilennummer bezieht sich auf das jeweilige Teilblatt (siehe iter_sheet_part_rows).
+    Leere Zeilen werden übersprungen, eine Summenzeile (z.B. BILANZSUMME) beendet die Tabelle.
+    raw=True liefert die unveränderten Zellwerte in Schema-Reihenfolge.
+    """
+    for _, row_idx, row in iter_sheet_part_rows(wb, sheet_name, raw):
+        yield row_idx, row
+
+
+def iter_sheet_part_rows(wb, sheet_name, raw=False):
+    """Wie iter_sheet_rows, liefert aber (Teilblatt, Excel-Zeilennummer, Zeile)"""
+    schema = get_schema(sheet_name)
+    for part in sheet_parts(wb, sheet_name):
+        ws = wb[part]
+        header_row, mapping = locate_header(ws, schema)
+        identity = mapping == list(range(schema.width))
+        for row_idx, values in enumerate(ws.iter_rows(min_row=header_row + 1, values_only=True), start=header_row + 1):
+            if identity:
+                values = values[:schema.width]
+            else:
+                values = [values[col] if col is not None and col < len(values) else None for col in mapping]
+            if is_empty_row(values):
+                continue
+            if schema.footer_labels and str(values[0]).strip() in schema.footer_labels:
+                return
+            yield part, row_idx, (list(values) if raw else normalize_row(schema, values))
+
+
+def data_sheets(wb):
+    """Schemas der im Workbook vorhandenen Datenblätter (Template-Reihenfolge)"""
+    return [schema for schema in SCHEMAS if schema.name in wb.sheetnames]
+
+
+def read_template(path):
+    """Kleine Dateien: {Blattname: [Zeilen]} - für große Dateien iter_sheet_rows verwenden"""
+    wb = open_template(path)
+    try:
+        return {schema.name: [row for _, row in iter_sheet_rows(wb, schema.name)] for schema in data_sheets(wb)}
+    finally:
+        wb.close()
+
+
+@contextlib.contextmanager
+def open_rows(path):
+    """XLSX-Datei oder Bundle-Verzeichnis -> rows(Blattname) mit typisierten Zeilen (leer, wenn das Blatt fehlt)"""
+    from template_bundle import MANIFEST, iter_bundle_rows, read_manifest
+
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST)):
+        manifest = read_manifest(path)
+        yield lambda sheet: iter_bundle_rows(path, sheet, manifest)
+        return
+    wb = open_template(path)
+    try:
+        yield lambda sheet: (row for _, row in iter_sheet_rows(wb, sheet)) if sheet in wb.sheetnames else iter(())
+    finally:
+        wb.close()
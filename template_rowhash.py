@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Zeilen-Hashes für Re-Importe: nur geänderte Zeilen verarbeiten
+
+Der Generator schreibt in Bilanzdaten, GuV-Daten und Zwischengesellschaftsgeschäfte
+hinter die Datenspalten eine ausgeblendete Spalte 'Zeilen-Hash' (BLAKE2b, 64 Bit über
+die typisierte Zeile wie template_reader sie liefert) und in das ausgeblendete Blatt
+'Prüfsummen' einen Digest je (Teil-)Blatt: Hashes in Blöcken zu BLOCK_ROWS Zeilen,
+der Digest über die Block-Hashes (zweistufiger Merkle-Baum).
+
+Dieser Reader meldet nur Zeilen, deren Inhalt nicht mehr zu ihrem Hash passt
+('geändert') oder die keinen Hash haben ('neu'). Mit --previous wird statt gegen die
+Hash-Spalte gegen den beim letzten Import gespeicherten Digest (--save) verglichen -
+dann werden auch entfernte Zeilen gezählt. Stimmt der Digest eines Blatts überein,
+ist es unverändert.
+
+Aufruf:
+    python template_rowhash.py GEFUELLT.xlsx [--previous letzter_import.json] [--save digest.json] [--limit 50]
+"""
+
+import argparse
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+
+from create_excel_template import DIGEST_SHEET, HASH_HEADER
+from template_reader import locate_header, open_template, sheet_parts
+from template_schema import get_schema, is_empty_row, normalize_row
+
+HASHED_SHEETS = ("Bilanzdaten", "GuV-Daten", "Zwischengesellschaftsgeschäfte")
+BLOCK_ROWS = 1024
+DIGEST_VERSION = 1
+
+
+def _canonical(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value + 0.0)  # -0.0 und 0.0 gleich
+    return str(value)
+
+
+def row_hash(row):
+    """Hash einer typisierten Zeile (Schema-Reihenfolge) als 16 Hex-Zeichen"""
+    text = "\x1f".join(_canonical(value) for value in row)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def row_hasher(sheet_name):
+    """Generator: Rohzeile -> Hash; berechnete Spalten wie der Reader aus ihren Formeln"""
+    schema = get_schema(sheet_name)
+    return lambda values: row_hash(normalize_row(schema, values, recompute=True))
+
+
+class MerkleDigest:
+    """Digest über Zeilen-Hashes: Block-Hashes je BLOCK_ROWS Zeilen, darüber die Wurzel"""
+
+    def __init__(self):
+        self.count = 0
+        self._blocks = []
+        self._block = hashlib.blake2b(digest_size=16)
+
+    def add(self, row_hash):
+        self._block.update(bytes.fromhex(row_hash))
+        self.count += 1
+        if self.count % BLOCK_ROWS == 0:
+            self._blocks.append(self._block.digest())
+            self._block = hashlib.blake2b(digest_size=16)
+
+    def finish(self):
+        """(Zeilen, Digest als Hex)"""
+        blocks = list(self._blocks)
+        if self.count % BLOCK_ROWS:
+            blocks.append(self._block.digest())
+        root = hashlib.blake2b(self.count.to_bytes(8, "big"), digest_size=16)
+        for block in blocks:
+            root.update(block)
+        return self.count, root.hexdigest()
+
+
+def read_digests(wb):
+    """Blatt 'Prüfsummen' -> {Teilblatt: (Blatt, Zeilen, Digest)}; leer, wenn es fehlt"""
+    if DIGEST_SHEET not in wb.sheetnames:
+        return {}
+    digests = {}
+    for values in wb[DIGEST_SHEET].iter_rows(min_row=2, values_only=True):
+        if values and values[1]:
+            sheet, title, rows, digest = (list(values) + [None] * 4)[:4]
+            digests[title] = (sheet, int(rows or 0), digest)
+    return digests
+
+
+def iter_hashed_rows(wb, sheet_name):
+    """(Teilblatt, Zeilennummer, typisierte Zeile, gespeicherter Hash oder None) - wie iter_sheet_part_rows"""
+    schema = get_schema(sheet_name)
+    for part in sheet_parts(wb, sheet_name):
+        ws = wb[part]
+        header_row, mapping = locate_header(ws, schema)
+        header = next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True))
+        names = [str(value).strip() if value is not None else "" for value in header]
+        hash_col = names.index(HASH_HEADER) if HASH_HEADER in names else None
+        for row_idx, values in enumerate(ws.iter_rows(min_row=header_row + 1, values_only=True), start=header_row + 1):
+            row = [values[col] if col is not None and col < len(values) else None for col in mapping]
+            if is_empty_row(row):
+                continue
+            if schema.footer_labels and str(row[0]).strip() in schema.footer_labels:
+                return
+            stored = values[hash_col] if hash_col is not None and hash_col < len(values) else None
+            yield part, row_idx, normalize_row(schema, row), (str(stored).strip() or None) if stored else None
+
+
+@dataclass
+class SheetChanges:
+    sheet: str
+    rows: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    digest: str = ""
+    digest_ok: bool = None  # Hash-Spalte passt zum Digest im Blatt 'Prüfsummen' (None: keiner vorhanden)
+    changes: list = field(default_factory=list)  # [(Teilblatt, Zeilennummer, 'neu'/'geändert', Zeile)]
+    hashes: list = field(default_factory=list)
+
+
+def diff_sheet(wb, sheet_name, digests, previous=None):
+    """
+    Vergleicht ein Blatt mit seiner Hash-Spalte bzw. - falls previous gegeben - mit dem
+    gespeicherten Digest des letzten Imports ({"digest": ..., "rows": [Hashes]}).
+    """
+    result = SheetChanges(sheet_name)
+    current, stored_digests = MerkleDigest(), {}
+    remaining = Counter(previous["rows"]) if previous else None
+    for part, row_idx, row, stored in iter_hashed_rows(wb, sheet_name):
+        actual = row_hash(row)
+        current.add(actual)
+        result.hashes.append(actual)
+        result.rows += 1
+        if stored:
+            stored_digests.setdefault(part, MerkleDigest()).add(stored)
+        if remaining is not None:
+            if remaining[actual] > 0:
+                remaining[actual] -= 1
+                result.unchanged += 1
+                continue
+            # alte Fassung der Zeile zählt nicht als entfernt
+            status = "neu"
+            if stored and remaining[stored] > 0:
+                remaining[stored] -= 1
+                status = "geändert"
+        elif stored == actual:
+            result.unchanged += 1
+            continue
+        else:
+            status = "geändert" if stored else "neu"
+        result.changes.append((part, row_idx, status, row))
+    result.digest = current.finish()[1]
+    if remaining is not None:
+        result.removed = sum(remaining.values())
+        if previous.get("digest") == result.digest:
+            result.changes, result.unchanged = [], result.rows
+    # Digest der Hash-Spalte je Teilblatt: weicht er ab, wurden Zeilen gelöscht, verschoben oder kopiert
+    expected = {title: entry for title, entry in digests.items() if entry[0] == sheet_name}
+    if expected:
+        result.digest_ok = all(
+            stored_digests.get(title, MerkleDigest()).finish() == (rows, digest)
+            for title, (_, rows, digest) in expected.items()
+        )
+        if previous is None:
+            result.removed = max(0, sum(rows for _, rows, _ in expected.values()) - sum(
+                digest.count for digest in stored_digests.values()
+            ))
+    return result
+
+
+def changed_rows(path, previous=None, sheets=HASHED_SHEETS):
+    """{Blatt: SheetChanges} für alle Blätter mit Zeilen-Hashes"""
+    wb = open_template(path)
+    try:
+        digests = read_digests(wb)
+        return {
+            name: diff_sheet(wb, name, digests, (previous or {}).get(name))
+            for name in sheets if name in wb.sheetnames
+        }
+    finally:
+        wb.close()
+
+
+def save_digest(path, results):
+    """Digest je Blatt für den nächsten Import (--previous)"""
+    data = {
+        "version": DIGEST_VERSION,
+        "sheets": {name: {"digest": r.digest, "rows": r.hashes} for name, r in results.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def load_digest(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version", 0) > DIGEST_VERSION:
+        raise ValueError(f"{path}: Digest-Version {data['version']} wird nicht unterstützt")
+    return data["sheets"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Meldet geänderte Zeilen eines ausgefüllten Templates anhand der Zeilen-Hashes")
+    parser.add_argument("template")
+    parser.add_argument("--previous", help="Digest des letzten Imports (JSON, siehe --save)")
+    parser.add_argument("--save", help="Digest dieses Imports speichern")
+    parser.add_argument("--limit", type=int, default=20, help="Höchstens so viele Zeilen je Blatt ausgeben")
+    args = parser.parse_args(argv)
+
+    previous = load_digest(args.previous) if args.previous else None
+    results = changed_rows(args.template, previous)
+    for name, result in results.items():
+        print(
+            f"  - {name}: {result.rows:,} Zeilen, {len(result.changes):,} geändert/neu, "
+            f"{result.unchanged:,} unverändert, {result.removed:,} entfernt"
+        )
+        if result.digest_ok is False:
+            print("      WARNING: Hash-Spalte passt nicht zum Digest (Zeilen gelöscht, verschoben oder kopiert)")
+        for part, row_idx, status, row in result.changes[:args.limit]:
+            print(f"      {part}!{row_idx}: {status} - {row[:3]}")
+        if len(result.changes) > args.limit:
+            print(f"      ... {len(result.changes) - args.limit:,} weitere")
+    if args.save:
+        save_digest(args.save, results)
+        print(f"[RowHash] Digest gespeichert: {args.save}")
+    print(f"[RowHash] {sum(len(r.changes) for r in results.values()):,} Zeilen zu importieren")
+
+
+if __name__ == "__main__":
+    main()
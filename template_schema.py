@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Logisches Schema der Datenblätter des Konsolidierungs-Templates (v3.0)
+
+Gemeinsame Grundlage für Reader, Bundle-Export und alle Werkzeuge, die
+ausgefüllte Templates verarbeiten. Header kommen direkt aus dem Generator.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import create_excel_template as tpl
+
+TEMPLATE_VERSION = "3.0"
+
+# Spaltentypen
+STRING = "string"
+NUMBER = "number"
+DATE = "date"  # ISO-8601 (YYYY-MM-DD) als Text
+
+
+@dataclass(frozen=True)
+class SheetSchema:
+    name: str
+    headers: tuple
+    header_row: int = 1  # 1-basiert; 2 bei Blättern mit Titelzeile
+    types: dict = field(default_factory=dict)  # Spaltenname -> NUMBER/DATE (Standard: STRING)
+    derived: dict = field(default_factory=dict)  # Spaltenname -> f(row_dict), ersetzt Formeln
+    footer_labels: tuple = ()  # Erste Spalte beendet die Tabelle (z.B. BILANZSUMME)
+    file: str = ""  # Dateiname (ohne Endung) im Bundle
+    company_columns: tuple = ()  # Spalten, die eine Zeile einem Unternehmen zuordnen
+
+    @property
+    def width(self):
+        return len(self.headers)
+
+    @property
+    def first_data_row(self):
+        return self.header_row + 1
+
+    def column_type(self, column):
+        return self.types.get(column, STRING)
+
+    def index(self, column):
+        return self.headers.index(column)
+
+    def companies(self, row):
+        """Unternehmen, denen eine (normalisierte) Zeile zugeordnet ist"""
+        return [row[self.headers.index(c)] for c in self.company_columns if row[self.headers.index(c)]]
+
+
+def _num(row, column):
+    return row.get(column) or 0.0
+
+
+SCHEMAS = [
+    SheetSchema(
+        "Bilanzdaten", tuple(tpl.headers_bilanz),
+        types={"Soll": NUMBER, "Haben": NUMBER, "Saldo": NUMBER},
+        derived={"Saldo": lambda r: _num(r, "Soll") - _num(r, "Haben")},
+        footer_labels=("BILANZSUMME",),
+        file="bilanzdaten",
+        company_columns=("Unternehmen",),
+    ),
+    SheetSchema(
+        "GuV-Daten", tuple(tpl.headers_guv),
+        types={"Betrag": NUMBER},
+        file="guv_daten",
+        company_columns=("Unternehmen",),
+    ),
+    SheetSchema(
+        "Unternehmensinformationen", tuple(tpl.headers_unternehmen),
+        types={"Beteiligungs-%": NUMBER, "Erwerbsdatum": DATE, "Anschaffungskosten": NUMBER},
+        file="unternehmensinformationen",
+        company_columns=("Unternehmensname",),
+    ),
+    SheetSchema(
+        "Beteiligungsverhältnisse", tuple(tpl.headers_beteiligung),
+        types={"Beteiligungs-%": NUMBER, "Anschaffungskosten": NUMBER, "Erwerbsdatum": DATE, "Beteiligungsbuchwert": NUMBER},
+        file="beteiligungsverhaeltnisse",
+        company_columns=("Mutterunternehmen", "Tochterunternehmen"),
+    ),
+    SheetSchema(
+        "Zwischengesellschaftsgeschäfte", tuple(tpl.headers_intercompany),
+        types={"Betrag": NUMBER, "Gewinnmarge": NUMBER, "Eliminierungsbetrag": NUMBER},
+        file="zwischengesellschaftsgeschaefte",
+        company_columns=("Von Unternehmen", "An Unternehmen"),
+    ),
+    SheetSchema(
+        "Eigenkapital-Aufteilung", tuple(tpl.headers_eigenkapital),
+        types={h: NUMBER for h in tpl.headers_eigenkapital[1:]},
+        derived={
+            "Gesamt Eigenkapital": lambda r: sum(
+                _num(r, c) for c in ("Gezeichnetes Kapital", "Kapitalrücklagen", "Gewinnrücklagen", "Jahresüberschuss")
+            ),
+            "Anteil Minderheit": lambda r: _num(r, "Gesamt Eigenkapital") * (1 - _num(r, "Anteil Mutter") / 100),
+        },
+        file="eigenkapital_aufteilung",
+        company_columns=("Unternehmen",),
+    ),
+    SheetSchema(
+        "Währungsumrechnung", tuple(tpl.headers_waehrung), header_row=2,
+        types={"Umrechnungskurs (Stichtag)": NUMBER, "Durchschnittskurs (GuV)": NUMBER, "Umrechnungsdatum": DATE},
+        file="waehrungsumrechnung",
+        company_columns=("Unternehmen",),
+    ),
+    SheetSchema(
+        "Latente Steuern", tuple(tpl.headers_latente), header_row=2,
+        types={"Temporäre Differenz": NUMBER, "Steuersatz (%)": NUMBER, "Latente Steuer": NUMBER},
+        derived={"Latente Steuer": lambda r: _num(r, "Temporäre Differenz") * _num(r, "Steuersatz (%)") / 100},
+        file="latente_steuern",
+        company_columns=("Unternehmen",),
+    ),
+]
+
+SCHEMAS_BY_NAME = {schema.name: schema for schema in SCHEMAS}
+
+
+def get_schema(name):
+    try:
+        return SCHEMAS_BY_NAME[name]
+    except KeyError:
+        raise KeyError(f"Kein Datenblatt '{name}' im Template-Schema") from None
+
+
+# '.' gilt nur als Tausendertrenner, wenn ein Dezimalkomma folgt ("1.234,56") oder mehrere
+# Gruppen keine Dezimalzahl sein können ("1.234.567"); "1.085" bleibt 1.085 wie parseFloat
+_GERMAN_NUMBER = re.compile(r"^-?\d{1,3}(\.\d{3})+,\d+$|^-?\d{1,3}(\.\d{3}){2,}$|^-?\d+,\d+$")
+# Englische Exporte: ',' als Tausendertrenner vor Dezimalpunkt ("1,234.56") oder in mehreren Gruppen
+_ENGLISH_NUMBER = re.compile(r"^-?\d{1,3}(,\d{3})+\.\d+$|^-?\d{1,3}(,\d{3}){2,}$")
+# Leerzeichen (auch geschützt) oder Apostroph als Tausendertrenner: "1 234,56", "1'234.56"
+_SPACE_GROUPS = "[ \u00a0\u202f']"
+_SPACED_NUMBER = re.compile(rf"^-?\d{{1,3}}({_SPACE_GROUPS}\d{{3}})+([.,]\d+)?$")
+
+
+def parse_number(value):
+    """
+    Zahl aus Zellwert - wie parseNumber() im Backend-Import (parseFloat): leer/ungültig -> None.
+    Versteht zusätzlich eindeutige deutsche Schreibweise ("1.234,56", "1.234.567", "0,92"),
+    englische Tausendertrenner ("1,234.56", "1,234,567"), Gruppen mit Leerzeichen/Apostroph
+    ("1 234,56", "1'234.56") und ein %-Suffix; ein einzelner Punkt ist immer Dezimalpunkt
+    ("1.085" -> 1.085, "12.500" -> 12.5), ein einzelnes Komma immer Dezimalkomma ("1,234" -> 1.234).
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().rstrip("%").strip()
+    if _SPACED_NUMBER.match(text):
+        text = re.sub(_SPACE_GROUPS, "", text).replace(",", ".")
+    elif _GERMAN_NUMBER.match(text):
+        text = text.replace(".", "").replace(",", ".")
+    elif _ENGLISH_NUMBER.match(text):
+        text = text.replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_date(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip() or None
+
+
+def parse_string(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # z.B. Kontonummer als Zahl eingegeben
+    return str(value).strip()
+
+
+PARSERS = {STRING: parse_string, NUMBER: parse_number, DATE: parse_date}
+
+
+def normalize_row(schema, values, recompute=False):
+    """
+    Rohwerte einer Zeile -> typisierte Liste in Schema-Breite.
+    Berechnete Spalten (Formeln ohne gespeicherten Wert) werden neu berechnet;
+    recompute=True berechnet sie immer (so wie der Generator sie als Formel schreibt).
+    """
+    values = list(values)[:schema.width]
+    if len(values) < schema.width:
+        values.extend([None] * (schema.width - len(values)))
+    row = []
+    formulas = []
+    for idx, (column, value) in enumerate(zip(schema.headers, values)):
+        if isinstance(value, str) and value.startswith("="):
+            formulas.append(idx)
+            value = None
+        row.append(PARSERS[schema.column_type(column)](value))
+    if schema.derived:
+        record = dict(zip(schema.headers, row))
+        for column, compute in schema.derived.items():
+            idx = schema.index(column)
+            if recompute or row[idx] is None or idx in formulas:
+                row[idx] = record[column] = compute(record)
+    return row
+
+
+def is_empty_row(values):
+    return all(value is None or (isinstance(value, str) and not value.strip()) for value in values)
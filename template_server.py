@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Lokaler Template-Dienst (asyncio, HTTP/1.1)
+
+Hält Interpreter und Builder warm, statt je Download `python create_excel_template.py`
+zu starten:
+  - Standard-Templates kommen aus einem In-Memory-LRU-Cache
+  - vorbefüllte Templates je Unternehmen werden auf einem begrenzten Prozess-Pool gebaut
+  - gleichzeitige identische Anfragen teilen sich einen Build
+  - Builds schreiben in eigene Temp-Dateien (kein gemeinsamer templates/-Pfad)
+
+Endpunkte:
+    GET /template[?engine=xml&compression=max&sheets=minimal]   Standard-Template
+    GET /template/company/<Name>[?engine=...]       vorbefülltes Template (benötigt --prefill; 404 bei unbekanntem Namen)
+    GET /companies                                  Unternehmen der Vorbelegungsquelle (JSON)
+    GET /health                                     Cache- und Build-Statistik (JSON)
+
+Aufruf:
+    python template_server.py [--port 8765] [--workers 4] [--prefill bundle:DIR]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from create_excel_template import select_sheets
+from template_prefill import UnknownCompany, cached_source, open_prefill_source
+from template_writer import ENGINES, format_compression, parse_compression
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+TEMPLATE_FILENAME = "Konsolidierung_Muster_v3.0"
+CHUNK_SIZE = 64 * 1024
+REQUEST_TIMEOUT = 30
+
+# ===== Worker-Prozess =====
+
+def _warm_worker():
+    """Importe einmal je Worker - danach kostet ein Build nur noch die eigentliche Arbeit"""
+    import openpyxl  # noqa: F401
+
+    import create_excel_template  # noqa: F401
+
+
+def build_template_bytes(engine, compression, company=None, prefill=None, sheets="full"):
+    """Baut ein Template in eine eigene Temp-Datei und gibt die Bytes zurück"""
+    from create_excel_template import build_template
+
+    data = None
+    if company is not None:
+        data = cached_source(prefill).company_data(company)
+
+    fd, path = tempfile.mkstemp(prefix="template-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_template(path, engine, data, sheets=sheets, compression=compression)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+# ===== Dienst =====
+
+class LRUCache:
+    """LRU-Cache mit Obergrenze in Bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._items:
+            self.size -= len(self._items.pop(key))
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TemplateService:
+    def __init__(self, workers=4, cache_bytes=256 * 1024 * 1024, engine="xml", prefill=None):
+        self.engine = engine
+        self.prefill = prefill
+        self.source = open_prefill_source(prefill) if prefill else None
+        self.cache = LRUCache(cache_bytes)
+        self.stats = {"requests": 0, "cache_hits": 0, "builds": 0, "coalesced": 0, "errors": 0}
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+        self._inflight = {}
+        self._companies = None  # (Datenstand, Unternehmen) - Prüfung unbekannter Unternehmen
+
+    async def template(self, engine, compression, company=None, sheets="full"):
+        """Template-Bytes aus Cache, laufendem Build oder neuem Build; sheets: Profil/Blattnamen"""
+        sheets = tuple(select_sheets(sheets))
+        # Die Anleitung trägt das Build-Datum ("Stand: ...") - ab Mitternacht neu bauen
+        today = date.today().isoformat()
+        if company is not None:
+            if self.source is None:
+                raise LookupError("Keine Vorbelegungsquelle konfiguriert (--prefill)")
+            # Datenstand im Schlüssel - geänderte Quelle erzeugt neue Builds
+            version = self.source.version()
+            await self._check_company(company, version)
+            key = ("company", company, engine, format_compression(compression), sheets, today, version)
+        else:
+            key = ("standard", engine, format_compression(compression), sheets, today)
+
+        body = self.cache.get(key)
+        if body is not None:
+            self.stats["cache_hits"] += 1
+            return body
+
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._pool, build_template_bytes, engine, compression, company, self.prefill, list(sheets)
+            )
+            self._inflight[key] = future
+            self.stats["builds"] += 1
+
+            def done(f, key=key):
+                if not f.cancelled() and f.exception() is None:
+                    self.cache.put(key, f.result())
+                self._inflight.pop(key, None)
+
+            future.add_done_callback(done)
+        else:
+            self.stats["coalesced"] += 1
+        # shield: ein abgebrochener Client bricht den geteilten Build nicht ab
+        return await asyncio.shield(future)
+
+    async def _check_company(self, company, version):
+        """UnknownCompany statt eines leeren Templates; Unternehmensliste je Datenstand einmal gelesen"""
+        if self._companies is None or self._companies[0] != version:
+            companies = await asyncio.get_running_loop().run_in_executor(None, self.source.companies)
+            self._companies = (version, frozenset(companies))
+        if company not in self._companies[1]:
+            raise UnknownCompany(company)
+
+    def health(self):
+        return {
+            **self.stats,
+            "inflight": len(self._inflight),
+            "cached_templates": len(self.cache),
+            "cache_bytes": self.cache.size,
+            "prefill": self.prefill,
+        }
+
+    async def warm_up(self):
+        await self.template(self.engine, parse_compression("default"))
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+        if self.source is not None:
+            self.source.close()
+
+    # ----- HTTP -----
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, target, headers = await asyncio.wait_for(_read_request(reader), REQUEST_TIMEOUT)
+            except (ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                await _respond(writer, 400, _json_body({"error": "Ungültige Anfrage"}), "application/json")
+                return
+            self.stats["requests"] += 1
+            if method not in ("GET", "HEAD"):
+                await _respond(writer, 405, _json_body({"error": "Nur GET/HEAD"}), "application/json", {"Allow": "GET, HEAD"})
+                return
+            status, body, content_type, extra = await self._route(target)
+            etag = extra.get("ETag")
+            if status == 200 and etag and headers.get("if-none-match") == etag:
+                status, body = 304, b""
+            await _respond(writer, status, body, content_type, extra, head_only=method == "HEAD")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _route(self, target):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if path == "/health":
+            return 200, _json_body(self.health()), "application/json", {}
+        if path == "/companies":
+            if self.source is None:
+                return 404, _json_body({"error": "Keine Vorbelegungsquelle konfiguriert"}), "application/json", {}
+            companies = await asyncio.get_running_loop().run_in_executor(None, self.source.companies)
+            return 200, _json_body(companies), "application/json", {}
+        if path != "/template" and not path.startswith("/template/company/"):
+            return 404, _json_body({"error": f"Unbekannter Pfad: {path}"}), "application/json", {}
+
+        engine = params.get("engine", self.engine)
+        if engine not in ENGINES:
+            return 400, _json_body({"error": f"Unbekannte Engine '{engine}'"}), "application/json", {}
+        try:
+            compression = parse_compression(params.get("compression", "default"))
+            sheets = select_sheets(params.get("sheets", "full"))
+        except ValueError as e:
+            return 400, _json_body({"error": str(e)}), "application/json", {}
+
+        company = path[len("/template/company/"):] if path.startswith("/template/company/") else None
+        if company == "":
+            return 400, _json_body({"error": "Unternehmen fehlt"}), "application/json", {}
+        if company is not None and self.source is None:
+            return 404, _json_body({"error": "Keine Vorbelegungsquelle konfiguriert"}), "application/json", {}
+        try:
+            body = await self.template(engine, compression, company, sheets)
+        except UnknownCompany as e:
+            return 404, _json_body({"error": str(e)}), "application/json", {}
+        except Exception as e:  # Build-Fehler im Worker
+            self.stats["errors"] += 1
+            print(f"[TemplateServer] Build fehlgeschlagen ({company or 'Standard'}): {e}")
+            return 500, _json_body({"error": "Template konnte nicht erstellt werden"}), "application/json", {}
+
+        filename = TEMPLATE_FILENAME + (f"_{company}" if company else "") + ".xlsx"
+        return 200, body, XLSX_MIME, {
+            "Content-Disposition": f"attachment; filename=\"{TEMPLATE_FILENAME}.xlsx\"; filename*=UTF-8''{quote(filename)}",
+            "ETag": '"' + hashlib.sha1(body).hexdigest() + '"',
+            "Cache-Control": "no-cache",
+        }
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    parts = line.decode("latin-1").strip().split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError("Ungültige Request-Zeile")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return parts[0], parts[1], headers
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+async def _respond(writer, status, body, content_type, extra=None, head_only=False):
+    lines = [f"HTTP/1.1 {status} {_REASONS[status]}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}", "Connection: close"]
+    lines.extend(f"{k}: {v}" for k, v in (extra or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", "replace"))
+    if not head_only:
+        view = memoryview(body)
+        for offset in range(0, len(view), CHUNK_SIZE):
+            writer.write(view[offset:offset + CHUNK_SIZE])
+            await writer.drain()  # Backpressure: langsame Clients blockieren keinen Speicher
+    await writer.drain()
+
+
+def _json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+async def serve(host, port, service, warm=True):
+    server = await asyncio.start_server(service.handle, host, port)
+    if warm:
+        await service.warm_up()
+    print(f"[TemplateServer] Bereit auf http://{host}:{port} (Engine {service.engine})")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokaler Template-Dienst mit Cache und Build-Pool")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help="Maximale Anzahl gleichzeitiger Builds")
+    parser.add_argument("--cache-mb", type=int, default=256, help="Größe des Template-Caches")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="xml")
+    parser.add_argument("--prefill", metavar="SPEC", help="Vorbelegungsquelle, z.B. bundle:/pfad/zum/bundle oder sqlite:/pfad/store.db")
+    parser.add_argument("--no-warm", action="store_true", help="Standard-Template nicht beim Start bauen")
+    args = parser.parse_args(argv)
+
+    service = TemplateService(args.workers, args.cache_mb * 1024 * 1024, args.engine, args.prefill)
+    try:
+        asyncio.run(serve(args.host, args.port, service, warm=not args.no_warm))
+    except KeyboardInterrupt:
+        print("\n[TemplateServer] Beendet")
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Teilt ein konzernweit ausgefülltes Template in Shards je Unternehmen
+
+Das Template wird einmal im read-only Modus gelesen; jede Zeile wird anhand der
+Unternehmensspalten (template_schema.company_columns) an die Shards aller
+beteiligten Unternehmen geleitet - Beteiligungs- und IC-Zeilen landen also bei
+beiden Seiten, Währungs-/Steuerzeilen beim jeweiligen Unternehmen.
+
+Zeilen werden zuerst in CSV-Bundles je Unternehmen gespoolt. Offene Dateien
+werden in einem LRU gehalten (begrenzter Puffer je Datei, begrenzte Anzahl
+offener Dateien), danach wird jedes Bundle zu einem Template-Shard gebaut.
+
+Aufruf:
+    python template_split.py GEFUELLT.xlsx AUSGABE_DIR [--format xlsx|bundle] [--jobs N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from template_bundle import BundleWriter, CsvSheetSink, bundle_to_xlsx
+from template_reader import data_sheets, iter_sheet_rows, open_template
+from template_schema import get_schema
+
+# Maximal gleichzeitig offene Shard-Dateien
+DEFAULT_MAX_OPEN = 256
+UNASSIGNED = "_ohne_unternehmen"
+INDEX_FILE = "shards.json"
+
+
+def shard_name(company):
+    """Dateisystem-sicherer, kollisionsfreier Name je Unternehmen"""
+    if not company:
+        return UNASSIGNED
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", company).strip("._")[:60] or "unternehmen"
+    return f"{slug}-{hashlib.sha1(company.encode('utf-8')).hexdigest()[:8]}"
+
+
+class ShardSpool:
+    """
+    Spoolt Zeilen in CSV-Bundles je Unternehmen.
+    Höchstens `max_open` Dateien sind offen; verdrängte Dateien werden bei Bedarf
+    im Append-Modus wieder geöffnet.
+    """
+
+    def __init__(self, directory, max_open=DEFAULT_MAX_OPEN):
+        self.directory = directory
+        self.max_open = max_open
+        self.counts = {}  # (Unternehmen, Blatt) -> Zeilen
+        self.reopened = 0
+        self._open = OrderedDict()  # (Unternehmen, Blatt) -> CsvSheetSink
+        self._bundles = {}  # Unternehmen -> BundleWriter
+
+    def _bundle(self, company):
+        bundle = self._bundles.get(company)
+        if bundle is None:
+            bundle = BundleWriter(os.path.join(self.directory, shard_name(company)), "csv", source=company or None)
+            self._bundles[company] = bundle
+        return bundle
+
+    def _sink(self, company, sheet_name):
+        key = (company, sheet_name)
+        sink = self._open.get(key)
+        if sink is not None:
+            self._open.move_to_end(key)
+            return sink
+        if len(self._open) >= self.max_open:
+            _, evicted = self._open.popitem(last=False)
+            evicted.close()
+        append = key in self.counts
+        if append:
+            self.reopened += 1
+        sink = CsvSheetSink(self._bundle(company).sheet_path(sheet_name), get_schema(sheet_name), append=append)
+        self.counts.setdefault(key, 0)
+        self._open[key] = sink
+        return sink
+
+    def write(self, company, sheet_name, row):
+        self._sink(company, sheet_name).write(row)
+        self.counts[(company, sheet_name)] += 1
+
+    def close(self):
+        """Schließt alle Dateien, schreibt die Manifeste; gibt {Unternehmen: Bundle-Verzeichnis} zurück"""
+        for sink in self._open.values():
+            sink.close()
+        self._open.clear()
+        for (company, sheet_name), count in self.counts.items():
+            self._bundle(company).register(sheet_name, count)
+        for bundle in self._bundles.values():
+            bundle.close()
+        return {company: bundle.directory for company, bundle in self._bundles.items()}
+
+
+def split_template(path, output_dir, fmt="xlsx", jobs=None, engine="xml", max_open=DEFAULT_MAX_OPEN):
+    """
+    Teilt `path` in Shards je Unternehmen.
+    fmt="bundle": Spalten-Bundles je Unternehmen; fmt="xlsx": Template je Unternehmen.
+    Gibt den Shard-Index zurück (wird auch als shards.json geschrieben).
+    """
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    spool_dir = output_dir if fmt == "bundle" else os.path.join(output_dir, ".spool")
+    spool = ShardSpool(spool_dir, max_open)
+
+    rows_read = 0
+    wb = open_template(path)
+    try:
+        for schema in data_sheets(wb):
+            for _, row in iter_sheet_rows(wb, schema.name):
+                rows_read += 1
+                companies = list(dict.fromkeys(schema.companies(row))) or [""]
+                for company in companies:
+                    spool.write(company, schema.name, row)
+    finally:
+        wb.close()
+    bundles = spool.close()
+
+    shards = {}
+    if fmt == "bundle":
+        shards = {company: os.path.basename(directory) for company, directory in bundles.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                company: pool.submit(_bundle_to_shard, directory, os.path.join(output_dir, shard_name(company) + ".xlsx"), engine)
+                for company, directory in bundles.items()
+            }
+            for company, future in futures.items():
+                shards[company] = os.path.basename(future.result())
+        shutil.rmtree(spool_dir)
+
+    index = {
+        "source": os.path.basename(path),
+        "format": fmt,
+        "rows_read": rows_read,
+        "rows_written": sum(spool.counts.values()),
+        "reopened_files": spool.reopened,
+        "seconds": round(time.perf_counter() - started, 3),
+        "shards": [
+            {
+                "company": company or None,
+                "file": shards[company],
+                "rows": {sheet: n for (c, sheet), n in spool.counts.items() if c == company},
+            }
+            for company in bundles
+        ],
+    }
+    with open(os.path.join(output_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
+
+
+def _bundle_to_shard(directory, xlsx_path, engine):
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        bundle_to_xlsx(directory, xlsx_path, engine)
+    return xlsx_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teilt ein ausgefülltes Template in Shards je Unternehmen")
+    parser.add_argument("template")
+    parser.add_argument("output_dir")
+    parser.add_argument("--format", choices=["xlsx", "bundle"], default="xlsx")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallele Shard-Builds (Standard: CPU-Kerne)")
+    parser.add_argument("--engine", default="xml", help="Schreib-Engine der XLSX-Shards")
+    parser.add_argument("--max-open", type=int, default=DEFAULT_MAX_OPEN, help="Maximal offene Shard-Dateien")
+    args = parser.parse_args(argv)
+
+    index = split_template(args.template, args.output_dir, args.format, args.jobs, args.engine, args.max_open)
+    print(f"[Split] {index['rows_read']:,} Zeilen gelesen, {index['rows_written']:,} Zeilen in "
+          f"{len(index['shards'])} Shards geschrieben ({index['seconds']:.2f}s)")
+    if any(shard["company"] is None for shard in index["shards"]):
+        print(f"  WARNING: Zeilen ohne Unternehmen in '{shard_name('')}'")
+    print(f"[SUCCESS] Shards erstellt: {args.output_dir} (Index: {INDEX_FILE})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Lokaler SQLite-Staging-Speicher für ausgefüllte Templates
+
+Ein ausgefülltes Template (XLSX oder Spalten-Bundle) wird einmal gelesen und je
+Datenblatt in eine Tabelle geladen (executemany, eine Transaktion je Template, WAL).
+Danach sind Abfragen nach Unternehmen, Konto, HGB-Position oder Transaktion
+indizierte SQL-Abfragen statt erneutem Parsen der XLSX-Datei.
+
+Eine Datenbank kann mehrere Templates enthalten (Tabelle `templates`); erneutes
+Laden derselben Quelle ersetzt deren Zeilen. Tabellen heißen wie die Bundle-Dateien
+(bilanzdaten, guv_daten, ...), Spalten wie die Template-Header.
+
+Aufruf:
+    python template_store.py load STORE.db GEFUELLT.xlsx [--source NAME]
+    python template_store.py list STORE.db
+    python template_store.py query STORE.db --sheet Bilanzdaten [--company NAME] [--account 1000]
+    python template_store.py sum STORE.db --sheet Bilanzdaten --by Unternehmen [--value Saldo]
+    python template_store.py export STORE.db AUSGABE.xlsx [--template NAME|ID]
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from template_schema import NUMBER, SCHEMAS, get_schema
+
+STORE_VERSION = 1
+
+# Spalten mit Index (sofern im Blatt vorhanden) - zusätzlich alle Unternehmensspalten des Schemas
+INDEXED_COLUMNS = ("Unternehmen", "Kontonummer", "HGB-Position", "Transaktions-ID")
+
+# Betragsspalte je Blatt für Summen ohne --value
+VALUE_COLUMNS = {"Bilanzdaten": "Saldo", "GuV-Daten": "Betrag", "Zwischengesellschaftsgeschäfte": "Betrag"}
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def check_column(schema, column):
+    if column not in schema.headers:
+        raise ValueError(f"Blatt '{schema.name}' hat keine Spalte '{column}'")
+    return column
+
+
+def indexed_columns(schema):
+    columns = [c for c in INDEXED_COLUMNS if c in schema.headers]
+    columns.extend(c for c in schema.company_columns if c not in columns)
+    return columns
+
+
+class TemplateStore:
+    def __init__(self, path, check_same_thread=True):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute(
+                "INSERT OR IGNORE INTO store_meta VALUES ('version', ?)", (str(STORE_VERSION),)
+            )
+            version = int(self.conn.execute("SELECT value FROM store_meta WHERE key = 'version'").fetchone()[0])
+            if version > STORE_VERSION:
+                raise ValueError(f"{self.path}: Store-Version {version} wird nicht unterstützt")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS templates ("
+                "id INTEGER PRIMARY KEY, source TEXT NOT NULL UNIQUE, loaded TEXT NOT NULL, rows INTEGER NOT NULL)"
+            )
+            for schema in SCHEMAS:
+                columns = ", ".join(
+                    f"{quote_identifier(c)} {'REAL' if schema.column_type(c) == NUMBER else 'TEXT'}"
+                    for c in schema.headers
+                )
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote_identifier(schema.file)} ("
+                    f"template_id INTEGER NOT NULL REFERENCES templates(id) ON DELETE CASCADE, {columns})"
+                )
+
+    def _create_indexes(self):
+        # Erst nach dem Laden - Indexpflege je Insert verlangsamt den Bulk-Load deutlich
+        for schema in SCHEMAS:
+            table = quote_identifier(schema.file)
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote_identifier(f'ix_{schema.file}_template')} ON {table} (template_id)"
+            )
+            for column in indexed_columns(schema):
+                name = quote_identifier(f"ix_{schema.file}_{schema.index(column)}")
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} (template_id, {quote_identifier(column)})"
+                )
+
+    def load(self, path, source=None):
+        """XLSX-Datei oder Bundle laden; gibt (Template-ID, {Blattname: Zeilen}) zurück"""
+        from template_reader import open_rows
+
+        with open_rows(path) as rows:
+            return self.load_rows(source or os.path.basename(os.path.normpath(path)), rows)
+
+    def load_rows(self, source, rows):
+        """rows(Blattname) -> typisierte Zeilen; ersetzt ein bereits geladenes Template gleicher Quelle"""
+        counts = {}
+        with self.conn:
+            self.conn.execute("DELETE FROM templates WHERE source = ?", (source,))
+            cursor = self.conn.execute(
+                "INSERT INTO templates (source, loaded, rows) VALUES (?, ?, 0)",
+                (source, datetime.now().isoformat(timespec="seconds")),
+            )
+            template_id = cursor.lastrowid
+            for schema in SCHEMAS:
+                placeholders = ", ".join("?" * (schema.width + 1))
+                sql = f"INSERT INTO {quote_identifier(schema.file)} VALUES ({placeholders})"
+                counter = _Counter()
+                self.conn.executemany(sql, ((template_id, *row) for row in counter.count(rows(schema.name))))
+                counts[schema.name] = counter.value
+            self.conn.execute("UPDATE templates SET rows = ? WHERE id = ?", (sum(counts.values()), template_id))
+            self._create_indexes()
+        return template_id, counts
+
+    def templates(self):
+        return self.conn.execute("SELECT id, source, loaded, rows FROM templates ORDER BY id").fetchall()
+
+    def resolve(self, template=None):
+        """Template-ID aus ID, Quellname oder None (zuletzt geladen)"""
+        if template is None:
+            row = self.conn.execute("SELECT id FROM templates ORDER BY id DESC LIMIT 1").fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT id FROM templates WHERE source = ? OR CAST(id AS TEXT) = ?", (str(template), str(template))
+            ).fetchone()
+        if row is None:
+            raise LookupError(f"Kein Template '{template}' im Store" if template is not None else "Store ist leer")
+        return row[0]
+
+    def rows(self, template_id, sheet_name, filters=None):
+        """
+        Zeilen eines Blatts in Ladereihenfolge; filters: {Spalte: Wert} (UND-verknüpft).
+        Spalte "*Unternehmen" trifft jede Unternehmensspalte des Blatts.
+        """
+        schema = get_schema(sheet_name)
+        clauses = ["template_id = ?"]
+        params = [template_id]
+        for column, value in (filters or {}).items():
+            if column == "*Unternehmen":
+                if not schema.company_columns:
+                    return iter(())
+                clauses.append("(" + " OR ".join(f"{quote_identifier(c)} = ?" for c in schema.company_columns) + ")")
+                params.extend([value] * len(schema.company_columns))
+            else:
+                clauses.append(f"{quote_identifier(check_column(schema, column))} = ?")
+                params.append(value)
+        columns = ", ".join(quote_identifier(c) for c in schema.headers)
+        return self.conn.execute(
+            f"SELECT {columns} FROM {quote_identifier(schema.file)} WHERE {' AND '.join(clauses)} ORDER BY rowid",
+            params,
+        )
+
+    def company_data(self, template_id, company):
+        """{Blattname: Zeilen} eines Unternehmens - über die Indizes der Unternehmensspalten"""
+        return {schema.name: self.rows(template_id, schema.name, {"*Unternehmen": company}) for schema in SCHEMAS}
+
+    def companies(self, template_id):
+        return [
+            row[0] for row in self.conn.execute(
+                'SELECT DISTINCT "Unternehmensname" FROM unternehmensinformationen '
+                'WHERE template_id = ? AND "Unternehmensname" <> \'\' ORDER BY rowid',
+                (template_id,),
+            )
+        ]
+
+    def aggregate(self, template_id, sheet_name, group_by, value=None):
+        """[(Gruppe, Zeilen, Summe)] - z.B. Salden je Unternehmen"""
+        schema = get_schema(sheet_name)
+        value = value or VALUE_COLUMNS.get(sheet_name)
+        if value is None or schema.column_type(value) != NUMBER:
+            raise ValueError(f"Blatt '{sheet_name}': keine Betragsspalte '{value}'")
+        group = quote_identifier(check_column(schema, group_by))
+        return self.conn.execute(
+            f"SELECT {group}, COUNT(*), TOTAL({quote_identifier(value)}) FROM {quote_identifier(schema.file)} "
+            f"WHERE template_id = ? GROUP BY {group} ORDER BY {group}",
+            (template_id,),
+        ).fetchall()
+
+    def export(self, template_id, output, engine="xml", **engine_options):
+        """Template aus dem Store neu erzeugen; gibt die BuildMetrics zurück"""
+        from create_excel_template import build_template
+
+        data = {schema.name: self.rows(template_id, schema.name) for schema in SCHEMAS}
+        return build_template(output, engine, data, **engine_options)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _Counter:
+    def __init__(self):
+        self.value = 0
+
+    def count(self, rows):
+        for row in rows:
+            self.value += 1
+            yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite-Staging-Speicher für ausgefüllte Templates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load", help="Template (XLSX oder Bundle) laden")
+    load.add_argument("store")
+    load.add_argument("template")
+    load.add_argument("--source", help="Name im Store (Standard: Dateiname)")
+    listing = sub.add_parser("list", help="Geladene Templates anzeigen")
+    listing.add_argument("store")
+    query = sub.add_parser("query", help="Zeilen eines Blatts als CSV ausgeben")
+    query.add_argument("store")
+    query.add_argument("--sheet", required=True)
+    query.add_argument("--company", help="Zeilen dieses Unternehmens (alle Unternehmensspalten)")
+    query.add_argument("--account", help="Kontonummer")
+    query.add_argument("--hgb", help="HGB-Position")
+    query.add_argument("--transaction", help="Transaktions-ID")
+    total = sub.add_parser("sum", help="Summen je Gruppe")
+    total.add_argument("store")
+    total.add_argument("--sheet", required=True)
+    total.add_argument("--by", required=True, help="Gruppierungsspalte, z.B. Unternehmen")
+    total.add_argument("--value", help="Betragsspalte (Standard: Saldo/Betrag)")
+    export = sub.add_parser("export", help="Template aus dem Store erzeugen")
+    export.add_argument("store")
+    export.add_argument("output")
+    export.add_argument("--engine", default="xml")
+    for command in (query, total, export):
+        command.add_argument("--template", help="ID oder Quellname (Standard: zuletzt geladen)")
+    args = parser.parse_args(argv)
+
+    with TemplateStore(args.store) as store:
+        if args.command == "load":
+            started = time.perf_counter()
+            template_id, counts = store.load(args.template, args.source)
+            for sheet, count in counts.items():
+                print(f"[Store] {sheet}: {count:,} Zeilen")
+            print(f"[SUCCESS] Template {template_id} geladen in {time.perf_counter() - started:.2f}s: {args.store}")
+        elif args.command == "list":
+            for template_id, source, loaded, rows in store.templates():
+                print(f"{template_id:>4}  {source}  {loaded}  {rows:,} Zeilen")
+        elif args.command == "query":
+            filters = {
+                column: value for column, value in (
+                    ("*Unternehmen", args.company), ("Kontonummer", args.account),
+                    ("HGB-Position", args.hgb), ("Transaktions-ID", args.transaction),
+                ) if value is not None
+            }
+            writer = csv.writer(sys.stdout)
+            writer.writerow(get_schema(args.sheet).headers)
+            writer.writerows(store.rows(store.resolve(args.template), args.sheet, filters))
+        elif args.command == "sum":
+            for group, count, amount in store.aggregate(store.resolve(args.template), args.sheet, args.by, args.value):
+                print(f"{group}\t{count:,}\t{amount:,.2f}")
+        else:
+            metrics = store.export(store.resolve(args.template), args.output, args.engine)
+            print(f"[SUCCESS] Template aus Store erstellt: {args.output}")
+            print(f"[Template] {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Kompakte, spaltenorientierte Tabelle für geladene Template-Blätter
+
+Eine Zeile als Liste von Strings kostet pro Zelle ein eigenes str-Objekt - bei
+2 Mio. Bilanzzeilen mehrere GB, obwohl Unternehmen, Kontotyp, HGB-Position,
+Zwischengesellschaft und Gegenpartei nur wenige verschiedene Werte haben.
+
+ColumnTable speichert je Spalte:
+  - Text/Datum: Wörterbuch-kodiert - jeder Wert einmal, je Zeile nur ein Code in einem
+    array ('B' -> 'H' -> 'I', wächst mit der Zahl verschiedener Werte)
+  - Zahlen: array('d') (float64, None = NaN) oder - mit decimals=N - skaliert in
+    array('q') (exakt, Decimal beim Zugriff)
+
+RowView (__slots__) bietet zeilenweisen Zugriff wie bisher (row[1], row["Saldo"]);
+group_sum/group_count rechnen direkt auf den Codes (numpy.bincount, falls installiert).
+
+Aufruf:
+    python template_table.py GEFUELLT.xlsx|BUNDLE_DIR [--sheet Bilanzdaten] [--by Unternehmen] [--value Saldo]
+"""
+
+import argparse
+import math
+import sys
+import time
+from array import array
+from decimal import Decimal
+
+from template_schema import NUMBER, PARSERS, get_schema
+
+try:
+    import numpy as np
+except ImportError:  # optional - ohne numpy wird in Python aggregiert
+    np = None
+
+# Code-Typen nach Anzahl verschiedener Werte; Grenze = erster Code, der nicht mehr passt
+_CODE_TYPES = (("B", 1 << 8), ("H", 1 << 16), ("I", 1 << 32))
+_NUMPY_CODES = {"B": "uint8", "H": "uint16", "I": "uint32"}
+_NULL_SCALED = -(1 << 63)
+
+
+class DictColumn:
+    """Wörterbuch-kodierte Textspalte"""
+
+    __slots__ = ("values", "index", "codes", "_limit")
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+        self.codes = array("B")
+        self._limit = _CODE_TYPES[0][1]
+
+    def encode(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+            if code >= self._limit:
+                self._widen(code)
+        return code
+
+    def _widen(self, code):
+        for typecode, limit in _CODE_TYPES:
+            if code < limit:
+                self.codes = array(typecode, self.codes)
+                self._limit = limit
+                return
+        raise OverflowError("Zu viele verschiedene Werte in einer Spalte")
+
+    def append(self, value):
+        code = self.encode(value)  # kann self.codes verbreitern - erst danach anhängen
+        self.codes.append(code)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code_array(self):
+        """
+        Codes als numpy-Array (ohne Kopie) oder das array selbst. Solange die Sicht lebt,
+        schlägt append mit BufferError fehl - nur kurzlebig verwenden oder .copy() nehmen.
+        """
+        return np.frombuffer(self.codes, dtype=_NUMPY_CODES[self.codes.typecode]) if np is not None else self.codes
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + sum(sys.getsizeof(v) for v in self.values)
+
+
+class FloatColumn:
+    """float64-Spalte; None wird als NaN gespeichert"""
+
+    __slots__ = ("data",)
+
+    def __init__(self):
+        self.data = array("d")
+
+    def append(self, value):
+        self.data.append(math.nan if value is None else value)
+
+    def __getitem__(self, i):
+        value = self.data[i]
+        return None if value != value else value
+
+    def __len__(self):
+        return len(self.data)
+
+    def float_array(self):
+        """Sicht ohne Kopie wie DictColumn.code_array - blockiert append, solange sie lebt"""
+        return np.frombuffer(self.data, dtype=np.float64) if np is not None else self.data
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class DecimalColumn:
+    """Exakte Beträge: mit 10**decimals skaliert als int64; Zugriff liefert Decimal"""
+
+    __slots__ = ("data", "decimals", "_scale", "_quantum")
+
+    def __init__(self, decimals):
+        self.data = array("q")
+        self.decimals = decimals
+        self._scale = 10 ** decimals
+        self._quantum = Decimal(1).scaleb(-decimals)
+
+    def append(self, value):
+        if value is None:
+            self.data.append(_NULL_SCALED)
+        else:
+            self.data.append(int((Decimal(str(value)) * self._scale).to_integral_value()))
+
+    def __getitem__(self, i):
+        value = self.data[i]
+        return None if value == _NULL_SCALED else (Decimal(value) / self._scale).quantize(self._quantum)
+
+    def __len__(self):
+        return len(self.data)
+
+    def float_array(self):
+        if np is None:
+            return array("d", (math.nan if v == _NULL_SCALED else v / self._scale for v in self.data))
+        raw = np.frombuffer(self.data, dtype=np.int64)
+        return np.where(raw == _NULL_SCALED, np.nan, raw / self._scale)
+
+    def nbytes(self):
+        return self.data.itemsize * len(self.data)
+
+
+class RowView:
+    """Leichtgewichtige Sicht auf eine Tabellenzeile - verhält sich wie die bisherige Zeilenliste"""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        columns = self._table.column_list
+        if isinstance(key, str):
+            return self._table.columns[key][self._index]
+        if isinstance(key, slice):
+            return [column[self._index] for column in columns[key]]
+        return columns[key][self._index]
+
+    def __len__(self):
+        return len(self._table.column_list)
+
+    def __iter__(self):
+        index = self._index
+        return (column[index] for column in self._table.column_list)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def as_list(self):
+        return list(self)
+
+    def as_dict(self):
+        return dict(zip(self._table.schema.headers, self))
+
+    def __repr__(self):
+        return f"RowView({self._index}, {list(self)!r})"
+
+
+class ColumnTable:
+    def __init__(self, schema, decimals=None):
+        self.schema = schema
+        self.columns = {
+            column: (
+                (DecimalColumn(decimals) if decimals is not None else FloatColumn())
+                if schema.column_type(column) == NUMBER else DictColumn()
+            )
+            for column in schema.headers
+        }
+        self.column_list = list(self.columns.values())
+        self._length = 0
+        self._empty = [PARSERS[schema.column_type(column)](None) for column in schema.headers]
+
+    @classmethod
+    def from_rows(cls, schema, rows, decimals=None):
+        table = cls(schema, decimals)
+        table.extend(rows)
+        return table
+
+    @classmethod
+    def concat(cls, tables):
+        """Hängt Tabellen desselben Schemas aneinander (z.B. Teilblätter); Codes werden neu zugeordnet"""
+        tables = list(tables)
+        if not tables:
+            raise ValueError("Keine Tabellen")
+        result = tables[0]
+        for table in tables[1:]:
+            for name, column in result.columns.items():
+                other = table.columns[name]
+                if isinstance(column, DictColumn):
+                    mapping = [column.encode(value) for value in other.values]
+                    column.codes.extend(mapping[code] for code in other.codes)
+                else:
+                    column.data.extend(other.data)
+            result._length += len(table)
+        return result
+
+    def __getstate__(self):
+        # Schema enthält Lambdas (berechnete Spalten) - nur den Namen übertragen (Worker-Prozesse)
+        return {"schema": self.schema.name, "columns": self.columns, "length": self._length}
+
+    def __setstate__(self, state):
+        self.schema = get_schema(state["schema"])
+        self.columns = state["columns"]
+        self.column_list = list(self.columns.values())
+        self._length = state["length"]
+        self._empty = [PARSERS[self.schema.column_type(column)](None) for column in self.schema.headers]
+
+    def extend(self, rows):
+        """Zeilen in Schema-Reihenfolge; kürzere Zeilen werden mit Leerwerten aufgefüllt"""
+        appends = [column.append for column in self.column_list]
+        width, empty = len(appends), self._empty
+        count = 0
+        for row in rows:
+            if len(row) != width:
+                if len(row) > width:
+                    raise ValueError(f"Zeile mit {len(row)} Werten - Blatt '{self.schema.name}' hat {width} Spalten")
+                row = list(row) + empty[len(row):]
+            for append, value in zip(appends, row):
+                append(value)
+            count += 1
+        self._length += count
+
+    def append(self, row):
+        self.extend((row,))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def __iter__(self):
+        return (RowView(self, i) for i in range(self._length))
+
+    def rows(self):
+        """Zeilen als Listen (z.B. für build_template/BundleWriter)"""
+        columns = self.column_list
+        return ([column[i] for column in columns] for i in range(self._length))
+
+    def column(self, name):
+        return self.columns[name]
+
+    def _dict_column(self, name):
+        column = self.columns[name]
+        if not isinstance(column, DictColumn):
+            raise ValueError(f"Spalte '{name}' ist keine Textspalte")
+        return column
+
+    def categories(self, name):
+        return list(self._dict_column(name).values)
+
+    def where(self, name, value):
+        """Zeilenindizes mit Spalte == Wert (Vergleich der Codes)"""
+        column = self._dict_column(name)
+        code = column.index.get(value)
+        if code is None:
+            return []
+        if np is not None:
+            return np.flatnonzero(column.code_array() == code).tolist()
+        return [i for i, c in enumerate(column.codes) if c == code]
+
+    def group_count(self, by):
+        column = self._dict_column(by)
+        if np is not None:
+            counts = np.bincount(column.code_array(), minlength=len(column.values)).tolist()
+        else:
+            counts = [0] * len(column.values)
+            for code in column.codes:
+                counts[code] += 1
+        return dict(zip(column.values, counts))
+
+    def group_sum(self, by, value):
+        """{Wert der Spalte by: Summe der Spalte value} - leere Beträge zählen 0"""
+        column = self._dict_column(by)
+        amounts = self.columns[value]
+        if not hasattr(amounts, "float_array"):
+            raise ValueError(f"Spalte '{value}' ist keine Zahlenspalte")
+        if isinstance(amounts, DecimalColumn):
+            sums = [0] * len(column.values)
+            for code, raw in zip(column.codes, amounts.data):
+                if raw != _NULL_SCALED:
+                    sums[code] += raw
+            return {v: Decimal(s) / amounts._scale for v, s in zip(column.values, sums)}
+        if np is not None:
+            weights = np.nan_to_num(amounts.float_array())
+            sums = np.bincount(column.code_array(), weights=weights, minlength=len(column.values)).tolist()
+        else:
+            sums = [0.0] * len(column.values)
+            for code, amount in zip(column.codes, amounts.data):
+                if amount == amount:
+                    sums[code] += amount
+        return dict(zip(column.values, sums))
+
+    def nbytes(self):
+        """Ungefährer Speicherbedarf der Spaltendaten in Bytes"""
+        return sum(column.nbytes() for column in self.column_list)
+
+
+def load_table(path, sheet_name, decimals=None):
+    """Ein Datenblatt einer XLSX-Datei oder eines Bundles als ColumnTable"""
+    from template_reader import open_rows
+
+    with open_rows(path) as rows:
+        return ColumnTable.from_rows(get_schema(sheet_name), rows(sheet_name), decimals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lädt ein Template-Blatt spaltenorientiert und aggregiert je Gruppe")
+    parser.add_argument("input", help="Ausgefülltes Template (XLSX) oder Bundle-Verzeichnis")
+    parser.add_argument("--sheet", default="Bilanzdaten")
+    parser.add_argument("--by", default="Unternehmen")
+    parser.add_argument("--value", help="Zu summierende Spalte (ohne: Anzahl je Gruppe)")
+    parser.add_argument("--decimals", type=int, help="Beträge exakt mit N Nachkommastellen speichern")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    table = load_table(args.input, args.sheet, args.decimals)
+    loaded = time.perf_counter() - started
+    started = time.perf_counter()
+    groups = table.group_sum(args.by, args.value) if args.value else table.group_count(args.by)
+    grouped = time.perf_counter() - started
+    for key, value in sorted(groups.items(), key=lambda item: str(item[0])):
+        print(f"  - {key or '(leer)'}: {value:,.2f}" if args.value else f"  - {key or '(leer)'}: {value:,}")
+    print(
+        f"[Table] {args.sheet}: {len(table):,} Zeilen in {loaded:.2f}s geladen, "
+        f"{table.nbytes() / 1e6:,.1f} MB Spaltendaten, Gruppierung in {grouped * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
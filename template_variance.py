@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Periodenvergleich zweier ausgefüllter Templates (Vorjahr / aktuelles Jahr)
+
+Vergleicht je Schlüssel die Beträge beider Dateien und schreibt die wesentlichen
+Abweichungen in eine eigene Arbeitsmappe:
+  - Bilanzdaten: (Unternehmen, Kontonummer) -> Saldo
+  - GuV-Daten: (Unternehmen, Kontonummer) -> Betrag
+  - Zwischengesellschaftsgeschäfte: (Transaktions-ID, Von Unternehmen) -> Betrag
+    (beide Seiten einer Transaktion tragen dieselbe ID)
+Mehrere Zeilen mit demselben Schlüssel werden summiert.
+
+Der Hash-Join läuft partitioniert: beide Dateien werden parallel gestreamt gelesen und
+nach Schlüssel-Hash in Spool-Dateien verteilt, danach werden die Partitionen parallel
+verglichen. Im Speicher liegt je Prozess nur eine Partition, im Hauptprozess nur die
+wesentlichen Abweichungen. Abweichungen werden je Partition vektorisiert berechnet
+(numpy, falls installiert).
+Eingaben können XLSX-Dateien oder Spalten-Bundles (template_bundle.py) sein.
+
+Aufruf:
+    python template_variance.py VORJAHR.xlsx AKTUELL.xlsx ABWEICHUNGEN.xlsx [--abs 1000] [--rel 5]
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from operator import itemgetter
+
+from template_reader import open_rows
+from template_schema import get_schema
+from template_writer import SheetSeries, open_workbook_writer
+
+try:
+    import numpy as np
+except ImportError:  # optional - ohne numpy wird zeilenweise gerechnet
+    np = None
+
+DEFAULT_PARTITIONS = 16
+# Datensätze je Pickle-Block einer Partition (einzelnes Pickeln je Zeile dominiert sonst die Laufzeit)
+SPOOL_BATCH = 4096
+# Abweichungen unter einem halben Cent gelten als Rundungsrauschen
+MIN_VARIANCE = 0.005
+
+
+@dataclass(frozen=True)
+class Comparison:
+    sheet: str
+    keys: tuple
+    amount: str
+    labels: tuple  # beschreibende Spalten (Wert aus der aktuellen Datei, sonst Vorjahr)
+    title: str  # Blattname in der Ausgabe
+
+
+COMPARISONS = [
+    Comparison("Bilanzdaten", ("Unternehmen", "Kontonummer"), "Saldo", ("Kontoname", "HGB-Position"),
+               "Abweichungen Bilanz"),
+    Comparison("GuV-Daten", ("Unternehmen", "Kontonummer"), "Betrag", ("Kontoname", "Kontotyp"),
+               "Abweichungen GuV"),
+    Comparison("Zwischengesellschaftsgeschäfte", ("Transaktions-ID", "Von Unternehmen"), "Betrag",
+               ("An Unternehmen", "Transaktionstyp"), "Abweichungen IC"),
+]
+
+STATUS_NEW = "neu"
+STATUS_REMOVED = "entfallen"
+STATUS_CHANGED = "geändert"
+
+VALUE_HEADERS = ["Vorjahr", "Aktuell", "Abweichung", "Abweichung %"]
+SUMMARY_HEADERS = ["Blatt", "Schlüssel Vorjahr", "Schlüssel aktuell", "Neu", "Entfallen", "Geändert",
+                   "Wesentlich", "Summe Vorjahr", "Summe aktuell"]
+
+
+def partition_of(key, count):
+    """Stabil über Prozesse hinweg (hash() von Strings ist je Prozess zufällig)"""
+    return zlib.crc32("\x1f".join(map(str, key)).encode("utf-8")) % count
+
+
+class PartitionSpool:
+    """Verteilt Datensätze nach Schlüssel-Hash auf `count` Spool-Dateien (blockweise gepickelt)"""
+
+    def __init__(self, directory, count):
+        self.directory = directory
+        self.count = count
+        os.makedirs(directory, exist_ok=True)
+        self._files = [open(partition_path(directory, idx), "wb", buffering=1 << 16) for idx in range(count)]
+        self._buffers = [[] for _ in range(count)]
+
+    def write(self, key, record):
+        partition = partition_of(key, self.count)
+        buffer = self._buffers[partition]
+        buffer.append(record)
+        if len(buffer) >= SPOOL_BATCH:
+            pickle.dump(buffer, self._files[partition], pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+    def close(self):
+        for f, buffer in zip(self._files, self._buffers):
+            if buffer:
+                pickle.dump(buffer, f, pickle.HIGHEST_PROTOCOL)
+                buffer.clear()
+            f.close()
+
+
+def partition_path(directory, partition):
+    return os.path.join(directory, f"part{partition:03d}.pkl")
+
+
+def read_partition(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+def variances(previous, current, abs_threshold=0.0, rel_threshold=0.0):
+    """
+    Vektorisiert: (Abweichung, Abweichung % (None bei Vorjahr 0), wesentlich) je Position.
+    Wesentlich: |Abweichung| >= abs_threshold und |Abweichung %| >= rel_threshold
+    (ohne Vorjahreswert zählt nur die absolute Schwelle).
+    """
+    min_abs = max(abs_threshold, MIN_VARIANCE)
+    if np is None:
+        diff = [c - p for p, c in zip(previous, current)]
+        rel = [d / abs(p) * 100 if p else None for p, d in zip(previous, diff)]
+        material = [abs(d) >= min_abs and (r is None or abs(r) >= rel_threshold) for d, r in zip(diff, rel)]
+        return diff, rel, material
+    prev = np.asarray(previous, dtype=np.float64)
+    diff = np.asarray(current, dtype=np.float64) - prev
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.where(prev != 0, diff / np.abs(prev) * 100, np.nan)
+    material = (np.abs(diff) >= min_abs) & (np.isnan(rel) | (np.abs(rel) >= rel_threshold))
+    return diff.tolist(), [None if r != r else r for r in rel.tolist()], material.tolist()
+
+
+@dataclass
+class ComparisonResult:
+    comparison: Comparison
+    keys_previous: int = 0
+    keys_current: int = 0
+    counts: dict = field(default_factory=lambda: {STATUS_NEW: 0, STATUS_REMOVED: 0, STATUS_CHANGED: 0})
+    total_previous: float = 0.0
+    total_current: float = 0.0
+    rows: list = field(default_factory=list)  # wesentliche Abweichungen
+
+
+def _tuple_getter(schema, columns):
+    """Zeile -> Tupel der Spaltenwerte (itemgetter liefert nur bei mehreren Indizes ein Tupel)"""
+    indices = [schema.index(c) for c in columns]
+    if len(indices) == 1:
+        idx = indices[0]
+        return lambda row: (row[idx],)
+    return itemgetter(*indices)
+
+
+def _spool_sheet(spool, rows, comparison):
+    schema = get_schema(comparison.sheet)
+    key_of = _tuple_getter(schema, comparison.keys)
+    labels_of = _tuple_getter(schema, comparison.labels)
+    amount_idx = schema.index(comparison.amount)
+    write = spool.write
+    for row in rows:
+        key = key_of(row)
+        write(key, (key, row[amount_idx] or 0.0, labels_of(row)))
+
+
+def _spool_input(path, directory, partitions):
+    """Worker: liest eine Eingabe einmal und verteilt alle Vergleichsblätter auf Partitionen"""
+    with open_rows(path) as rows:
+        for comparison in COMPARISONS:
+            spool = PartitionSpool(os.path.join(directory, get_schema(comparison.sheet).file), partitions)
+            try:
+                _spool_sheet(spool, rows(comparison.sheet), comparison)
+            finally:
+                spool.close()
+    return directory
+
+
+def _join_partition(previous_records, current_records):
+    """Datensätze einer Partition -> {Schlüssel: [Vorjahr, Aktuell, Labels, vorhanden]}"""
+    joined = {}
+    for side, records in ((0, previous_records), (1, current_records)):
+        for key, amount, labels in records:
+            entry = joined.get(key)
+            if entry is None:
+                entry = joined[key] = [0.0, 0.0, labels, 0]
+            entry[side] += amount
+            entry[3] |= 1 << side  # 1 = Vorjahr, 2 = aktuell, 3 = beide
+            if side == 1:
+                entry[2] = labels
+    return joined
+
+
+def _compare_partition(comparison, previous_path, current_path, abs_threshold, rel_threshold):
+    """Worker: vergleicht eine Partition eines Blatts; liefert ein Teilergebnis"""
+    result = ComparisonResult(comparison)
+    joined = _join_partition(read_partition(previous_path), read_partition(current_path))
+    if not joined:
+        return result
+    entries = list(joined.items())
+    diff, rel, material = variances(
+        [e[0] for _, e in entries], [e[1] for _, e in entries], abs_threshold, rel_threshold
+    )
+    for (key, (prev, cur, labels, present)), d, r, m in zip(entries, diff, rel, material):
+        result.keys_previous += present & 1
+        result.keys_current += present >> 1
+        result.total_previous += prev
+        result.total_current += cur
+        status = STATUS_CHANGED if present == 3 else STATUS_NEW if present == 2 else STATUS_REMOVED
+        if abs(d) >= MIN_VARIANCE:
+            result.counts[status] += 1
+        if m:
+            result.rows.append([status, *key, *labels, prev, cur, d, r])
+    return result
+
+
+def _combine(comparison, partials):
+    result = ComparisonResult(comparison)
+    for partial in partials:
+        result.keys_previous += partial.keys_previous
+        result.keys_current += partial.keys_current
+        result.total_previous += partial.total_previous
+        result.total_current += partial.total_current
+        for status, count in partial.counts.items():
+            result.counts[status] += count
+        result.rows.extend(partial.rows)
+    # Größte Abweichungen zuerst
+    result.rows.sort(key=lambda row: abs(row[-2]), reverse=True)
+    return result
+
+
+def write_variance_workbook(path, results, engine="xml", previous_name="", current_name="", **engine_options):
+    writer = open_workbook_writer(path, engine, **engine_options)
+    try:
+        summary = SheetSeries(writer, "Übersicht", "reference")
+        summary.set_column_widths({"A": 32, **{letter: 16 for letter in "BCDEFGHI"}})
+        summary.append([f"Periodenvergleich: {previous_name} -> {current_name}"], ["sheet_title"])
+        summary.merge_cells("A1:I1")
+        summary.append(SUMMARY_HEADERS, "header")
+        for result in results:
+            summary.append(
+                [result.comparison.sheet, result.keys_previous, result.keys_current,
+                 result.counts[STATUS_NEW], result.counts[STATUS_REMOVED], result.counts[STATUS_CHANGED],
+                 len(result.rows), result.total_previous, result.total_current],
+                ("bold",) + ("cell",) * 6 + ("amount", "amount"),
+            )
+
+        for result in results:
+            comparison = result.comparison
+            headers = ["Status", *comparison.keys, *comparison.labels, *VALUE_HEADERS]
+            styles = ("cell",) * (1 + len(comparison.keys) + len(comparison.labels)) + (
+                "amount", "amount", "calculated", "calculated_percent")
+            ws = SheetSeries(writer, comparison.title, "data")
+
+            def head(sheet, headers=headers):
+                sheet.set_column_widths({letter: 18 for letter in "ABCDEFGHIJ"})
+                sheet.append(headers, "header")
+
+            ws.begin(head)
+            for row in result.rows:
+                if ws.row_count >= ws.row_limit:
+                    ws.continue_sheet()
+                ws.append(row, styles)
+        return writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def compare_templates(previous, current, output, abs_threshold=0.0, rel_threshold=0.0,
+                      partitions=DEFAULT_PARTITIONS, jobs=None, engine="xml", **engine_options):
+    """
+    Gibt (BuildMetrics, [ComparisonResult]) zurück.
+    Beide Eingaben werden parallel gelesen, danach die Partitionen parallel verglichen.
+    """
+    started = time.perf_counter()
+    work_dir = tempfile.mkdtemp(prefix="template-variance-")
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            spools = [
+                pool.submit(_spool_input, path, os.path.join(work_dir, side), partitions)
+                for side, path in (("vorjahr", previous), ("aktuell", current))
+            ]
+            previous_dir, current_dir = (future.result() for future in spools)
+            futures = {
+                comparison: [
+                    pool.submit(
+                        _compare_partition, comparison,
+                        partition_path(os.path.join(previous_dir, get_schema(comparison.sheet).file), idx),
+                        partition_path(os.path.join(current_dir, get_schema(comparison.sheet).file), idx),
+                        abs_threshold, rel_threshold,
+                    )
+                    for idx in range(partitions)
+                ]
+                for comparison in COMPARISONS
+            }
+            results = [
+                _combine(comparison, (future.result() for future in partials))
+                for comparison, partials in futures.items()
+            ]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"[Variance] Vergleich in {time.perf_counter() - started:.2f}s")
+    metrics = write_variance_workbook(
+        output, results, engine, os.path.basename(os.path.normpath(previous)),
+        os.path.basename(os.path.normpath(current)), **engine_options,
+    )
+    return metrics, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vergleicht zwei ausgefüllte Templates (Vorjahr / aktuell)")
+    parser.add_argument("previous", help="Vorjahres-Template (XLSX oder Bundle-Verzeichnis)")
+    parser.add_argument("current", help="Aktuelles Template (XLSX oder Bundle-Verzeichnis)")
+    parser.add_argument("output")
+    parser.add_argument("--abs", type=float, default=0.0, dest="abs_threshold",
+                        help="Wesentlichkeitsgrenze absolut (Standard: jede Abweichung)")
+    parser.add_argument("--rel", type=float, default=0.0, dest="rel_threshold",
+                        help="Wesentlichkeitsgrenze in %% des Vorjahreswerts")
+    parser.add_argument("--partitions", type=int, default=DEFAULT_PARTITIONS,
+                        help="Spool-Partitionen des Hash-Joins (mehr = weniger Speicher je Partition)")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallele Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--engine", default="xml")
+    args = parser.parse_args(argv)
+    if args.partitions < 1:
+        parser.error("--partitions muss mindestens 1 sein")
+
+    metrics, results = compare_templates(
+        args.previous, args.current, args.output, args.abs_threshold, args.rel_threshold, args.partitions, args.jobs,
+        args.engine,
+    )
+    for result in results:
+        counts = result.counts
+        print(f"  - {result.comparison.sheet}: {len(result.rows):,} wesentliche Abweichungen "
+              f"({counts[STATUS_NEW]:,} neu, {counts[STATUS_REMOVED]:,} entfallen, {counts[STATUS_CHANGED]:,} geändert)")
+    print(f"[SUCCESS] Abweichungsbericht erstellt: {args.output}")
+    print(f"[Template] {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Inkrementelle Übernahme eintreffender Templates aus einem Eingangsordner
+
+Während des Abschlusses treffen die ausgefüllten Templates der Töchter über Tage
+ein. Statt bei jeder Datei alles neu zu rechnen, überwacht dieser Modus einen
+Ordner (Polling, ohne Zusatzpakete) und liest nur neue, ersetzte oder gelöschte
+Dateien. Je Datei und Unternehmen werden Beiträge gespeichert:
+
+  - aktiva / passiva: Saldo der Bilanzkonten (asset bzw. -(liability + equity))
+  - guv_ergebnis: Erträge - Aufwendungen der GuV-Daten (net_income wird nicht mitgezählt)
+  - IC-Salden je Paar (Gläubiger, Schuldner): Forderungen - gemeldete Verbindlichkeiten
+
+Bei einer Änderung wird der alte Beitrag der Datei abgezogen und der neue addiert
+(eine Transaktion) - Unternehmens- und Konzernstände sind danach aktuell, der Aufwand
+hängt nur von der geänderten Datei ab. Offene IC-Positionen sind Paare mit Saldo != 0.
+
+Aufruf:
+    python template_watch.py watch STATUS.db EINGANG/ [--interval 10] [--once]
+    python template_watch.py status STATUS.db
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from template_schema import get_schema
+
+WATCH_VERSION = 1
+
+# Nur Dateien übernehmen, die so lange unverändert sind (noch laufende Kopien)
+SETTLE_SECONDS = 2.0
+DEFAULT_INTERVAL = 10.0
+TOLERANCE = 0.005
+LOG_COMPANIES = 5
+
+BILANZ_SIGNS = {"asset": ("aktiva", 1.0), "liability": ("passiva", -1.0), "equity": ("passiva", -1.0)}
+GUV_SIGNS = {
+    "revenue": 1.0, "financial_income": 1.0,
+    "cost_of_sales": -1.0, "operating_expense": -1.0, "financial_expense": -1.0, "income_tax": -1.0,
+}
+METRICS = ("aktiva", "passiva", "guv_ergebnis")
+IC_METRIC = "ic_saldo"
+IC_RECEIVABLE = "Forderung"
+IC_PAYABLE = "Verbindlichkeit"
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_contributions(path):
+    """
+    Liest eine Datei einmal (read-only, zeilenweise) und gibt
+    {(Unternehmen, Gegenpartei, Kennzahl): Wert} zurück; Gegenpartei '' bei Unternehmenskennzahlen.
+    """
+    from template_reader import open_rows
+
+    totals = {}
+
+    def add(key, value):
+        if value:
+            totals[key] = totals.get(key, 0.0) + value
+
+    with open_rows(path) as rows:
+        schema = get_schema("Bilanzdaten")
+        company, kind, saldo = (schema.index(c) for c in ("Unternehmen", "Kontotyp", "Saldo"))
+        for row in rows(schema.name):
+            metric, sign = BILANZ_SIGNS.get(row[kind], (None, 0.0))
+            if metric:
+                add((row[company], "", metric), sign * (row[saldo] or 0.0))
+
+        schema = get_schema("GuV-Daten")
+        company, kind, amount = (schema.index(c) for c in ("Unternehmen", "Kontotyp", "Betrag"))
+        for row in rows(schema.name):
+            add((row[company], "", "guv_ergebnis"), GUV_SIGNS.get(row[kind], 0.0) * (row[amount] or 0.0))
+
+        schema = get_schema("Zwischengesellschaftsgeschäfte")
+        seller, buyer, kind, amount = (
+            schema.index(c) for c in ("Von Unternehmen", "An Unternehmen", "Transaktionstyp", "Betrag")
+        )
+        for row in rows(schema.name):
+            # Paar immer als (Gläubiger, Schuldner): Forderung von->an, Verbindlichkeit an->von
+            if row[kind] == IC_RECEIVABLE:
+                add((row[seller], row[buyer], IC_METRIC), row[amount] or 0.0)
+            elif row[kind] == IC_PAYABLE:
+                add((row[buyer], row[seller], IC_METRIC), -(row[amount] or 0.0))
+    return totals
+
+
+class GroupStatus:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS watch_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute("INSERT OR IGNORE INTO watch_meta VALUES ('version', ?)", (str(WATCH_VERSION),))
+            version = int(self.conn.execute("SELECT value FROM watch_meta WHERE key = 'version'").fetchone()[0])
+            if version > WATCH_VERSION:
+                raise ValueError(f"{self.path}: Status-Version {version} wird nicht unterstützt")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "sha256 TEXT NOT NULL, ingested TEXT NOT NULL, error TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS contributions ("
+                "path TEXT NOT NULL, company TEXT NOT NULL, counterparty TEXT NOT NULL, metric TEXT NOT NULL, "
+                "value REAL NOT NULL, PRIMARY KEY (path, company, counterparty, metric))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS aggregates ("
+                "company TEXT NOT NULL, counterparty TEXT NOT NULL, metric TEXT NOT NULL, value REAL NOT NULL, "
+                "PRIMARY KEY (company, counterparty, metric))"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS group_totals (metric TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def close(self):
+        self.conn.close()
+
+    def _apply(self, contributions, sign):
+        """Addiert (sign=1) bzw. subtrahiert (sign=-1) Beiträge auf Unternehmens- und Konzernebene"""
+        self.conn.executemany(
+            "INSERT INTO aggregates VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (company, counterparty, metric) DO UPDATE SET value = value + excluded.value",
+            ((company, counterparty, metric, sign * value) for (company, counterparty, metric), value in contributions.items()),
+        )
+        group = {}
+        for (_, _, metric), value in contributions.items():
+            group[metric] = group.get(metric, 0.0) + sign * value
+        self.conn.executemany(
+            "INSERT INTO group_totals VALUES (?, ?) ON CONFLICT (metric) DO UPDATE SET value = value + excluded.value",
+            group.items(),
+        )
+
+    def _old_contributions(self, path):
+        return {
+            (company, counterparty, metric): value
+            for company, counterparty, metric, value in self.conn.execute(
+                "SELECT company, counterparty, metric, value FROM contributions WHERE path = ?", (path,)
+            )
+        }
+
+    def replace_file(self, path, stat, sha256, contributions):
+        """Alten Beitrag der Datei abziehen, neuen addieren - in einer Transaktion"""
+        with self.conn:
+            self._apply(self._old_contributions(path), -1.0)
+            self.conn.execute("DELETE FROM contributions WHERE path = ?", (path,))
+            self.conn.executemany(
+                "INSERT INTO contributions VALUES (?, ?, ?, ?, ?)",
+                ((path, *key, value) for key, value in contributions.items()),
+            )
+            self._apply(contributions, 1.0)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, NULL)",
+                (path, stat.st_mtime_ns, stat.st_size, sha256, _now()),
+            )
+            self._prune()
+
+    def remove_file(self, path):
+        with self.conn:
+            self._apply(self._old_contributions(path), -1.0)
+            self.conn.execute("DELETE FROM contributions WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._prune()
+
+    def mark_failed(self, path, stat, sha256, error):
+        """Unlesbare Datei: alter Beitrag bleibt stehen, Fehler wird vermerkt (erneuter Versuch bei Änderung)"""
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE files SET mtime_ns = ?, size = ?, sha256 = ?, error = ? WHERE path = ?",
+                (stat.st_mtime_ns, stat.st_size, sha256, error, path),
+            )
+            if cursor.rowcount == 0:
+                self.conn.execute(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, stat.st_mtime_ns, stat.st_size, sha256, _now(), error),
+                )
+
+    def touch_file(self, path, stat):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?", (stat.st_mtime_ns, stat.st_size, path)
+            )
+
+    def _prune(self):
+        # Rundungsreste nach Abzug vollständig entfernter Beiträge
+        self.conn.execute("DELETE FROM aggregates WHERE ABS(value) < ?", (TOLERANCE / 100,))
+
+    def known_files(self):
+        return {
+            path: (mtime_ns, size, sha256)
+            for path, mtime_ns, size, sha256 in self.conn.execute("SELECT path, mtime_ns, size, sha256 FROM files")
+        }
+
+    def company_status(self):
+        """{Unternehmen: {Kennzahl: Wert}} für aktiva, passiva, guv_ergebnis"""
+        result = {}
+        for company, metric, value in self.conn.execute(
+            "SELECT company, metric, value FROM aggregates WHERE counterparty = '' ORDER BY company"
+        ):
+            result.setdefault(company, {})[metric] = value
+        return result
+
+    def open_ic_positions(self):
+        """[(Gläubiger, Schuldner, offener Saldo)] - Forderungen ohne passende Verbindlichkeit und umgekehrt"""
+        return self.conn.execute(
+            "SELECT company, counterparty, value FROM aggregates WHERE metric = ? AND ABS(value) >= ? "
+            "ORDER BY ABS(value) DESC",
+            (IC_METRIC, TOLERANCE),
+        ).fetchall()
+
+    def group_totals(self):
+        return dict(self.conn.execute("SELECT metric, value FROM group_totals"))
+
+    def files(self):
+        return self.conn.execute("SELECT path, ingested, error FROM files ORDER BY path").fetchall()
+
+
+def _candidates(directory):
+    for entry in os.scandir(directory):
+        name = entry.name
+        if entry.is_file() and name.lower().endswith(".xlsx") and not name.startswith(("~$", ".")):
+            yield os.path.abspath(entry.path), entry.stat()
+
+
+def scan_once(status, directory, log=print):
+    """Ein Durchlauf: neue/geänderte Dateien übernehmen, gelöschte abziehen; gibt die Anzahl Änderungen zurück"""
+    known = status.known_files()
+    seen = set()
+    changes = 0
+    now = time.time()
+    for path, stat in _candidates(directory):
+        seen.add(path)
+        previous = known.get(path)
+        if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+            continue
+        if now - stat.st_mtime < SETTLE_SECONDS:
+            continue  # wird evtl. noch geschrieben - nächster Durchlauf
+        sha256 = _sha256(path)
+        if previous is not None and previous[2] == sha256:
+            status.touch_file(path, stat)
+            continue
+        started = time.perf_counter()
+        try:
+            contributions = file_contributions(path)
+        except Exception as exc:
+            status.mark_failed(path, stat, sha256, f"{type(exc).__name__}: {exc}")
+            log(f"[ERROR] {os.path.basename(path)}: {exc}")
+            continue
+        status.replace_file(path, stat, sha256, contributions)
+        changes += 1
+        companies = sorted({company for company, _, _ in contributions})
+        shown = ", ".join(companies[:LOG_COMPANIES]) or "keine Daten"
+        if len(companies) > LOG_COMPANIES:
+            shown += f" (+{len(companies) - LOG_COMPANIES} weitere)"
+        action = "ersetzt" if previous is not None else "neu"
+        log(f"[Watch] {os.path.basename(path)} {action}: {shown} ({time.perf_counter() - started:.2f}s)")
+    for path in known.keys() - seen:
+        status.remove_file(path)
+        changes += 1
+        log(f"[Watch] {os.path.basename(path)} entfernt")
+    return changes
+
+
+def print_status(status):
+    for company, metrics in status.company_status().items():
+        aktiva, passiva = metrics.get("aktiva", 0.0), metrics.get("passiva", 0.0)
+        balanced = "" if abs(aktiva - passiva) < TOLERANCE else f"  (Differenz {aktiva - passiva:,.2f})"
+        print(
+            f"  - {company}: Bilanzsumme {aktiva:,.2f}, Passiva {passiva:,.2f}, "
+            f"GuV-Ergebnis {metrics.get('guv_ergebnis', 0.0):,.2f}{balanced}"
+        )
+    open_positions = status.open_ic_positions()
+    for creditor, debtor, value in open_positions:
+        print(f"  - IC offen: {creditor} -> {debtor}: {value:,.2f}")
+    totals = status.group_totals()
+    print(
+        f"[Status] Konzern: Aktiva {totals.get('aktiva', 0.0):,.2f}, Passiva {totals.get('passiva', 0.0):,.2f}, "
+        f"GuV-Ergebnis {totals.get('guv_ergebnis', 0.0):,.2f}, {len(open_positions)} offene IC-Positionen, "
+        f"{len(status.files())} Dateien"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Überwacht einen Eingangsordner und pflegt Konzernstände inkrementell")
+    sub = parser.add_subparsers(dest="command", required=True)
+    watch = sub.add_parser("watch")
+    watch.add_argument("database", help="SQLite-Datei für Stände (wird angelegt)")
+    watch.add_argument("directory")
+    watch.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Sekunden zwischen Durchläufen")
+    watch.add_argument("--once", action="store_true", help="Nur ein Durchlauf")
+    show = sub.add_parser("status")
+    show.add_argument("database")
+    args = parser.parse_args(argv)
+
+    status = GroupStatus(args.database)
+    try:
+        if args.command == "status":
+            print_status(status)
+            return
+        print(f"[Watch] Überwache {args.directory} (alle {args.interval:g}s)")
+        while True:
+            if scan_once(status, args.directory):
+                print_status(status)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("[Watch] Beendet")
+    finally:
+        status.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,994 @@
+#!/usr/bin/env python3
+"""
+Schreib-Engines für das Konsolidierungs-Template
+
+Beide Engines bieten dieselbe Streaming-API (Zeilen werden nur angehängt):
+  - "openpyxl": openpyxl im write-only Modus
+  - "xml":      schreibt das Sheet-XML direkt in den Zip-Stream, ohne Cell-Objekte
+"""
+
+import contextlib
+import os
+import re
+import struct
+import time
+import zipfile
+from copy import copy
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from xml.sax.saxutils import quoteattr
+
+# Stiltabelle - gemeinsame Grundlage beider Engines.
+# Die Reihenfolge bestimmt die Style-Indizes im styles.xml der XML-Engine.
+HEADER_COLOR = "366092"
+STYLE_TABLE = {
+    "header": {"font": {"bold": True, "color": "FFFFFF", "size": 11}, "fill": HEADER_COLOR, "align": "center", "border": True},
+    "cell": {"border": True},
+    "required": {"fill": "E7F3FF", "border": True},  # Blau für Pflichtfelder
+    "optional": {"fill": "FFF9E6", "border": True},  # Gelb für optionale Felder
+    "amount": {"number_format": "#,##0.00", "align": "right", "border": True},
+    "amount_plain": {"number_format": "#,##0.00", "border": True},
+    "rate": {"number_format": "#,##0.0000", "align": "right", "border": True},
+    "percent": {"number_format": '0.00"%"', "border": True},
+    "calculated": {"number_format": "#,##0.00", "fill": "E6F7E6", "align": "right", "border": True},  # Grün für berechnete Felder
+    "calculated_bold": {"number_format": "#,##0.00", "fill": "E6F7E6", "font": {"bold": True}, "border": True},
+    "calculated_percent": {"number_format": '0.00"%"', "fill": "E6F7E6", "border": True},
+    "total_label": {"font": {"bold": True}},
+    "total": {"number_format": "#,##0.00", "fill": "E6F7E6", "font": {"bold": True}},
+    "title": {"font": {"bold": True, "size": 16, "color": "FFFFFF"}, "fill": HEADER_COLOR, "align": "center"},
+    "sheet_title": {"font": {"bold": True, "size": 14, "color": "FFFFFF"}, "fill": HEADER_COLOR, "align": "center"},
+    "version": {"font": {"italic": True, "size": 10}, "align": "center"},
+    "section": {"font": {"bold": True, "size": 12}},
+    "bold": {"font": {"bold": True}},
+    "subheader": {"fill": "D9E1F2", "font": {"bold": True}},
+}
+
+# Differenz-Formate für bedingte Formatierung - dxf-Index = Position
+WARNING_COLOR = "FFE6E6"
+CONDITIONAL_STYLES = {
+    "warning": {"fill": WARNING_COLOR},  # Rot für Warnungen
+}
+
+DEFAULT_FONT = {"name": "Calibri", "size": 11}
+
+# Excel-Grenzen
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
+
+_INVALID_TITLE_CHARS = re.compile(r"[\\*?:/\[\]]")
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def column_letter(idx):
+    """1 -> A, 27 -> AA"""
+    if not 1 <= idx <= MAX_COLUMNS:
+        raise ValueError(f"Spaltenindex außerhalb des gültigen Bereichs: {idx}")
+    letters = ""
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def coerce_value(value):
+    """Normalisiert Werte, die keine der Engines nativ schreibt (Datum, Decimal)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def check_sheet_title(title):
+    if not title or len(title) > 31 or _INVALID_TITLE_CHARS.search(title):
+        raise ValueError(f"Ungültiger Blattname: {title!r}")
+    return title
+
+
+# ===== Zip-Kompression =====
+
+# Stufen: (Zip-Verfahren, Deflate-Level)
+COMPRESSION_LEVELS = {
+    "stored": (zipfile.ZIP_STORED, None),
+    "fast": (zipfile.ZIP_DEFLATED, 1),
+    "default": (zipfile.ZIP_DEFLATED, 6),
+    "max": (zipfile.ZIP_DEFLATED, 9),
+}
+
+# Teiltypen des Pakets
+#   data:      Datenblätter (Bilanzdaten, GuV-Daten, ...)
+#   reference: Anleitung und Referenzblätter
+#   styles:    styles.xml / Theme
+#   strings:   sharedStrings.xml
+#   package:   workbook.xml, Relationships, Content-Types, docProps
+PART_KINDS = ("data", "reference", "styles", "strings", "package")
+
+# Voreinstellungen; "transfer" = Maschine-zu-Maschine (nur große Datenblätter komprimieren)
+COMPRESSION_PRESETS = {
+    "default": dict.fromkeys(PART_KINDS, "default"),
+    "stored": dict.fromkeys(PART_KINDS, "stored"),
+    "fast": dict.fromkeys(PART_KINDS, "fast"),
+    "max": dict.fromkeys(PART_KINDS, "max"),
+    "transfer": {"data": "fast", "reference": "stored", "styles": "stored", "strings": "fast", "package": "stored"},
+}
+
+
+def parse_compression(spec):
+    """
+    "fast" | "max,reference=stored" | "data=max,styles=stored" -> {Teiltyp: Stufe}
+    Ein Preset-Name setzt alle Teiltypen, "typ=stufe" überschreibt einzelne.
+    """
+    if isinstance(spec, dict):
+        policy = dict(COMPRESSION_PRESETS["default"])
+        policy.update(spec)
+    else:
+        policy = dict(COMPRESSION_PRESETS["default"])
+        for token in filter(None, (t.strip() for t in (spec or "default").split(","))):
+            if "=" in token:
+                kind, level = (x.strip() for x in token.split("=", 1))
+                if kind not in PART_KINDS:
+                    raise ValueError(f"Unbekannter Teiltyp '{kind}' - verfügbar: {', '.join(PART_KINDS)}")
+                policy[kind] = level
+            elif token in COMPRESSION_PRESETS:
+                policy.update(COMPRESSION_PRESETS[token])
+            else:
+                raise ValueError(f"Unbekannte Kompression '{token}' - verfügbar: {', '.join(COMPRESSION_PRESETS)}")
+    for level in policy.values():
+        if level not in COMPRESSION_LEVELS:
+            raise ValueError(f"Unbekannte Kompressionsstufe '{level}' - verfügbar: {', '.join(COMPRESSION_LEVELS)}")
+    return policy
+
+
+def format_compression(policy):
+    levels = set(policy.values())
+    if len(levels) == 1:
+        return levels.pop()
+    return ",".join(f"{kind}={policy[kind]}" for kind in PART_KINDS)
+
+
+def classify_part(name, sheet_kinds):
+    """Zip-Teilname -> Teiltyp; sheet_kinds: {Teilname des Blatts: "data"/"reference"}"""
+    if name in sheet_kinds:
+        return sheet_kinds[name]
+    if name.startswith("xl/worksheets/") and name.endswith(".xml"):
+        return "data"
+    if name == "xl/styles.xml" or name.startswith("xl/theme/"):
+        return "styles"
+    if name == "xl/sharedStrings.xml":
+        return "strings"
+    return "package"
+
+
+@dataclass
+class BuildMetrics:
+    """Kennzahlen eines Template-Builds"""
+    engine: str
+    sheets: int = 0
+    rows: int = 0
+    cells: int = 0
+    seconds: float = 0.0
+    bytes: int = 0
+    compression: str = "default"
+    uncompressed_bytes: int = 0
+    parts: dict = field(default_factory=dict)  # Teiltyp -> (unkomprimiert, komprimiert)
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def compression_ratio(self):
+        return self.bytes / self.uncompressed_bytes if self.uncompressed_bytes else 1.0
+
+    def summary(self):
+        return (
+            f"Engine {self.engine}: {self.sheets} Blätter, {self.rows:,} Zeilen, {self.cells:,} Zellen "
+            f"in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} Zeilen/s), {self.bytes / 1024:,.1f} KB"
+        )
+
+    def compression_summary(self):
+        lines = [
+            f"Kompression {self.compression}: {self.uncompressed_bytes / 1024:,.1f} KB -> "
+            f"{self.bytes / 1024:,.1f} KB ({self.compression_ratio:.1%})"
+        ]
+        for kind, (raw, packed) in self.parts.items():
+            lines.append(f"  - {kind}: {raw / 1024:,.1f} KB -> {packed / 1024:,.1f} KB")
+        return "\n".join(lines)
+
+
+class SheetWriter:
+    """Gemeinsame Schnittstelle eines Arbeitsblatts (nur anhängend)"""
+
+    def __init__(self, title, kind="data"):
+        if kind not in ("data", "reference"):
+            raise ValueError(f"Unbekannter Blatttyp: {kind}")
+        self.title = check_sheet_title(title)
+        self.kind = kind
+        self.row_count = 0
+        self.cell_count = 0
+        self.hidden = False
+        self.row_digest = None  # (Blatt, Zeilen, Digest) der Zeilen-Hashes - siehe template_rowhash.py
+
+    def set_column_widths(self, widths):
+        """widths: {"A": 25, "B": 15, ...} - muss vor der ersten Zeile gesetzt werden"""
+        raise NotImplementedError
+
+    def hide_columns(self, letters):
+        """Blendet Spalten aus - muss vor der ersten Zeile gesetzt werden"""
+        raise NotImplementedError
+
+    def hide(self):
+        """Blendet das Blatt aus (workbook.xml: state="hidden")"""
+        self.hidden = True
+
+    def append(self, values, styles=None):
+        """
+        Hängt eine Zeile an und gibt ihre Zeilennummer zurück.
+        styles: ein Stilname für alle Zellen oder eine Sequenz (ein Name/None je Spalte)
+        """
+        raise NotImplementedError
+
+    def merge_cells(self, ref):
+        raise NotImplementedError
+
+    def add_list_validation(self, formula1, sqref):
+        raise NotImplementedError
+
+    def add_conditional_format(self, sqref, formula, style="warning"):
+        """Formelregel über einen ganzen Bereich; formula ohne '=' und relativ zur linken oberen Zelle"""
+        raise NotImplementedError
+
+
+class WorkbookWriter:
+    """Gemeinsame Schnittstelle der Engines"""
+
+    engine = None
+
+    def __init__(self, path, compression="default"):
+        self.path = path
+        self.sheets = []
+        self.defined_names = {}  # Name -> Formel (ohne '='), Reihenfolge der Definition
+        self.compression = parse_compression(compression)
+        self._started = time.perf_counter()
+
+    def create_sheet(self, title, kind="data"):
+        """kind: "data" oder "reference" - bestimmt die Kompressionsstufe des Blatts"""
+        raise NotImplementedError
+
+    def define_name(self, name, formula):
+        """Arbeitsmappenweiter Name (z.B. für Auswahllisten); formula ohne '=', wird beim Schließen geschrieben"""
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", name):
+            raise ValueError(f"Ungültiger Name: {name!r}")
+        self.defined_names[name] = formula
+
+    def _sheet_kinds(self):
+        return {f"xl/worksheets/sheet{idx}.xml": ws.kind for idx, ws in enumerate(self.sheets, start=1)}
+
+    def close(self):
+        """Schließt die Datei und liefert die BuildMetrics"""
+        raise NotImplementedError
+
+    def abort(self):
+        """Bricht einen fehlgeschlagenen Build ab - eine vorhandene Zieldatei bleibt unverändert"""
+
+    def _metrics(self):
+        seconds = time.perf_counter() - self._started
+        parts = {}
+        sheet_kinds = self._sheet_kinds()
+        with zipfile.ZipFile(self.path) as zf:
+            for info in zf.infolist():
+                kind = classify_part(info.filename, sheet_kinds)
+                raw, packed = parts.get(kind, (0, 0))
+                parts[kind] = (raw + info.file_size, packed + info.compress_size)
+        return BuildMetrics(
+            engine=self.engine,
+            sheets=len(self.sheets),
+            rows=sum(ws.row_count for ws in self.sheets),
+            cells=sum(ws.cell_count for ws in self.sheets),
+            seconds=seconds,
+            bytes=os.path.getsize(self.path),
+            compression=format_compression(self.compression),
+            uncompressed_bytes=sum(raw for raw, _ in parts.values()),
+            parts={kind: parts[kind] for kind in PART_KINDS if kind in parts},
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def continuation_title(title, number):
+    """Name des `number`-ten Teils (ab 2) eines Blatts: 'Bilanzdaten (2)' - auf 31 Zeichen gekürzt"""
+    suffix = f" ({number})"
+    return title[:31 - len(suffix)] + suffix
+
+
+def sheet_ref(title, ref):
+    """Blattübergreifende Referenz für Formeln: Bilanzdaten!H2:H9 bzw. 'Bilanzdaten (2)'!H2:H9"""
+    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_.]*", title):
+        return f"{title}!{ref}"
+    return "'" + title.replace("'", "''") + f"'!{ref}"
+
+
+class SheetSeries:
+    """
+    Logisches Blatt aus einem Arbeitsblatt und Folgeblättern ('Titel (2)', ...).
+    Läuft das aktuelle Blatt voll, legt continue_sheet() das nächste an und wiederholt
+    dort den Blattkopf (siehe begin). Alle übrigen Aufrufe gehen an das aktuelle Blatt.
+    """
+
+    def __init__(self, workbook, title, kind="data", max_rows=MAX_ROWS):
+        self.workbook = workbook
+        self.title = title
+        self.kind = kind
+        self.max_rows = max_rows
+        self.row_limit = max_rows
+        self.parts = [workbook.create_sheet(title, kind)]
+        self._head = None
+
+    @property
+    def current(self):
+        return self.parts[-1]
+
+    @property
+    def row_count(self):
+        return self.current.row_count
+
+    def begin(self, head, footer_rows=0):
+        """
+        head(ws) schreibt Spaltenbreiten, Titel und Header - jetzt und auf jedem Folgeblatt.
+        footer_rows: Zeilen, die für Summenzeilen am Ende freigehalten werden
+        """
+        self._head = head
+        self.row_limit = self.max_rows - footer_rows
+        head(self.current)
+        if self.current.row_count >= self.row_limit:
+            raise ValueError(f"Blatt '{self.title}': Zeilenlimit {self.max_rows:,} kleiner als der Blattkopf")
+
+    def continue_sheet(self):
+        """Legt das nächste Folgeblatt an (Kopf inklusive) und gibt es zurück"""
+        if self._head is None:
+            raise ValueError(f"Blatt '{self.title}' überschreitet {self.max_rows:,} Zeilen")
+        ws = self.workbook.create_sheet(continuation_title(self.title, len(self.parts) + 1), self.kind)
+        self.parts.append(ws)
+        self._head(ws)
+        return ws
+
+    def set_column_widths(self, widths):
+        self.current.set_column_widths(widths)
+
+    def hide_columns(self, letters):
+        self.current.hide_columns(letters)
+
+    def append(self, values, styles=None):
+        return self.current.append(values, styles)
+
+    def merge_cells(self, ref):
+        self.current.merge_cells(ref)
+
+    def add_list_validation(self, formula1, sqref):
+        self.current.add_list_validation(formula1, sqref)
+
+    def add_conditional_format(self, sqref, formula, style="warning"):
+        self.current.add_conditional_format(sqref, formula, style)
+
+
+# ===== Engine "openpyxl" =====
+
+class OpenpyxlSheetWriter(SheetWriter):
+    def __init__(self, parent, ws, kind):
+        super().__init__(ws.title, kind)
+        self._parent = parent
+        self._ws = ws
+
+    def set_column_widths(self, widths):
+        for letter, width in widths.items():
+            self._ws.column_dimensions[letter].width = width
+
+    def hide_columns(self, letters):
+        for letter in letters:
+            self._ws.column_dimensions[letter].hidden = True
+
+    def hide(self):
+        super().hide()
+        self._ws.sheet_state = "hidden"
+
+    def append(self, values, styles=None):
+        from openpyxl.cell import WriteOnlyCell
+
+        if self.row_count >= MAX_ROWS:
+            raise ValueError(f"Blatt '{self.title}' überschreitet {MAX_ROWS:,} Zeilen")
+        values = [coerce_value(v) for v in values]
+        if styles is not None:
+            if isinstance(styles, str):
+                styles = (styles,) * len(values)
+            row = []
+            for value, style in zip(values, styles):
+                if style is None:
+                    row.append(value)
+                    continue
+                cell = WriteOnlyCell(self._ws, value=value)
+                cell._style = copy(self._parent.style_array(self._ws, style))
+                row.append(cell)
+            values = row
+        self._ws.append(values)
+        self.row_count += 1
+        self.cell_count += len(values)
+        return self.row_count
+
+    def merge_cells(self, ref):
+        self._ws.merged_cells.add(ref)
+
+    def add_list_validation(self, formula1, sqref):
+        from openpyxl.worksheet.datavalidation import DataValidation
+
+        dv = DataValidation(type="list", formula1=formula1)
+        dv.add(sqref)
+        self._ws.data_validations.append(dv)
+
+    def add_conditional_format(self, sqref, formula, style="warning"):
+        from openpyxl.formatting.rule import FormulaRule
+        from openpyxl.styles import PatternFill
+
+        color = CONDITIONAL_STYLES[style]["fill"]
+        fill = PatternFill(start_color=color, end_color=color, fill_type="solid")
+        self._ws.conditional_formatting.add(sqref, FormulaRule(formula=[formula], fill=fill))
+
+
+class OpenpyxlWorkbookWriter(WorkbookWriter):
+    engine = "openpyxl"
+
+    def __init__(self, path, compression="default"):
+        from openpyxl import Workbook
+
+        super().__init__(path, compression)
+        self._wb = Workbook(write_only=True)
+        self._styles = {}
+        self._style_arrays = {}
+
+    def style_array(self, ws, name):
+        """
+        Registrierter StyleArray je Stilname - das Zuweisen von Font/Fill/Border
+        je Zelle hasht die Stilobjekte jedes Mal neu und dominiert sonst die Laufzeit
+        """
+        array = self._style_arrays.get(name)
+        if array is None:
+            from openpyxl.cell import WriteOnlyCell
+
+            cell = WriteOnlyCell(ws)
+            for attr, obj in self.style(name).items():
+                setattr(cell, attr, obj)
+            array = self._style_arrays[name] = cell._style
+        return array
+
+    def style(self, name):
+        """Stilname -> openpyxl-Stilobjekte (einmal je Build erzeugt)"""
+        if name not in self._styles:
+            from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+            spec = STYLE_TABLE[name]
+            attrs = {"font": Font(**_font_kwargs(spec.get("font")))}
+            if "fill" in spec:
+                attrs["fill"] = PatternFill(start_color=spec["fill"], end_color=spec["fill"], fill_type="solid")
+            if spec.get("border"):
+                side = Side(style="thin")
+                attrs["border"] = Border(left=side, right=side, top=side, bottom=side)
+            if "align" in spec:
+                attrs["alignment"] = Alignment(horizontal=spec["align"], vertical="center")
+            if "number_format" in spec:
+                attrs["number_format"] = spec["number_format"]
+            self._styles[name] = attrs
+        return self._styles[name]
+
+    def create_sheet(self, title, kind="data"):
+        ws = OpenpyxlSheetWriter(self, self._wb.create_sheet(check_sheet_title(title)), kind)
+        self.sheets.append(ws)
+        return ws
+
+    def close(self):
+        from openpyxl.workbook.defined_name import DefinedName
+
+        for name, formula in self.defined_names.items():
+            self._wb.defined_names[name] = DefinedName(name, attr_text=formula)
+        self._wb.save(self.path)
+        if self.compression != COMPRESSION_PRESETS["default"]:
+            # openpyxl komprimiert fest mit Deflate-Standardstufe - Paket einmal umpacken
+            repack(self.path, self.compression, self._sheet_kinds())
+        return self._metrics()
+
+
+def repack(path, policy, sheet_kinds=None):
+    """Packt ein vorhandenes XLSX mit der Kompressions-Policy {Teiltyp: Stufe} neu"""
+    sheet_kinds = sheet_kinds or {}
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(tmp_path, "w") as dst:
+        for info in src.infolist():
+            compress_type, level = COMPRESSION_LEVELS[policy[classify_part(info.filename, sheet_kinds)]]
+            dst.writestr(info.filename, src.read(info), compress_type=compress_type, compresslevel=level)
+    os.replace(tmp_path, path)
+
+
+def _font_kwargs(font):
+    kwargs = {"name": DEFAULT_FONT["name"], "size": DEFAULT_FONT["size"]}
+    for key, value in (font or {}).items():
+        kwargs[key] = value
+    return kwargs
+
+
+# ===== Engine "xml" =====
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_SHEET_HEAD = XML_DECL + f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+_SHEET_FORMAT = '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>'
+
+# Zeilen werden in Blöcken kodiert und in den Zip-Stream geschrieben
+FLUSH_ROWS = 2000
+
+
+@lru_cache(maxsize=65536)
+def escape_text(text):
+    """XML-Escaping für Zellinhalte (gecacht - Stammdaten wiederholen sich stark)"""
+    if _ILLEGAL_XML_CHARS.search(text):
+        raise ValueError(f"Unzulässiges Steuerzeichen in Zellwert: {text!r}")
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _text_element(text):
+    if text[:1].isspace() or text[-1:].isspace():
+        return '<t xml:space="preserve">' + escape_text(text) + "</t>"
+    return "<t>" + escape_text(text) + "</t>"
+
+
+class XmlSheetWriter(SheetWriter):
+    def __init__(self, parent, index, title, kind):
+        super().__init__(title, kind)
+        self.index = index
+        self.part_name = f"xl/worksheets/sheet{index}.xml"
+        self._parent = parent
+        self._widths = {}
+        self._hidden_columns = set()
+        self._merges = []
+        self._validations = []
+        self._conditional_formats = []
+        self._stream = None
+        self._buffer = []
+        self._letters = []
+        self._row_styles = {}
+        self.closed = False
+
+    def set_column_widths(self, widths):
+        if self._stream is not None:
+            raise RuntimeError(f"Spaltenbreiten für '{self.title}' müssen vor der ersten Zeile gesetzt werden")
+        self._widths.update(widths)
+
+    def hide_columns(self, letters):
+        if self._stream is not None:
+            raise RuntimeError(f"Ausgeblendete Spalten für '{self.title}' müssen vor der ersten Zeile gesetzt werden")
+        self._hidden_columns.update(letters)
+
+    def merge_cells(self, ref):
+        self._merges.append(ref)
+
+    def add_list_validation(self, formula1, sqref):
+        self._validations.append((formula1, sqref))
+
+    def add_conditional_format(self, sqref, formula, style="warning"):
+        self._conditional_formats.append((sqref, formula, self._parent.dxf_ids[style]))
+
+    def _start(self):
+        self._stream = self._parent._open_part(self.part_name, self.kind)
+        head = [_SHEET_HEAD, _SHEET_FORMAT]
+        if self._widths or self._hidden_columns:
+            head.append("<cols>")
+            for letter in sorted(set(self._widths) | self._hidden_columns, key=_column_index):
+                idx = _column_index(letter)
+                col = f'<col min="{idx}" max="{idx}"'
+                if letter in self._widths:
+                    col += f' width="{self._widths[letter]}" customWidth="1"'
+                if letter in self._hidden_columns:
+                    col += ' hidden="1"'
+                head.append(col + "/>")
+            head.append("</cols>")
+        head.append("<sheetData>")
+        self._stream.write("".join(head).encode("utf-8"))
+
+    def _cell_prefixes(self, styles, width):
+        """Vorberechnete '<c ... s="n"' Attribute je Spalte, gecacht je Stil-Kombination"""
+        if isinstance(styles, list):
+            styles = tuple(styles)
+        key = (styles, width)
+        prefixes = self._row_styles.get(key)
+        if prefixes is None:
+            if styles is None or isinstance(styles, str):
+                styles = (styles,) * width
+            ids = self._parent.style_ids
+            prefixes = tuple(f' s="{ids[s]}"' if s is not None else "" for s in styles)
+            if len(prefixes) < width:
+                prefixes += ("",) * (width - len(prefixes))
+            self._row_styles[key] = prefixes
+        return prefixes
+
+    def append(self, values, styles=None):
+        if self._stream is None:
+            self._start()
+        if self.row_count >= MAX_ROWS:
+            raise ValueError(f"Blatt '{self.title}' überschreitet {MAX_ROWS:,} Zeilen")
+        self.row_count += 1
+        r = str(self.row_count)
+        width = len(values)
+        letters = self._letters
+        while len(letters) < width:
+            letters.append(column_letter(len(letters) + 1))
+        prefixes = self._cell_prefixes(styles, width)
+        strings = self._parent.shared_strings
+        parts = ['<row r="', r, '">']
+        for letter, value, s in zip(letters, values, prefixes):
+            if value is None or value == "":
+                if s:
+                    parts.append('<c r="' + letter + r + '"' + s + "/>")
+                continue
+            cls = type(value)
+            if cls is str:
+                if value[0] == "=":
+                    parts.append('<c r="' + letter + r + '"' + s + "><f>" + escape_text(value[1:]) + "</f></c>")
+                elif strings is not None:
+                    idx = strings.get(value)
+                    if idx is None:
+                        idx = strings[value] = len(strings)
+                    parts.append('<c r="' + letter + r + '"' + s + ' t="s"><v>' + str(idx) + "</v></c>")
+                else:
+                    parts.append('<c r="' + letter + r + '"' + s + ' t="inlineStr"><is>' + _text_element(value) + "</is></c>")
+            elif cls is bool:
+                parts.append('<c r="' + letter + r + '"' + s + ' t="b"><v>' + ("1" if value else "0") + "</v></c>")
+            elif cls is int or cls is float:
+                parts.append('<c r="' + letter + r + '"' + s + "><v>" + repr(value) + "</v></c>")
+            else:
+                value = coerce_value(value)
+                if isinstance(value, str):
+                    parts.append('<c r="' + letter + r + '"' + s + ' t="inlineStr"><is>' + _text_element(value) + "</is></c>")
+                else:
+                    parts.append('<c r="' + letter + r + '"' + s + "><v>" + repr(float(value)) + "</v></c>")
+        parts.append("</row>")
+        self._buffer.append("".join(parts))
+        self.cell_count += width
+        if len(self._buffer) >= FLUSH_ROWS:
+            self._flush()
+        return self.row_count
+
+    def _flush(self):
+        if self._buffer:
+            self._stream.write("".join(self._buffer).encode("utf-8"))
+            self._buffer = []
+
+    def discard(self):
+        """Schließt den offenen Zip-Stream ohne Abschluss (Abbruch des Builds)"""
+        if self._stream is not None:
+            with contextlib.suppress(Exception):
+                self._stream.close()
+            self._stream = None
+        self.closed = True
+
+    def close(self):
+        if self.closed:
+            return
+        if self._stream is None:
+            self._start()
+        self._flush()
+        tail = ["</sheetData>"]
+        if self._merges:
+            tail.append(f'<mergeCells count="{len(self._merges)}">')
+            tail.extend(f'<mergeCell ref="{ref}"/>' for ref in self._merges)
+            tail.append("</mergeCells>")
+        for priority, (sqref, formula, dxf_id) in enumerate(self._conditional_formats, start=1):
+            tail.append(
+                f'<conditionalFormatting sqref="{sqref}"><cfRule type="expression" dxfId="{dxf_id}" '
+                f'priority="{priority}"><formula>{escape_text(formula)}</formula></cfRule></conditionalFormatting>'
+            )
+        if self._validations:
+            tail.append(f'<dataValidations count="{len(self._validations)}">')
+            for formula1, sqref in self._validations:
+                tail.append(
+                    f'<dataValidation type="list" allowBlank="1" sqref="{sqref}">'
+                    f"<formula1>{escape_text(formula1)}</formula1></dataValidation>"
+                )
+            tail.append("</dataValidations>")
+        tail.append('<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>')
+        tail.append("</worksheet>")
+        self._stream.write("".join(tail).encode("utf-8"))
+        self._stream.close()
+        self.closed = True
+
+
+def _column_index(letter):
+    idx = 0
+    for ch in letter.upper():
+        idx = idx * 26 + ord(ch) - 64
+    return idx
+
+
+class XmlWorkbookWriter(WorkbookWriter):
+    """
+    Schreibt das XLSX-Paket direkt: Stil-Indizes werden einmal aus STYLE_TABLE
+    berechnet, Zeilen als vorformatierte XML-Fragmente in den Zip-Stream geschrieben.
+    Das Paket entsteht in einer Temp-Datei neben dem Ziel und ersetzt es erst in close().
+    strings: "shared" (sharedStrings.xml, kompakter) oder "inline" (kein Speicher je String)
+    """
+
+    engine = "xml"
+
+    def __init__(self, path, strings="shared", compression="default"):
+        if strings not in ("shared", "inline"):
+            raise ValueError(f"Unbekannter String-Modus: {strings}")
+        super().__init__(path, compression)
+        self.shared_strings = {} if strings == "shared" else None
+        self.style_ids = {name: idx for idx, name in enumerate(STYLE_TABLE, start=1)}
+        self.dxf_ids = {name: idx for idx, name in enumerate(CONDITIONAL_STYLES)}
+        self.temp_path = path + ".partial"
+        self._zip = zipfile.ZipFile(self.temp_path, "w", zipfile.ZIP_DEFLATED)
+        self._current = None
+
+    def _open_part(self, name, kind):
+        # ZipFile.open übernimmt Verfahren und Level des ZipFile-Objekts
+        self._zip.compression, self._zip.compresslevel = COMPRESSION_LEVELS[self.compression[kind]]
+        return self._zip.open(name, "w", force_zip64=True)
+
+    def _write_part(self, name, text, kind="package"):
+        compress_type, level = COMPRESSION_LEVELS[self.compression[kind]]
+        self._zip.writestr(name, text.encode("utf-8"), compress_type=compress_type, compresslevel=level)
+
+    def create_sheet(self, title, kind="data"):
+        if any(ws.title == title for ws in self.sheets):
+            raise ValueError(f"Blatt '{title}' existiert bereits")
+        if self._current is not None:
+            self._current.close()
+        self._current = XmlSheetWriter(self, len(self.sheets) + 1, title, kind)
+        self.sheets.append(self._current)
+        return self._current
+
+    def copy_sheet(self, title, kind, source, part_name, row_count=0, cell_count=0):
+        """
+        Übernimmt ein fertiges Worksheet-Part aus der Zip-Datei `source` roh (siehe copy_zip_member).
+        Shared-String-Indizes im Part müssen zur eigenen Tabelle passen (load_shared_strings).
+        """
+        ws = self.create_sheet(title, kind)
+        copy_zip_member(source, part_name, self._zip, ws.part_name)
+        ws.row_count, ws.cell_count, ws.closed = row_count, cell_count, True
+        return ws
+
+    def load_shared_strings(self, source):
+        """Übernimmt die Shared-String-Tabelle einer vorherigen Datei (Indizes bleiben erhalten)"""
+        from xml.etree.ElementTree import iterparse
+
+        if self.shared_strings is None or self.shared_strings:
+            raise RuntimeError("Shared Strings können nur in eine leere Tabelle geladen werden")
+        if "xl/sharedStrings.xml" not in source.namelist():
+            return
+        si, t = f"{{{NS_MAIN}}}si", f"{{{NS_MAIN}}}t"
+        with source.open("xl/sharedStrings.xml") as f:
+            for _, elem in iterparse(f):
+                if elem.tag == si:
+                    text = "".join(node.text or "" for node in elem.iter(t))
+                    if text in self.shared_strings:
+                        raise ValueError("Shared-String-Tabelle enthält doppelte Einträge")
+                    self.shared_strings[text] = len(self.shared_strings)
+                    elem.clear()
+
+    def close(self):
+        for ws in self.sheets:
+            ws.close()
+        if self.shared_strings is not None:
+            self._write_part("xl/sharedStrings.xml", self._shared_strings_xml(), "strings")
+        self._write_part("xl/styles.xml", styles_xml(), "styles")
+        self._write_part("xl/workbook.xml", self._workbook_xml())
+        self._write_part("xl/_rels/workbook.xml.rels", self._workbook_rels_xml())
+        self._write_part("_rels/.rels", _ROOT_RELS)
+        self._write_part("[Content_Types].xml", self._content_types_xml())
+        self._zip.close()
+        os.replace(self.temp_path, self.path)
+        return self._metrics()
+
+    def abort(self):
+        for ws in self.sheets:
+            ws.discard()
+        with contextlib.suppress(Exception):
+            self._zip.close()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+    def _shared_strings_xml(self):
+        parts = [XML_DECL, f'<sst xmlns="{NS_MAIN}" count="{len(self.shared_strings)}" uniqueCount="{len(self.shared_strings)}">']
+        parts.extend("<si>" + _text_element(text) + "</si>" for text in self.shared_strings)
+        parts.append("</sst>")
+        return "".join(parts)
+
+    def _workbook_xml(self):
+        sheets = "".join(
+            f'<sheet name={quoteattr(ws.title)} sheetId="{ws.index}"'
+            + (' state="hidden"' if ws.hidden else "")
+            + f' r:id="rId{ws.index}"/>'
+            for ws in self.sheets
+        )
+        return (
+            XML_DECL + f'<workbook xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">'
+            '<bookViews><workbookView activeTab="0"/></bookViews>'
+            f"<sheets>{sheets}</sheets>"
+            + self._defined_names_xml()
+            + '<calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+        )
+
+    def _defined_names_xml(self):
+        if not self.defined_names:
+            return ""
+        names = "".join(
+            f"<definedName name={quoteattr(name)}>{escape_text(formula)}</definedName>"
+            for name, formula in self.defined_names.items()
+        )
+        return f"<definedNames>{names}</definedNames>"
+
+    def _workbook_rels_xml(self):
+        rels = [
+            f'<Relationship Id="rId{ws.index}" Type="{NS_REL}/worksheet" Target="worksheets/sheet{ws.index}.xml"/>'
+            for ws in self.sheets
+        ]
+        n = len(self.sheets)
+        rels.append(f'<Relationship Id="rId{n + 1}" Type="{NS_REL}/styles" Target="styles.xml"/>')
+        if self.shared_strings is not None:
+            rels.append(f'<Relationship Id="rId{n + 2}" Type="{NS_REL}/sharedStrings" Target="sharedStrings.xml"/>')
+        return XML_DECL + f'<Relationships xmlns="{NS_PKG_REL}">' + "".join(rels) + "</Relationships>"
+
+    def _content_types_xml(self):
+        ct = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+        overrides = [f'<Override PartName="/xl/workbook.xml" ContentType="{ct}.sheet.main+xml"/>']
+        overrides.extend(
+            f'<Override PartName="/{ws.part_name}" ContentType="{ct}.worksheet+xml"/>' for ws in self.sheets
+        )
+        overrides.append(f'<Override PartName="/xl/styles.xml" ContentType="{ct}.styles+xml"/>')
+        if self.shared_strings is not None:
+            overrides.append(f'<Override PartName="/xl/sharedStrings.xml" ContentType="{ct}.sharedStrings+xml"/>')
+        return (
+            XML_DECL + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            + "".join(overrides) + "</Types>"
+        )
+
+
+def copy_zip_member(source, name, target, new_name=None):
+    """
+    Kopiert ein Zip-Member roh: die komprimierten Bytes werden unverändert übernommen,
+    ohne Entpacken und Neu-Komprimieren. Schreibt wie ZipFile.writestr über die
+    zipfile-Interna (FileHeader, start_dir) - `target` darf keinen offenen Schreib-Handle haben.
+    """
+    info = source.getinfo(name)
+    source.fp.seek(info.header_offset)
+    header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+    if header[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"{name}: ungültiger lokaler Header")
+    source.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+
+    member = zipfile.ZipInfo(new_name or name, info.date_time)
+    member.compress_type = info.compress_type
+    member.CRC, member.compress_size, member.file_size = info.CRC, info.compress_size, info.file_size
+    member.external_attr = info.external_attr
+    member.flag_bits = info.flag_bits & ~0x08  # Größen stehen im Header, kein Data Descriptor
+    with target._lock:
+        if target._writing:
+            raise ValueError("Zip-Datei hat einen offenen Schreib-Handle")
+        target._writecheck(member)
+        target._didModify = True
+        target.fp.seek(target.start_dir)
+        member.header_offset = target.fp.tell()
+        target.fp.write(member.FileHeader())
+        remaining = info.compress_size
+        while remaining:
+            chunk = source.fp.read(min(remaining, 1 << 20))
+            if not chunk:
+                raise zipfile.BadZipFile(f"{name}: Daten unvollständig")
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+        target.filelist.append(member)
+        target.NameToInfo[member.filename] = member
+        target.start_dir = target.fp.tell()
+
+
+_ROOT_RELS = (
+    XML_DECL + f'<Relationships xmlns="{NS_PKG_REL}">'
+    f'<Relationship Id="rId1" Type="{NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+
+@lru_cache(maxsize=1)
+def styles_xml():
+    """styles.xml aus STYLE_TABLE - xf-Index i+1 entspricht dem i-ten Stil (0 = Standard)"""
+    fonts = [_font_xml(None)]
+    fills = ['<fill><patternFill patternType="none"/></fill>', '<fill><patternFill patternType="gray125"/></fill>']
+    borders = ["<border><left/><right/><top/><bottom/><diagonal/></border>"]
+    num_fmts = {}
+    xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+
+    def index_of(items, item):
+        if item not in items:
+            items.append(item)
+        return items.index(item)
+
+    thin = '<border><left style="thin"><color auto="1"/></left><right style="thin"><color auto="1"/></right>' \
+           '<top style="thin"><color auto="1"/></top><bottom style="thin"><color auto="1"/></bottom><diagonal/></border>'
+    for spec in STYLE_TABLE.values():
+        font_id = index_of(fonts, _font_xml(spec.get("font")))
+        fill_id = 0
+        if "fill" in spec:
+            color = spec["fill"]
+            fill_id = index_of(
+                fills,
+                f'<fill><patternFill patternType="solid"><fgColor rgb="00{color}"/><bgColor rgb="00{color}"/></patternFill></fill>',
+            )
+        border_id = index_of(borders, thin) if spec.get("border") else 0
+        fmt_id = 0
+        if "number_format" in spec:
+            fmt = spec["number_format"]
+            fmt_id = num_fmts.setdefault(fmt, 164 + len(num_fmts))
+        attrs = f'numFmtId="{fmt_id}" fontId="{font_id}" fillId="{fill_id}" borderId="{border_id}" xfId="0"'
+        for flag, value in (("applyNumberFormat", fmt_id), ("applyFont", font_id), ("applyFill", fill_id), ("applyBorder", border_id)):
+            if value:
+                attrs += f' {flag}="1"'
+        if "align" in spec:
+            xfs.append(f'<xf {attrs} applyAlignment="1"><alignment horizontal="{spec["align"]}" vertical="center"/></xf>')
+        else:
+            xfs.append(f"<xf {attrs}/>")
+
+    parts = [XML_DECL, f'<styleSheet xmlns="{NS_MAIN}">']
+    if num_fmts:
+        parts.append(f'<numFmts count="{len(num_fmts)}">')
+        parts.extend(f"<numFmt numFmtId={quoteattr(str(i))} formatCode={quoteattr(fmt)}/>" for fmt, i in num_fmts.items())
+        parts.append("</numFmts>")
+    parts.append(f'<fonts count="{len(fonts)}">' + "".join(fonts) + "</fonts>")
+    parts.append(f'<fills count="{len(fills)}">' + "".join(fills) + "</fills>")
+    parts.append(f'<borders count="{len(borders)}">' + "".join(borders) + "</borders>")
+    parts.append('<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>')
+    parts.append(f'<cellXfs count="{len(xfs)}">' + "".join(xfs) + "</cellXfs>")
+    parts.append('<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>')
+    dxfs = [
+        f'<dxf><fill><patternFill patternType="solid"><bgColor rgb="FF{spec["fill"]}"/></patternFill></fill></dxf>'
+        for spec in CONDITIONAL_STYLES.values()
+    ]
+    parts.append(f'<dxfs count="{len(dxfs)}">' + "".join(dxfs) + "</dxfs>")
+    parts.append("</styleSheet>")
+    return "".join(parts)
+
+
+def _font_xml(font):
+    font = _font_kwargs(font)
+    parts = ["<font>"]
+    if font.get("bold"):
+        parts.append('<b val="1"/>')
+    if font.get("italic"):
+        parts.append('<i val="1"/>')
+    parts.append(f'<sz val="{font["size"]}"/>')
+    if font.get("color"):
+        parts.append(f'<color rgb="00{font["color"]}"/>')
+    parts.append(f'<name val="{font["name"]}"/><family val="2"/>')
+    parts.append("</font>")
+    return "".join(parts)
+
+
+ENGINES = {
+    "openpyxl": OpenpyxlWorkbookWriter,
+    "xml": XmlWorkbookWriter,
+}
+
+
+def open_workbook_writer(path, engine="openpyxl", **options):
+    """Erzeugt den WorkbookWriter der gewählten Engine"""
+    if engine not in ENGINES:
+        raise ValueError(f"Unbekannte Engine '{engine}' - verfügbar: {', '.join(ENGINES)}")
+    return ENGINES[engine](path, **options)